@@ -0,0 +1,60 @@
+#!/usr/bin/env python
+
+### Throughput cost of header checkpointing in WaveWriter
+#
+# Usage: python benchmarks/checkpoint.py [seconds_of_audio]
+
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+from wavefile import WaveWriter, Format
+
+samplerate = 48000
+channels = 2
+blockSize = 4096
+seconds = float(sys.argv[1]) if len(sys.argv)>1 else 60.
+
+def bench(filename, format, **kwds):
+    block = np.zeros((channels, blockSize), np.float32, order='F')
+    blocks = int(seconds*samplerate) // blockSize
+    start = time.perf_counter()
+    with WaveWriter(filename, channels=channels, samplerate=samplerate,
+            format=format, **kwds) as w:
+        for i in range(blocks):
+            w.write(block)
+    elapsed = time.perf_counter() - start
+    os.remove(filename)
+    return blocks * blockSize / elapsed
+
+intervals = [None, 10., 1., .1, blockSize]
+
+with tempfile.TemporaryDirectory() as directory:
+    for name, format, extension in [
+            ('WAV', Format.WAV|Format.PCM_16, '.wav'),
+            ('RF64', Format.RF64|Format.PCM_16, '.rf64'),
+            ('W64', Format.W64|Format.PCM_16, '.w64'),
+            ]:
+        filename = os.path.join(directory, 'bench'+extension)
+        bench(filename, format) # warm up
+        reference = bench(filename, format)
+        for fsync in False, True:
+            for interval in intervals:
+                if interval is None and fsync: continue
+                checkpoint = (
+                    dict() if interval is None else
+                    dict(checkpoint_frames=interval) if isinstance(interval, int) else
+                    dict(checkpoint_seconds=interval))
+                throughput = bench(filename, format, fsync=fsync, **checkpoint)
+                print("{:5} checkpoint {:>11} fsync {:5} {:10.2f} Mframes/s {:6.1f}%".format(
+                    name,
+                    'never' if interval is None
+                        else '%i frames'%interval if isinstance(interval, int)
+                        else '%gs'%interval,
+                    str(fsync),
+                    throughput/1e6,
+                    100.*throughput/reference,
+                ))
+
+# vim: et ts=4 sw=4
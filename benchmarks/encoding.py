@@ -0,0 +1,76 @@
+#!/usr/bin/env python
+
+### Encoding speed against output size for compressed formats
+#
+# Usage: python benchmarks/encoding.py [seconds_of_audio]
+
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+from wavefile import WaveWriter, Format, BitrateMode
+
+samplerate = 48000
+channels = 2
+blockSize = 4096
+seconds = float(sys.argv[1]) if len(sys.argv)>1 else 30.
+
+def signal(frames):
+    """Some tones and a noise floor, compresses like real audio would"""
+    t = np.arange(frames) / samplerate
+    tones = sum(np.sin(2*np.pi*f*t)/(i+2) for i, f in enumerate([110, 440, 1250, 3300]))
+    noise = np.random.RandomState(0).normal(0, .01, (channels, frames))
+    return np.asfortranarray(tones*.4 + noise, np.float32)
+
+def bench(filename, format, **kwds):
+    data = signal(int(seconds*samplerate))
+    start = time.perf_counter()
+    with WaveWriter(filename, channels=channels, samplerate=samplerate,
+            format=format, **kwds) as w:
+        for i in range(0, data.shape[1], blockSize):
+            w.write(data[:,i:i+blockSize])
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(filename)
+    os.remove(filename)
+    return data.shape[1] / elapsed, size
+
+levels = [0., .25, .5, .75, 1.]
+configurations = [
+    ('WAV PCM_16', Format.WAV|Format.PCM_16, '.wav', [{}]),
+    ('FLAC PCM_16', Format.FLAC|Format.PCM_16, '.flac', [
+        dict(compression_level=level) for level in levels]),
+    ('OGG VORBIS', Format.OGG|Format.VORBIS, '.ogg', [
+        dict(vbr_quality=level) for level in levels]),
+    ('OGG OPUS', Format.OGG|Format.OPUS, '.opus', [
+        dict(vbr_quality=level) for level in levels]),
+    ('MP3', Format.MPEG|Format.MPEG_LAYER_III, '.mp3', [
+        dict(compression_level=level, bitrate_mode=mode)
+        for mode in BitrateMode
+        for level in levels]),
+]
+
+with tempfile.TemporaryDirectory() as directory:
+    reference = None
+    for name, format, extension, settings in configurations:
+        if not format.isSupported():
+            print("{:12} not supported by this libsndfile".format(name))
+            continue
+        filename = os.path.join(directory, 'bench'+extension)
+        for kwds in settings:
+            setting = ' '.join('%s=%s'%(k, getattr(v, 'name', v)) for k, v in kwds.items())
+            try:
+                throughput, size = bench(filename, format, **kwds)
+            except ValueError as e:
+                print("{:12} {:45} {}".format(name, setting, e))
+                continue
+            reference = reference or size
+            print("{:12} {:45} {:8.2f} Mframes/s {:10} bytes {:6.1f}%".format(
+                name,
+                setting,
+                throughput/1e6,
+                size,
+                100.*size/reference,
+            ))
+
+# vim: et ts=4 sw=4
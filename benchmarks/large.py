@@ -0,0 +1,50 @@
+#!/usr/bin/env python
+
+### Streams a long multichannel capture beyond the 4GB RIFF limit
+#
+# Usage: python benchmarks/large.py [gigabytes] [directory]
+# Needs that much free disk space, the file is removed afterwards.
+
+import os
+import sys
+import time
+import tempfile
+import numpy as np
+from wavefile import WaveWriter, WaveReader, Format
+
+gigabytes = float(sys.argv[1]) if len(sys.argv)>1 else 4.5
+directory = sys.argv[2] if len(sys.argv)>2 else tempfile.gettempdir()
+samplerate = 96000
+channels = 32
+blockSize = 8192
+frames = int(gigabytes * 2**30) // (channels * 4)
+
+filename = os.path.join(directory, 'large_capture.wav')
+block = np.random.RandomState(0).uniform(-1, 1, (channels, blockSize)).astype(np.float32)
+block = np.asfortranarray(block)
+
+try:
+    start = time.perf_counter()
+    with WaveWriter(filename, channels=channels, samplerate=samplerate,
+            format=Format.RF64|Format.FLOAT) as w:
+        for i in range(0, frames, blockSize):
+            w.write(block[:,:min(blockSize, frames-i)])
+    elapsed = time.perf_counter() - start
+    size = os.path.getsize(filename)
+    print("Written {:.2f} GB in {:.1f}s: {:.1f} MB/s, {:.2f}x realtime".format(
+        size/2**30, elapsed, size/2**20/elapsed, frames/samplerate/elapsed))
+
+    start = time.perf_counter()
+    with WaveReader(filename) as r:
+        assert r.frames == frames, (r.frames, frames)
+        header = 'RF64' if r.format & Format.TYPEMASK == Format.RF64 else 'RIFF'
+        data = r.buffer(blockSize)
+        while r.read(data): pass
+    elapsed = time.perf_counter() - start
+    print("Read {} file back in {:.1f}s: {:.1f} MB/s".format(
+        header, elapsed, size/2**20/elapsed))
+finally:
+    if os.path.exists(filename):
+        os.remove(filename)
+
+# vim: et ts=4 sw=4
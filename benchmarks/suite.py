@@ -0,0 +1,383 @@
+#!/usr/bin/env python
+
+### Throughput, latency and memory benchmarks for python-wavefile
+#
+# Generates a synthetic corpus in a temporary directory and measures
+# read(), write(), read_iter(), load() and save() over formats,
+# block sizes, dtypes, channel counts and buffer layouts,
+# channel subsets read with channels_select or by slicing,
+# and float writes to PCM quantized by libsndfile or dithered.
+# Results are printed and can be dumped as JSON to compare versions:
+#
+#   python benchmarks/suite.py --output before.json
+#   (change things)
+#   python benchmarks/suite.py --output after.json --compare before.json
+#
+# Use --quick for a reduced matrix, and --only to filter cases by name.
+
+import argparse
+import json
+import os
+import platform
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+
+import wavefile
+from wavefile import WaveReader, WaveWriter, Format
+
+formats = {
+    'wav-float': (Format.WAV|Format.FLOAT, '.wav'),
+    'wav-pcm16': (Format.WAV|Format.PCM_16, '.wav'),
+    'flac': (Format.FLAC|Format.PCM_16, '.flac'),
+    'ogg': (Format.OGG|Format.VORBIS, '.ogg'),
+}
+dtypes = {
+    'float32': np.float32,
+    'float64': np.float64,
+    'int16': np.int16,
+    'int32': np.int32,
+}
+samplerate = 48000
+
+full = dict(
+    formats = list(formats),
+    blocks = [64, 1024, 16384, 1<<20],
+    dtypes = list(dtypes),
+    channels = [1, 2, 8],
+    layouts = ['F', 'C'],
+    seconds = 30.,
+)
+quick = dict(
+    formats = ['wav-float', 'wav-pcm16', 'flac'],
+    blocks = [64, 4096, 1<<20],
+    dtypes = ['float32', 'int16'],
+    channels = [2],
+    layouts = ['F', 'C'],
+    seconds = 5.,
+)
+
+
+def signal(channels, frames):
+    """Tones over a noise floor, so that codecs work as with real audio"""
+    t = np.arange(frames) / samplerate
+    data = np.empty((channels, frames), np.float32, order='F')
+    noise = np.random.RandomState(0)
+    for c in range(channels):
+        data[c] = .4*np.sin(2*np.pi*110*(c+1)*t) + noise.normal(0, .01, frames)
+    return data
+
+def asDtype(data, dtype, layout):
+    """Converts float data to the dtype as libsndfile would scale it"""
+    if np.issubdtype(dtype, np.integer):
+        data = data * np.iinfo(dtype).max
+    return np.array(data, dtype, order=layout)
+
+
+class Timer(object):
+    """Accumulates the duration of each timed call"""
+    def __init__(self):
+        self.calls = []
+    def __call__(self, function, *args):
+        start = time.perf_counter()
+        result = function(*args)
+        self.calls.append(time.perf_counter() - start)
+        return result
+
+
+class Suite(object):
+
+    def __init__(self, directory, config, only=None, memory=True, repeat=3):
+        self.directory = directory
+        self.config = config
+        self.only = only
+        self.memory = memory
+        self.repeat = repeat
+        self.corpus = {}
+        self.results = []
+
+    def source(self, format, channels):
+        """Corpus file for the format and number of channels, created once"""
+        key = format, channels
+        if key not in self.corpus:
+            code, extension = formats[format]
+            filename = os.path.join(self.directory,
+                'corpus-%s-%ich%s'%(format, channels, extension))
+            frames = int(self.config['seconds']*samplerate)
+            data = signal(channels, frames)
+            with WaveWriter(filename, samplerate=samplerate,
+                    channels=channels, format=code) as w:
+                w.write(data)
+            self.corpus[key] = filename
+        return self.corpus[key]
+
+    def run(self, name, params, function):
+        """Runs function(timer) which returns the number of frames processed.
+        The fastest of 'repeat' runs is kept, to skip cold caches.
+        Then, unless disabled, runs it again to trace the peak memory,
+        apart, since tracing slows down allocations.
+        """
+        label = name + ' ' + ' '.join('%s=%s'%(k, v) for k, v in params.items())
+        if self.only and not all(word in label for word in self.only):
+            return
+        elapsed = None
+        for i in range(self.repeat):
+            candidate = Timer()
+            start = time.perf_counter()
+            frames = function(candidate)
+            seconds = time.perf_counter() - start
+            if elapsed is None or seconds < elapsed:
+                elapsed, timer = seconds, candidate
+        peak = None
+        if self.memory:
+            tracemalloc.start()
+            function(Timer())
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+        calls = np.array(timer.calls or [elapsed])
+        result = dict(
+            name = name,
+            params = params,
+            frames = frames,
+            seconds = elapsed,
+            mframes_per_second = frames / elapsed / 1e6,
+            calls = len(calls),
+            latency_p50_us = float(np.percentile(calls, 50)*1e6),
+            latency_p99_us = float(np.percentile(calls, 99)*1e6),
+            latency_max_us = float(calls.max()*1e6),
+            peak_memory_bytes = peak,
+        )
+        self.results.append(result)
+        print("{:70} {:9.2f} Mframes/s p50 {:9.1f}us p99 {:9.1f}us {:>12}".format(
+            label, result['mframes_per_second'],
+            result['latency_p50_us'], result['latency_p99_us'],
+            '-' if peak is None else '%.1fMB'%(peak/2**20)))
+
+    def matrix(self):
+        c = self.config
+        for format in c['formats']:
+            for channels in c['channels']:
+                for dtype in c['dtypes']:
+                    yield format, channels, dtype
+
+    def benchRead(self):
+        for format, channels, dtype in self.matrix():
+            filename = self.source(format, channels)
+            for block in self.config['blocks']:
+                def read(timer):
+                    total = 0
+                    with WaveReader(filename) as r:
+                        data = r.buffer(block, dtypes[dtype])
+                        nframes = timer(r.read, data)
+                        while nframes:
+                            total += nframes
+                            nframes = timer(r.read, data)
+                    return total
+                self.run('read', dict(format=format, channels=channels,
+                    dtype=dtype, block=block), read)
+
+    def benchReadIter(self):
+        for format, channels, dtype in self.matrix():
+            if dtype != 'float32': continue # read_iter always uses float32
+            filename = self.source(format, channels)
+            for block in self.config['blocks']:
+                def readIter(timer):
+                    total = 0
+                    with WaveReader(filename) as r:
+                        blocks = r.read_iter(block)
+                        data = timer(next, blocks, None)
+                        while data is not None:
+                            total += data.shape[1]
+                            data = timer(next, blocks, None)
+                    return total
+                self.run('read_iter', dict(format=format, channels=channels,
+                    block=block), readIter)
+
+    def benchSelect(self):
+        """Every other channel read with channels_select ('select')
+        or by reading them all and copying the selected rows ('slice')"""
+        for format in self.config['formats']:
+            for channels in self.config['channels']:
+                if channels < 2: continue
+                filename = self.source(format, channels)
+                selection = list(range(0, channels, 2))
+                for block in self.config['blocks']:
+                    def select(timer):
+                        total = 0
+                        with WaveReader(filename, channels_select=selection) as r:
+                            data = r.buffer(block)
+                            nframes = timer(r.read, data)
+                            while nframes:
+                                total += nframes
+                                nframes = timer(r.read, data)
+                        return total
+                    def slice(timer):
+                        total = 0
+                        with WaveReader(filename) as r:
+                            data = r.buffer(block)
+                            selected = np.zeros((len(selection), block), np.float32, order='F')
+                            def read():
+                                nframes = r.read(data)
+                                selected[:,:nframes] = data[selection,:nframes]
+                                return nframes
+                            nframes = timer(read)
+                            while nframes:
+                                total += nframes
+                                nframes = timer(read)
+                        return total
+                    for mode, function in (('select', select), ('slice', slice)):
+                        self.run('select', dict(format=format, channels=channels,
+                            block=block, mode=mode), function)
+
+    def benchWrite(self):
+        frames = int(self.config['seconds']*samplerate)
+        for format, channels, dtype in self.matrix():
+            code, extension = formats[format]
+            filename = os.path.join(self.directory, 'output'+extension)
+            audio = signal(channels, frames)
+            for layout in self.config['layouts']:
+                data = asDtype(audio, dtypes[dtype], layout)
+                for block in self.config['blocks']:
+                    def write(timer):
+                        with WaveWriter(filename, samplerate=samplerate,
+                                channels=channels, format=code) as w:
+                            for i in range(0, frames, block):
+                                timer(w.write, data[:,i:i+block])
+                        os.remove(filename)
+                        return frames
+                    self.run('write', dict(format=format, channels=channels,
+                        dtype=dtype, layout=layout, block=block), write)
+
+    def benchDither(self):
+        """Float blocks written to PCM, converted by libsndfile
+        ('float') or quantized, dithered or not, before crossing to it"""
+        quantizations = {
+            'float': dict(),
+            'none': dict(dither='none'),
+            'tpdf': dict(dither='tpdf'),
+            'tpdf-shaped': dict(dither='tpdf', noise_shaping=True),
+        }
+        frames = int(self.config['seconds']*samplerate)
+        for format in self.config['formats']:
+            code, extension = formats[format]
+            if code & Format.SUBMASK != Format.PCM_16: continue
+            filename = os.path.join(self.directory, 'output'+extension)
+            for channels in self.config['channels']:
+                audio = signal(channels, frames)
+                for quantization, kwds in quantizations.items():
+                    for block in self.config['blocks']:
+                        def write(timer):
+                            with WaveWriter(filename, samplerate=samplerate,
+                                    channels=channels, format=code, **kwds) as w:
+                                for i in range(0, frames, block):
+                                    timer(w.write, audio[:,i:i+block])
+                            os.remove(filename)
+                            return frames
+                        self.run('dither', dict(format=format, channels=channels,
+                            quantization=quantization, block=block), write)
+
+    def benchLoadSave(self):
+        frames = int(self.config['seconds']*samplerate)
+        for format in self.config['formats']:
+            for channels in self.config['channels']:
+                filename = self.source(format, channels)
+                def load(timer):
+                    samplerate, data = timer(wavefile.load, filename)
+                    return data.shape[1]
+                self.run('load', dict(format=format, channels=channels), load)
+        # save() always writes WAV float
+        output = os.path.join(self.directory, 'saved.wav')
+        for channels in self.config['channels']:
+            audio = signal(channels, frames)
+            def save(timer):
+                timer(wavefile.save, output, audio, samplerate)
+                os.remove(output)
+                return frames
+            self.run('save', dict(channels=channels), save)
+
+    def runAll(self):
+        self.benchRead()
+        self.benchReadIter()
+        self.benchSelect()
+        self.benchWrite()
+        self.benchDither()
+        self.benchLoadSave()
+
+
+def environment():
+    return dict(
+        wavefile = wavefile.__version__,
+        libsndfile = wavefile.wavefile._lib.sf_version_string().decode(),
+        numpy = np.__version__,
+        python = platform.python_version(),
+        platform = platform.platform(),
+        machine = platform.machine(),
+    )
+
+def maxRss():
+    try:
+        import resource
+    except ImportError: # Windows
+        return None
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+def key(result):
+    return result['name'], tuple(sorted(result['params'].items()))
+
+def compare(results, baseline):
+    """Prints the speed ratio of each case present in both runs"""
+    previous = dict((key(r), r) for r in baseline['results'])
+    print("\nSpeed compared with %s"%(baseline['environment'],))
+    for result in results:
+        old = previous.get(key(result))
+        if old is None: continue
+        ratio = result['mframes_per_second'] / old['mframes_per_second']
+        label = result['name'] + ' ' + ' '.join(
+            '%s=%s'%(k, v) for k, v in result['params'].items())
+        print("{:70} {:6.2f}x{}".format(label, ratio,
+            '  <-- slower' if ratio < .9 else ''))
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Throughput, latency and memory benchmarks for python-wavefile")
+    parser.add_argument('--quick', action='store_true',
+        help="run a reduced matrix")
+    parser.add_argument('--seconds', type=float,
+        help="duration of the corpus files")
+    parser.add_argument('--only', nargs='*',
+        help="run just cases whose label contains all these words, ie 'read' 'format=flac'")
+    parser.add_argument('--repeat', type=int, default=3,
+        help="runs of each case, the fastest is kept")
+    parser.add_argument('--no-memory', action='store_true',
+        help="skip the peak memory pass")
+    parser.add_argument('--output',
+        help="JSON file to write the results to")
+    parser.add_argument('--compare',
+        help="JSON file from a previous run to compare with")
+    args = parser.parse_args()
+
+    config = dict(quick if args.quick else full)
+    if args.seconds:
+        config['seconds'] = args.seconds
+    with tempfile.TemporaryDirectory() as directory:
+        suite = Suite(directory, config, args.only, not args.no_memory, args.repeat)
+        suite.runAll()
+
+    report = dict(
+        environment = environment(),
+        config = config,
+        max_rss_kb = maxRss(),
+        results = suite.results,
+    )
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+    if args.compare:
+        with open(args.compare) as f:
+            compare(suite.results, json.load(f))
+
+if __name__ == '__main__':
+    main()
+
+# vim: et ts=4 sw=4
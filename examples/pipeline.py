@@ -0,0 +1,22 @@
+#!/usr/bin/env python
+
+### Pipeline processing example
+
+import sys
+from wavefile import WaveReader, WaveWriter
+from wavefile.pipeline import Pipeline, Gain, Mix
+
+with WaveReader(sys.argv[1]) as r:
+    with WaveWriter(
+            'output.wav',
+            channels=1,
+            samplerate=r.samplerate,
+            ) as w:
+        p = Pipeline(r, [
+            Gain(.8),
+            Mix([[1./r.channels]*r.channels]), # downmix to mono
+        ], [w], blockSize=4096)
+        p.run()
+        print(p.report())
+
+# vim: noet ts=4 sw=4
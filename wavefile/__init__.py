@@ -1,4 +1,19 @@
 from .wavefile import *
+from .multi import (
+    MultiReader,
+    FanOutWriter,
+    split_channels,
+)
+from .pool import BufferPool
+from .shared import (
+    SharedAudio,
+    load_shared,
+)
+from .analysis import (
+    spectrogram,
+    spectrogram_iter,
+    segments,
+    preview,
+)
 import importlib.metadata
 __version__ = importlib.metadata.version('wavefile')
-
@@ -0,0 +1,310 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Copyright 2012 David García Garzón
+
+This file is part of python-wavefile
+
+python-wavefile is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+python-wavefile is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+
+from .wavefile import (
+    WaveReader,
+    WaveWriter,
+    Format,
+    windowCount,
+    _chunkHeaders,
+)
+
+
+def _analysisWindow(window, size):
+    if window is None:
+        return np.ones(size, np.float32)
+    if isinstance(window, str):
+        if window != 'hann':
+            raise ValueError("Unsupported window: %s"%window)
+        # periodic hann, as used for spectral analysis
+        return np.hanning(size+1)[:-1].astype(np.float32)
+    window = np.asarray(window, np.float32)
+    assert window.shape == (size,), \
+        "Window should have %i samples, has %i"%(size, len(window))
+    return window
+
+def spectrogram_iter(filename, n_fft=2048, hop=None, window='hann',
+        batch=256, pad='center', power=1.):
+    """Generates the magnitude spectrogram of an audio file
+    as tiles of shape (nwindows, channels, n_fft//2+1),
+    each one having up to 'batch' consecutive windows.
+    Windows are taken every 'hop' frames, n_fft//4 by default.
+    'window' is 'hann', None (rectangular) or an array with n_fft samples.
+    'pad' works like in WaveReader.windows.
+    Magnitudes are raised to 'power', use 2 for power spectrum.
+    Just a tile and its spectrum are held in memory at once.
+    """
+    hop = hop or n_fft//4
+    weights = _analysisWindow(window, n_fft)
+    with WaveReader(filename) as r:
+        work = np.zeros((batch, r.channels, n_fft), np.float32)
+        for windows in r.windows(n_fft, hop, pad=pad, batch=batch):
+            frames = work[:len(windows)]
+            np.multiply(windows, weights, out=frames)
+            tile = np.abs(np.fft.rfft(frames, axis=-1)).astype(np.float32, copy=False)
+            if power != 1.:
+                tile **= power
+            yield tile
+
+def spectrogram(filename, n_fft=2048, hop=None, window='hann',
+        batch=256, pad='center', power=1., out=None):
+    """Computes the magnitude spectrogram of an audio file.
+    Returns an array of shape (nwindows, channels, n_fft//2+1).
+    See spectrogram_iter for the parameters.
+    'out' may be an array of the proper shape to be filled, or the name
+    of a .npy file to be created and filled as a memory map,
+    so that long files can be processed in constant memory.
+    """
+    hop = hop or n_fft//4
+    with WaveReader(filename) as r:
+        shape = (
+            windowCount(r.frames, n_fft, hop, pad),
+            r.channels,
+            n_fft//2+1,
+        )
+    if out is None:
+        out = np.zeros(shape, np.float32)
+    elif isinstance(out, (str, bytes)) or hasattr(out, '__fspath__'):
+        out = np.lib.format.open_memmap(out, mode='w+', dtype=np.float32, shape=shape)
+    assert out.shape == shape, \
+        "Output should have shape %s, has %s"%(shape, out.shape)
+
+    position = 0
+    for tile in spectrogram_iter(filename, n_fft, hop, window, batch, pad, power):
+        out[position:position+len(tile)] = tile
+        position += len(tile)
+    if isinstance(out, np.memmap):
+        out.flush()
+    return out
+
+
+class _SpanWriter(object):
+    """Writes the frames of the current span to its own file,
+    holding the frames of a silence that may still be part
+    of the span, at most 'capacity' frames, until it is decided"""
+
+    def __init__(self, pattern, reader, format, capacity):
+        self._pattern = pattern
+        self._reader = reader
+        self._format = format or reader.format
+        self._pending = np.zeros((reader.channels, capacity), np.float32, order='F')
+        self._npending = 0
+        self._writer = None
+        self._written = 0 # frames up to here are in the file
+        self._index = 0
+
+    def start(self, position):
+        self._writer = WaveWriter(
+            self._pattern.format(index=self._index, start=position),
+            samplerate=self._reader.samplerate,
+            channels=self._reader.channels,
+            format=self._format,
+        )
+        self._index += 1
+        self._written = position
+        self._npending = 0
+
+    def advance(self, stop, block, offset):
+        """Writes frames until 'stop' taking them from the pending
+        ones and then from the block starting at 'offset'"""
+        if stop <= self._written: return
+        fromPending = min(stop - self._written, self._npending)
+        if fromPending:
+            self._writer.write(self._pending[:,:fromPending])
+            kept = self._npending - fromPending
+            self._pending[:,:kept] = self._pending[:,fromPending:self._npending]
+            self._npending = kept
+            self._written += fromPending
+        if stop > self._written:
+            self._writer.write(block[:,self._written-offset:stop-offset])
+            self._written = stop
+
+    def hold(self, block, offset):
+        """Keeps the block frames beyond the written ones as pending"""
+        rest = block[:,max(self._written, offset)-offset:]
+        n = rest.shape[1]
+        self._pending[:,self._npending:self._npending+n] = rest
+        self._npending += n
+
+    def close(self, stop, block, offset):
+        self.advance(stop, block, offset)
+        self._writer.close()
+        self._writer = None
+        self._npending = 0
+
+def segments(filename, threshold_db=-50., min_silence=.5, block=65536,
+        hysteresis_db=6., frame=.01, output=None, format=None):
+    """Generates the (start, stop) frames of the non silent spans of a file.
+    The level, in dB relative to full scale, is measured every 'frame'
+    seconds over all the channels.
+    A span starts when the level reaches 'threshold_db' and its
+    silence starts when the level falls 'hysteresis_db' below it.
+    Silences shorter than 'min_silence' seconds do not split spans.
+    The file is streamed in blocks of about 'block' frames, so memory
+    does not grow with its length.
+    If 'output' is given, each span is also written to its own file,
+    named by formatting 'output' with the span 'index' and 'start' frame,
+    ie. 'span-{index:03}.wav', in 'format' or the one of the source.
+    Files are written as the spans are generated.
+    """
+    with WaveReader(filename) as r:
+        hop = max(1, int(round(frame * r.samplerate)))
+        minGap = max(1, int(np.ceil(min_silence * r.samplerate / hop))) * hop
+        block = max(hop, block - block % hop) # blocks hold whole frames
+        closeDb = threshold_db - hysteresis_db
+        sink = None
+        if output is not None:
+            sink = _SpanWriter(output, r, format, minGap)
+
+        active = False # hysteresis state at the end of the previous block
+        start = None # of the open span
+        lastActive = 0 # end of the last active frame of the open span
+        offset = 0
+        for data in r.read_iter(block):
+            nframes = data.shape[1]
+            nhops = -(-nframes // hop)
+            power = np.einsum('ij,ij->j', data, data)
+            energy = np.zeros(nhops*hop, np.float32)
+            energy[:nframes] = power
+            energy = energy.reshape(nhops, hop).sum(axis=1)
+            energy /= np.minimum(hop, nframes - hop*np.arange(nhops)) * r.channels
+            levels = 10*np.log10(np.maximum(energy, 1e-20))
+            # Hysteresis: each frame takes the state of the last
+            # one beyond either threshold, or the carried one
+            loud = levels >= threshold_db
+            decided = np.where(loud | (levels < closeDb), np.arange(nhops), -1)
+            np.maximum.accumulate(decided, out=decided)
+            states = np.where(decided >= 0, loud[decided], active)
+            active = bool(states[-1])
+            edges = np.flatnonzero(np.diff(np.concatenate(
+                ([False], states, [False])).astype(np.int8)))
+            for first, last in zip(edges[::2], edges[1::2]):
+                runStart = offset + int(first)*hop
+                runStop = min(offset + int(last)*hop, offset + nframes)
+                if start is not None and runStart - lastActive < minGap:
+                    lastActive = runStop
+                    continue
+                if start is not None:
+                    if sink: sink.close(lastActive, data, offset)
+                    yield start, lastActive
+                start, lastActive = runStart, runStop
+                if sink: sink.start(start)
+            end = offset + nframes
+            if start is not None and end - lastActive >= minGap:
+                if sink: sink.close(lastActive, data, offset)
+                yield start, lastActive
+                start = None
+            elif start is not None and sink:
+                sink.advance(lastActive, data, offset)
+                sink.hold(data, offset)
+            offset = end
+        if start is not None:
+            if sink: sink.close(lastActive, data, offset - data.shape[1])
+            yield start, lastActive
+
+
+# Sample types read straight from the data chunk, and their full scale
+_directTypes = {
+    Format.PCM_16: ('i2', 2.**15),
+    Format.PCM_32: ('i4', 2.**31),
+    Format.FLOAT: ('f4', 1.),
+    Format.DOUBLE: ('f8', 1.),
+}
+
+def _directSamples(filename, reader):
+    """Maps the samples of an uncompressed WAV file as a (frames, channels)
+    array, returning it with its full scale, or None if not possible"""
+    if reader.format & Format.TYPEMASK not in (Format.WAV, Format.WAVEX, Format.RF64):
+        return None
+    sampleType = _directTypes.get(reader.format & Format.SUBMASK)
+    if sampleType is None:
+        return None
+    code, scale = sampleType
+    with open(filename, 'rb') as f:
+        endian = '>' if f.read(4) == b'RIFX' else '<'
+    for id, size, offset in _chunkHeaders(filename):
+        if id == 'data': break
+    else:
+        return None
+    frames = reader.frames
+    if size < frames * reader.channels * int(code[1]):
+        return None
+    samples = np.memmap(filename, np.dtype(endian+code), 'r', offset,
+        shape=(frames, reader.channels))
+    return samples, scale
+
+def preview(filename, points=1000, snippet=256, direct=True):
+    """Returns a coarse envelope of a file, for waveform thumbnails,
+    as two (channels, points) arrays with the minimum and the maximum
+    of each of 'points' evenly spaced segments.
+    Just the first 'snippet' frames of each segment are decoded,
+    seeking to them, so the time depends on 'points' and 'snippet'
+    rather than on the file length.
+    Larger snippets are more accurate, and with snippets as long
+    as the segments the envelope is exact.
+    Uncompressed WAV files are read straight from the data chunk,
+    unless 'direct' is False.
+    """
+    with WaveReader(filename) as r:
+        frames, channels = r.frames, r.channels
+        low = np.zeros((channels, points), np.float32)
+        high = np.zeros((channels, points), np.float32)
+        if not frames or not points:
+            return low, high
+        index = np.arange(points)
+        starts = index * frames // points
+        stops = np.maximum((index+1) * frames // points, starts+1)
+        lengths = np.minimum(stops - starts, snippet)
+        mapped = direct and _directSamples(filename, r)
+        if mapped:
+            samples, scale = mapped
+            length = int(lengths.max())
+            # Gather the snippets of many points at once, in bounded memory
+            batch = max(1, (1<<20) // (length * channels))
+            offsets = np.arange(length)
+            for first in range(0, points, batch):
+                last = min(first + batch, points)
+                positions = starts[first:last,np.newaxis] + offsets
+                positions = np.minimum(positions, stops[first:last,np.newaxis]-1)
+                snippets = samples[positions] # (points, length, channels)
+                low[:,first:last] = snippets.min(axis=1).T / scale
+                high[:,first:last] = snippets.max(axis=1).T / scale
+            del samples
+            return low, high
+
+        data = r.buffer(int(lengths.max()))
+        position = 0
+        for i in range(points):
+            if starts[i] != position:
+                r.seek(int(starts[i]))
+            block = data[:,:lengths[i]]
+            nframes = r.read(block)
+            position = starts[i] + nframes
+            if not nframes: continue
+            low[:,i] = block[:,:nframes].min(axis=1)
+            high[:,i] = block[:,:nframes].max(axis=1)
+        return low, high
+
+
+# vim: et ts=4 sw=4
@@ -0,0 +1,259 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+import numpy as np
+from numpy.testing import (
+    assert_allclose as np_assert_allclose,
+)
+from . import wavefile
+from .analysis import (
+    spectrogram,
+    spectrogram_iter,
+    segments,
+    preview,
+)
+
+
+class Spectrogram_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filestoremove = []
+        samples = np.arange(4000)
+        self.data = np.array([
+            np.sin(2*np.pi*samples*8/256),
+            np.sin(2*np.pi*samples*32/256),
+        ], np.float32)
+        with wavefile.WaveWriter("input.wav", channels=2) as w:
+            w.write(self.data)
+        self.toRemove("input.wav")
+
+    def tearDown(self):
+        for file in self.filestoremove:
+            if os.access(file, os.F_OK):
+                os.remove(file)
+
+    def toRemove(self, file):
+        self.filestoremove.append(file)
+
+    def reference(self, n_fft, hop):
+        window = np.hanning(n_fft+1)[:-1]
+        padded = np.pad(self.data, ((0,0), (n_fft//2, n_fft)))
+        return np.array([
+            np.abs(np.fft.rfft(padded[:,i:i+n_fft]*window))
+            for i in range(0, self.data.shape[1]+1, hop)
+        ])
+
+    def test_spectrogram(self):
+        result = spectrogram("input.wav", n_fft=256, hop=64, batch=7)
+        self.assertEqual(result.shape, (63, 2, 129))
+        np_assert_allclose(result, self.reference(256, 64), atol=1e-3)
+
+    def test_spectrogram_peaks(self):
+        result = spectrogram("input.wav", n_fft=256, hop=64)
+        self.assertEqual(result[10,0].argmax(), 8)
+        self.assertEqual(result[10,1].argmax(), 32)
+
+    def test_spectrogram_iter_tiles(self):
+        tiles = list(spectrogram_iter("input.wav", n_fft=256, hop=64, batch=10))
+        self.assertEqual([len(t) for t in tiles], [10]*6 + [3])
+        np_assert_allclose(np.concatenate(tiles), self.reference(256, 64), atol=1e-3)
+
+    def test_spectrogram_power(self):
+        magnitude = spectrogram("input.wav", n_fft=256, hop=64)
+        power = spectrogram("input.wav", n_fft=256, hop=64, power=2)
+        np_assert_allclose(power, magnitude**2, rtol=1e-4, atol=1e-3)
+
+    def test_spectrogram_toMemmap(self):
+        self.toRemove("spectrogram.npy")
+        result = spectrogram("input.wav", n_fft=256, hop=64, out="spectrogram.npy")
+        del result
+        loaded = np.load("spectrogram.npy", mmap_mode='r')
+        np_assert_allclose(loaded, self.reference(256, 64), atol=1e-3)
+
+    def test_spectrogram_badOutShape(self):
+        with self.assertRaises(AssertionError) as ctx:
+            spectrogram("input.wav", n_fft=256, hop=64, out=np.zeros((3,3,3)))
+        self.assertEqual(format(ctx.exception),
+            "Output should have shape (63, 2, 129), has (3, 3, 3)")
+
+
+class Segments_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filestoremove = []
+        samplerate = 8000
+        self.data = np.zeros((2, 10*samplerate), np.float32)
+        for start, stop in [(1, 2), (2.2, 3), (5, 5.5), (9.5, 10)]:
+            span = np.arange(int(start*samplerate), int(stop*samplerate))
+            self.data[:,span] = .5*np.sin(2*np.pi*440*span/samplerate)
+        self.data[1,40000:44000] = 0 # activity in a single channel
+        with wavefile.WaveWriter("input.wav", samplerate=samplerate, channels=2) as w:
+            w.write(self.data)
+        self.toRemove("input.wav")
+
+    def tearDown(self):
+        for file in self.filestoremove:
+            if os.access(file, os.F_OK):
+                os.remove(file)
+
+    def toRemove(self, file):
+        self.filestoremove.append(file)
+
+    def test_segments(self):
+        self.assertEqual(list(segments("input.wav")), [
+            (8000, 24000), # short silence does not split
+            (40000, 44000),
+            (76000, 80000), # till the end
+        ])
+
+    def test_segments_independentOfBlockSize(self):
+        for block in 100, 1000, 4096, 1<<20:
+            self.assertEqual(list(segments("input.wav", block=block)), [
+                (8000, 24000),
+                (40000, 44000),
+                (76000, 80000),
+            ])
+
+    def test_segments_shortMinSilence(self):
+        self.assertEqual(list(segments("input.wav", min_silence=.1)), [
+            (8000, 16000),
+            (17600, 24000),
+            (40000, 44000),
+            (76000, 80000),
+        ])
+
+    def test_segments_threshold(self):
+        self.data *= .001 # -66dB
+        with wavefile.WaveWriter("input.wav", samplerate=8000, channels=2) as w:
+            w.write(self.data)
+        self.assertEqual(list(segments("input.wav")), [])
+        self.assertEqual(len(list(segments("input.wav", threshold_db=-80))), 3)
+
+    def test_segments_hysteresis(self):
+        # Fading tail stays in the span while above the lower threshold
+        self.data[:,24000:28000] = 10**(-53/20) * np.sqrt(2) * np.sin(
+            2*np.pi*440*np.arange(4000)/8000)
+        with wavefile.WaveWriter("input.wav", samplerate=8000, channels=2) as w:
+            w.write(self.data)
+        self.assertEqual(list(segments("input.wav"))[0], (8000, 28000))
+        self.assertEqual(list(segments("input.wav", hysteresis_db=0))[0], (8000, 24000))
+
+    def test_segments_output(self):
+        for i in range(3):
+            self.toRemove("span-%i-.wav"%i)
+        spans = list(segments("input.wav", block=1000, output="span-{index}-.wav"))
+        for i, (start, stop) in enumerate(spans):
+            samplerate, data = wavefile.load("span-%i-.wav"%i)
+            self.assertEqual(samplerate, 8000)
+            np_assert_allclose(data, self.data[:,start:stop])
+
+    def test_segments_outputNamedByStart(self):
+        for start in 8000, 40000, 76000:
+            self.toRemove("span-%i.wav"%start)
+        list(segments("input.wav", output="span-{start}.wav"))
+        self.assertTrue(os.path.exists("span-40000.wav"))
+
+
+class Preview_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filestoremove = []
+        random = np.random.RandomState(0)
+        ramp = np.linspace(0, 1, 40000)
+        self.data = (random.uniform(-1, 1, (2, 40000)) * ramp).astype(np.float32)
+
+    def tearDown(self):
+        for file in self.filestoremove:
+            if os.access(file, os.F_OK):
+                os.remove(file)
+
+    def write(self, filename, format=wavefile.Format.WAV|wavefile.Format.FLOAT, **kwds):
+        self.toRemove(filename)
+        with wavefile.WaveWriter(filename, samplerate=8000, channels=2, format=format,
+                **kwds) as w:
+            w.write(self.data)
+
+    def toRemove(self, file):
+        self.filestoremove.append(file)
+
+    def exact(self, points):
+        segments = self.data.reshape(2, points, -1)
+        return segments.min(axis=2), segments.max(axis=2)
+
+    def test_preview_exactWithFullSnippets(self):
+        self.write("input.wav")
+        low, high = preview("input.wav", points=100, snippet=400)
+        expectedLow, expectedHigh = self.exact(100)
+        np_assert_allclose(low, expectedLow)
+        np_assert_allclose(high, expectedHigh)
+
+    def test_preview_snippets(self):
+        self.write("input.wav")
+        low, high = preview("input.wav", points=100, snippet=10)
+        segments = self.data.reshape(2, 100, -1)[:,:,:10]
+        np_assert_allclose(low, segments.min(axis=2))
+        np_assert_allclose(high, segments.max(axis=2))
+
+    def test_preview_decodesJustSnippets(self):
+        self.write("input.flac", wavefile.Format.FLAC|wavefile.Format.PCM_16)
+        frames = []
+        previous = wavefile.set_io_hook(
+            lambda handle, event, n, seconds:
+                frames.append(n) if event == 'read' else None)
+        try:
+            preview("input.flac", points=50, snippet=20)
+        finally:
+            wavefile.set_io_hook(previous)
+        self.assertEqual(sum(frames), 50*20)
+
+    def test_preview_compressedLikeDirect(self):
+        self.write("input.flac", wavefile.Format.FLAC|wavefile.Format.PCM_16)
+        self.write("input.wav", wavefile.Format.WAV|wavefile.Format.PCM_16)
+        for snippet in 16, 400:
+            flac = preview("input.flac", points=100, snippet=snippet)
+            wav = preview("input.wav", points=100, snippet=snippet)
+            np_assert_allclose(flac, wav)
+
+    def test_preview_directLikeLibsndfile(self):
+        for subtype in (wavefile.Format.PCM_16, wavefile.Format.PCM_32,
+                wavefile.Format.FLOAT, wavefile.Format.DOUBLE):
+            self.write("input.wav", wavefile.Format.WAV|subtype)
+            direct = preview("input.wav", points=70, snippet=33)
+            decoded = preview("input.wav", points=70, snippet=33, direct=False)
+            np_assert_allclose(direct, decoded)
+
+    def assertDirect(self, filename):
+        frames = []
+        previous = wavefile.set_io_hook(
+            lambda handle, event, n, seconds:
+                frames.append(n) if event == 'read' else None)
+        try:
+            direct = preview(filename, points=70, snippet=33)
+        finally:
+            wavefile.set_io_hook(previous)
+        self.assertEqual(frames, []) # not decoded by libsndfile
+        decoded = preview(filename, points=70, snippet=33, direct=False)
+        np_assert_allclose(direct, decoded)
+
+    def test_preview_directWavex(self):
+        self.write("input.wav", wavefile.Format.WAVEX|wavefile.Format.PCM_16)
+        self.assertDirect("input.wav")
+
+    def test_preview_directRf64(self):
+        self.write("input.rf64", wavefile.Format.RF64|wavefile.Format.PCM_16,
+            rf64_downgrade=False)
+        with open("input.rf64", 'rb') as f:
+            self.assertEqual(f.read(4), b'RF64')
+        self.assertDirect("input.rf64")
+
+    def test_preview_morePointsThanFrames(self):
+        self.data = self.data[:,:10]
+        self.write("input.wav")
+        low, high = preview("input.wav", points=20)
+        self.assertEqual(low.shape, (2, 20))
+        np_assert_allclose(high[:,::2], self.data)
+
+
+# vim: et ts=4 sw=4
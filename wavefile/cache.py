@@ -0,0 +1,182 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Persistent cache of decoded audio, so that compressed files read
+over and over (ie. every training epoch) are decoded just once.
+
+    from wavefile.cache import DecodeCache
+    cache = DecodeCache('/var/cache/audio', max_bytes=50*2**30)
+    samplerate, data = cache.load('song.flac')
+
+Decoded audio is kept as .npy files, opened as read only memory maps.
+Entries are keyed by the path, size and modification time of the source
+and the dtype, so modified files are decoded again.
+Several processes may share a cache directory: entries are written
+to a temporary file and then renamed, and the least recently used
+ones are removed when the cache grows beyond 'max_bytes'.
+
+Copyright 2012 David García Garzón
+
+This file is part of python-wavefile
+
+python-wavefile is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+python-wavefile is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import glob
+import hashlib
+import os
+import threading
+import time
+import numpy as np
+
+from .wavefile import (
+    WaveReader,
+    _readAll,
+)
+
+
+class DecodeCache(object):
+    """Decodes audio files into memory mappable .npy files
+    in 'directory', limited to 'max_bytes' if given.
+    """
+
+    # Seconds after which a temporary file is taken as left behind
+    # by a process killed while decoding
+    orphan_age = 3600.
+
+    def __init__(self, directory, max_bytes=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _key(self, filename, dtype):
+        filename = os.path.abspath(os.fspath(filename))
+        status = os.stat(filename)
+        key = repr((filename, status.st_size, status.st_mtime_ns, dtype.str))
+        return hashlib.sha1(key.encode('utf8')).hexdigest()
+
+    def _find(self, key):
+        # The sample rate is part of the name, since .npy headers
+        # have no room for it. Subdirectories keep the search short.
+        found = glob.glob(os.path.join(self.directory, key[:2], key + '-*.npy'))
+        return found[0] if found else None
+
+    def load(self, filename, dtype=np.float32):
+        """Returns the sample rate and the (channels, frames) audio
+        of the file as a read only memory map,
+        decoding and storing it if it is not in the cache.
+        """
+        dtype = np.dtype(dtype)
+        key = self._key(filename, dtype)
+        path = self._find(key)
+        if path is not None:
+            try:
+                data = np.load(path, mmap_mode='r')
+                os.utime(path) # most recently used
+            except FileNotFoundError: # evicted meanwhile
+                path = None
+        if path is not None:
+            self.hits += 1
+        else:
+            self.misses += 1
+            path = self._store(filename, key, dtype)
+            data = np.load(path, mmap_mode='r')
+            self.evict(keep=path)
+        samplerate = int(os.path.basename(path)[len(key)+1:-len('.npy')])
+        return samplerate, data
+
+    def _store(self, filename, key, dtype):
+        """Decodes the file into a temporary memory map
+        renamed to its final name once complete"""
+        subdirectory = os.path.join(self.directory, key[:2])
+        os.makedirs(subdirectory, exist_ok=True)
+        with WaveReader(filename) as r:
+            path = os.path.join(subdirectory, '%s-%i.npy'%(key, r.samplerate))
+            temporary = os.path.join(subdirectory, '.%s.%i.%i.tmp'%(
+                key, os.getpid(), threading.get_ident()))
+            try:
+                data = np.lib.format.open_memmap(temporary, mode='w+',
+                    dtype=dtype, shape=(r.channels, r.frames), fortran_order=True)
+                _readAll(r, data)
+                data.flush()
+                del data
+                os.replace(temporary, path)
+            except:
+                if os.path.exists(temporary):
+                    os.remove(temporary)
+                raise
+        return path
+
+    def entries(self):
+        """Returns the (path, bytes, last use) of the cached files"""
+        result = []
+        for path in glob.glob(os.path.join(self.directory, '??', '*.npy')):
+            try:
+                status = os.stat(path)
+            except FileNotFoundError: # removed by other process
+                continue
+            result.append((path, status.st_size, status.st_mtime))
+        return result
+
+    def _temporaries(self, age=0.):
+        """Paths of the temporary files not modified in 'age' seconds"""
+        result = []
+        now = time.time()
+        for path in glob.glob(os.path.join(self.directory, '??', '.*.tmp')):
+            try:
+                modified = os.stat(path).st_mtime
+            except FileNotFoundError: # renamed by its process
+                continue
+            if now - modified >= age:
+                result.append(path)
+        return result
+
+    def _remove(self, paths):
+        for path in paths:
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+    def size(self):
+        """Bytes used by the cached files"""
+        return sum(size for path, size, used in self.entries())
+
+    def evict(self, keep=None):
+        """Removes the least recently used files until the cache
+        fits 'max_bytes', except the 'keep' one.
+        Temporary files older than 'orphan_age' are removed too."""
+        self._remove(self._temporaries(self.orphan_age))
+        if self.max_bytes is None: return
+        entries = self.entries()
+        total = sum(size for path, size, used in entries)
+        for path, size, used in sorted(entries, key=lambda entry: entry[2]):
+            if total <= self.max_bytes: break
+            if path == keep: continue
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+
+    def clear(self):
+        """Removes every cached file, and every temporary one"""
+        self._remove(path for path, size, used in self.entries())
+        self._remove(self._temporaries())
+
+
+# vim: et ts=4 sw=4
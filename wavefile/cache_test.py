@@ -0,0 +1,148 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import glob
+import shutil
+import tempfile
+import time
+import unittest
+import numpy as np
+from numpy.testing import (
+    assert_array_equal as np_assert_equal,
+)
+from . import wavefile
+from .cache import DecodeCache
+
+
+class DecodeCache_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+        self.cachedir = os.path.join(self.directory, 'cache')
+
+    def tearDown(self):
+        shutil.rmtree(self.directory)
+
+    def source(self, name, frames=1000, seed=0):
+        filename = os.path.join(self.directory, name)
+        data = np.random.RandomState(seed).uniform(-.5, .5, (2, frames)).astype(np.float32)
+        with wavefile.WaveWriter(filename, samplerate=22050, channels=2,
+                format=wavefile.Format.FLAC|wavefile.Format.PCM_16) as w:
+            w.write(data)
+        return filename
+
+    def cachedFiles(self):
+        """Every file in the cache, temporary (hidden) ones too"""
+        return (glob.glob(os.path.join(self.cachedir, '*', '*'))
+            + glob.glob(os.path.join(self.cachedir, '*', '.*')))
+
+    def orphan(self, age):
+        """A temporary file as left by a process killed while decoding"""
+        os.makedirs(os.path.join(self.cachedir, 'ab'), exist_ok=True)
+        path = os.path.join(self.cachedir, 'ab', '.ab%i.123.456.tmp'%age)
+        with open(path, 'wb') as f:
+            f.write(b'\0'*1000)
+        modified = time.time() - age
+        os.utime(path, (modified, modified))
+        return path
+
+    def test_load_miss(self):
+        filename = self.source("a.flac")
+        cache = DecodeCache(self.cachedir)
+        samplerate, data = cache.load(filename)
+        self.assertEqual(samplerate, 22050)
+        self.assertIsInstance(data, np.memmap)
+        self.assertFalse(data.flags.writeable)
+        np_assert_equal(data, wavefile.load(filename)[1])
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        self.assertEqual(len(self.cachedFiles()), 1)
+
+    def test_load_hit(self):
+        filename = self.source("a.flac")
+        cache = DecodeCache(self.cachedir)
+        cache.load(filename)
+        samplerate, data = cache.load(filename)
+        self.assertEqual(samplerate, 22050)
+        np_assert_equal(data, wavefile.load(filename)[1])
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+
+    def test_load_sharedBetweenInstances(self):
+        filename = self.source("a.flac")
+        DecodeCache(self.cachedir).load(filename)
+        cache = DecodeCache(self.cachedir)
+        cache.load(filename)
+        self.assertEqual(cache.hits, 1)
+
+    def test_load_modifiedSource(self):
+        filename = self.source("a.flac")
+        cache = DecodeCache(self.cachedir)
+        cache.load(filename)
+        self.source("a.flac", frames=500, seed=1)
+        samplerate, data = cache.load(filename)
+        self.assertEqual(data.shape, (2, 500))
+        self.assertEqual(cache.misses, 2)
+
+    def test_load_dtypeIsPartOfTheKey(self):
+        filename = self.source("a.flac")
+        cache = DecodeCache(self.cachedir)
+        cache.load(filename)
+        samplerate, data = cache.load(filename, np.int16)
+        self.assertEqual(data.dtype, np.int16)
+        self.assertEqual(cache.misses, 2)
+
+    def test_load_badFile_leavesNoTemporary(self):
+        filename = os.path.join(self.directory, "bad.flac")
+        with open(filename, 'wb') as f:
+            f.write(b'not audio')
+        cache = DecodeCache(self.cachedir)
+        with self.assertRaises(IOError):
+            cache.load(filename)
+        self.assertEqual(self.cachedFiles(), [])
+
+    def test_evict_leastRecentlyUsed(self):
+        a, b, c = [self.source(name) for name in ("a.flac", "b.flac", "c.flac")]
+        cache = DecodeCache(self.cachedir)
+        cache.load(a)
+        entrySize = cache.size()
+        cache.max_bytes = 2 * entrySize
+        cache.load(b)
+        for i, (path, size, used) in enumerate(sorted(cache.entries())):
+            os.utime(path, (1000+i, 1000+i))
+        cache.load(a) # a is now the most recently used
+        cache.load(c)
+        self.assertEqual(cache.size(), 2 * entrySize)
+        cache.load(a)
+        cache.load(c)
+        self.assertEqual(cache.hits, 3)
+        cache.load(b)
+        self.assertEqual(cache.misses, 4)
+
+    def test_evict_keepsNewEntryBeyondBudget(self):
+        cache = DecodeCache(self.cachedir, max_bytes=10)
+        cache.load(self.source("a.flac"))
+        self.assertEqual(len(cache.entries()), 1)
+
+    def test_clear(self):
+        cache = DecodeCache(self.cachedir)
+        cache.load(self.source("a.flac"))
+        cache.clear()
+        self.assertEqual(cache.size(), 0)
+
+    def test_clear_removesTemporaries(self):
+        cache = DecodeCache(self.cachedir)
+        cache.load(self.source("a.flac"))
+        self.orphan(age=0)
+        cache.clear()
+        self.assertEqual(self.cachedFiles(), [])
+
+    def test_evict_removesOldTemporaries(self):
+        cache = DecodeCache(self.cachedir)
+        old = self.orphan(age=2*cache.orphan_age)
+        recent = self.orphan(age=0) # may be still decoding
+        cache.evict()
+        self.assertFalse(os.path.exists(old))
+        self.assertTrue(os.path.exists(recent))
+
+
+# vim: et ts=4 sw=4
@@ -0,0 +1,119 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Copyright 2012 David García Garzón
+
+This file is part of python-wavefile
+
+python-wavefile is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+python-wavefile is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+import numpy as np
+
+
+class Quantizer(object):
+    """Block by block float to integer PCM quantizer.
+
+    Converts floating point (channels, frames) blocks, full scale
+    being 1.0, into integer samples of 'bits' resolution,
+    scaled like libsndfile does but clipping instead of wrapping.
+    Samples are held in int16 for up to 16 bits and in int32 beyond,
+    aligned to the most significant bits, as sf_writef_short/int take them.
+
+    'dither' is 'tpdf', triangular noise of 2 LSB peak to peak
+    which decorrelates the quantization error from the signal,
+    or 'none' for plain rounding.
+    With 'noise_shaping' the dither is high-pass, the difference
+    of consecutive random values, moving most of its power
+    to high frequencies where it is less audible.
+    The last random value is kept between blocks, so feeding
+    a signal in blocks of any size is like feeding it at once.
+    Returned blocks are views of a buffer reused by the next call.
+    """
+
+    dithers = 'tpdf', 'none'
+
+    def __init__(self, bits, channels=1, dither='tpdf', noise_shaping=False, seed=None):
+        if dither not in self.dithers:
+            raise ValueError("Unsupported dither: %r"%(dither,))
+        if not 8 <= bits <= 32:
+            raise ValueError("Unsupported resolution: %i bits"%bits)
+        self.bits = bits
+        self.channels = channels
+        self.dither = dither
+        self.noise_shaping = noise_shaping
+        self.dtype = np.dtype(np.int16 if bits <= 16 else np.int32)
+        self._shift = self.dtype.itemsize*8 - bits
+        self._scale = float(2**(bits-1) - 1)
+        self._min = -2.**(bits-1)
+        self._max = 2.**(bits-1) - 1
+        # float32 mantissa holds just 24 bits
+        self._work = np.float32 if bits <= 24 else np.float64
+        self._random = np.random.default_rng(seed)
+        self._noise = None
+        self._output = None
+        self.reset()
+
+    def reset(self):
+        """Forgets any previous input"""
+        self._last = np.zeros((self.channels, 1), self._work)
+
+    def _buffers(self, frames):
+        if self._output is None or self._output.shape[1] < frames:
+            self._output = np.zeros((self.channels, frames), self.dtype, order='F')
+            self._values = np.zeros((self.channels, frames), self._work, order='F')
+            # Random values are drawn in frame order, so that
+            # block boundaries do not change the sequence
+            if self.noise_shaping:
+                self._noise = np.zeros((self.channels, frames+1), self._work, order='F')
+            else:
+                self._noise = np.zeros((2, self.channels, frames), self._work, order='F')
+        return (
+            self._output[:,:frames],
+            self._values[:,:frames],
+            self._noise[...,:frames+1] if self.noise_shaping else self._noise[...,:frames],
+        )
+
+    def process(self, data):
+        """Quantizes a floating point (channels, frames) block"""
+        channels, frames = data.shape
+        assert channels == self.channels, \
+            "Block has %i channels, quantizer has %i"%(channels, self.channels)
+        output, values, noise = self._buffers(frames)
+        np.multiply(data, self._scale, out=values, casting='unsafe')
+        if self.dither == 'tpdf' and frames:
+            if self.noise_shaping:
+                # r[n] - r[n-1], with r uniform in [-1/2, 1/2): 2 LSB triangular
+                noise[:,:1] = self._last
+                self._random.random(out=noise[:,1:], dtype=self._work)
+                noise[:,1:] -= .5
+                self._last = noise[:,-1:].copy()
+                values += noise[:,1:]
+                values -= noise[:,:-1]
+            else:
+                # r1[n] - r2[n]: 2 LSB triangular
+                self._random.random(out=noise, dtype=self._work)
+                values += noise[0]
+                values -= noise[1]
+        np.rint(values, out=values)
+        np.clip(values, self._min, self._max, out=values)
+        np.copyto(output, values, casting='unsafe')
+        if self._shift:
+            output <<= self._shift
+        return output
+
+
+# vim: et ts=4 sw=4
@@ -0,0 +1,92 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import numpy as np
+from numpy.testing import (
+    assert_array_equal as np_assert_equal,
+)
+from .dither import Quantizer
+
+
+class Quantizer_Test(unittest.TestCase):
+
+    def signal(self, frames=4000, channels=2):
+        return np.random.RandomState(0).uniform(-.9, .9, (channels, frames)).astype(np.float32)
+
+    def quantizeInBlocks(self, quantizer, data, blockSize):
+        return np.concatenate([
+            quantizer.process(data[:,i:i+blockSize]).copy()
+            for i in range(0, data.shape[1], blockSize)
+        ], axis=1)
+
+    def test_none_rounds(self):
+        data = self.signal()
+        result = Quantizer(16, 2, dither='none').process(data)
+        self.assertEqual(result.dtype, np.int16)
+        np_assert_equal(result, np.rint(data*np.float32(32767)))
+
+    def test_none_clipsInsteadOfWrapping(self):
+        result = Quantizer(16, dither='none').process(np.array([[1.5, -1.5, 1., -1.]]))
+        np_assert_equal(result, [[32767, -32768, 32767, -32767]])
+
+    def test_24bits_alignedToMostSignificantBits(self):
+        result = Quantizer(24, dither='none').process(np.array([[1., -1., .5]]))
+        self.assertEqual(result.dtype, np.int32)
+        np_assert_equal(result, [[0x7FFFFF<<8, -0x7FFFFF<<8, 0x400000<<8]])
+
+    def test_32bits(self):
+        result = Quantizer(32, dither='none').process(np.array([[1., -1., .5]]))
+        np_assert_equal(result, [[0x7FFFFFFF, -0x7FFFFFFF, 0x40000000]])
+
+    def test_tpdf_errorBounded(self):
+        data = self.signal()
+        result = Quantizer(16, 2, seed=1).process(data)
+        error = result - data*32767
+        self.assertLessEqual(np.abs(error).max(), 1.5)
+        self.assertGreater(np.abs(error).max(), .5) # not just rounding
+
+    def test_tpdf_linearizesBelowOneLsb(self):
+        # Rounding would give 0, dither keeps the level on average
+        data = np.full((1, 100000), .25/32767)
+        result = Quantizer(16, seed=1).process(data)
+        self.assertAlmostEqual(result.mean(), .25, delta=.02)
+
+    def test_tpdf_blockSizeIndependent(self):
+        data = self.signal()
+        whole = Quantizer(16, 2, seed=1).process(data)
+        blocks = self.quantizeInBlocks(Quantizer(16, 2, seed=1), data, 333)
+        np_assert_equal(blocks, whole)
+
+    def test_noiseShaping_blockSizeIndependent(self):
+        data = self.signal()
+        whole = Quantizer(16, 2, noise_shaping=True, seed=1).process(data)
+        blocks = self.quantizeInBlocks(
+            Quantizer(16, 2, noise_shaping=True, seed=1), data, 333)
+        np_assert_equal(blocks, whole)
+
+    def test_noiseShaping_highFrequencyNoise(self):
+        silence = np.zeros((1, 1<<16))
+        def bands(quantizer):
+            spectrum = np.abs(np.fft.rfft(quantizer.process(silence)[0]))**2
+            quarter = len(spectrum)//4
+            return spectrum[:quarter].sum(), spectrum[-quarter:].sum()
+        low, high = bands(Quantizer(16, noise_shaping=True, seed=1))
+        self.assertGreater(high, 4*low)
+        low, high = bands(Quantizer(16, seed=1))
+        self.assertLess(high, 2*low)
+
+    def test_badChannels(self):
+        with self.assertRaises(AssertionError) as ctx:
+            Quantizer(16, 2).process(np.zeros((1, 10)))
+        self.assertEqual(format(ctx.exception),
+            "Block has 1 channels, quantizer has 2")
+
+    def test_badDither(self):
+        with self.assertRaises(ValueError) as ctx:
+            Quantizer(16, dither='rpdf')
+        self.assertEqual(format(ctx.exception),
+            "Unsupported dither: 'rpdf'")
+
+
+# vim: et ts=4 sw=4
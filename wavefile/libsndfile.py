@@ -338,6 +338,35 @@ class SF_FORMAT_INFO(ct.Structure):
         ('extension', ct.c_char_p),
     ]
 
+class SF_CUE_POINT(ct.Structure):
+    _fields_ = [
+        ('indx', ct.c_int32),
+        ('position', ct.c_uint32),
+        ('fcc_chunk', ct.c_int32),
+        ('chunk_start', ct.c_int32),
+        ('block_start', ct.c_int32),
+        ('sample_offset', ct.c_uint32),
+        ('name', ct.c_char * 256),
+    ]
+
+def SF_CUES_VAR(count):
+    """Cues structure with room for 'count' cue points,
+    like the C macro of the same name"""
+    class SF_CUES(ct.Structure):
+        _fields_ = [
+            ('cue_count', ct.c_uint32),
+            ('cue_points', SF_CUE_POINT * count),
+        ]
+    return SF_CUES
+
+class SF_CHUNK_INFO(ct.Structure):
+    _fields_ = [
+        ('id', ct.c_char * 64), # The chunk identifier.
+        ('id_size', ct.c_uint), # The size of the chunk identifier.
+        ('datalen', ct.c_uint), # The size of that data.
+        ('data', ct.c_void_p), # Pointer to the data.
+    ]
+
 def __init_lib_methods():
     SNDFILE = ct.c_void_p
 
@@ -345,6 +374,10 @@ def __init_lib_methods():
     _lib.sf_open.restype = SNDFILE
     _lib.sf_open.argtypes = [ct.c_char_p, ct.c_int, ct.POINTER(SF_INFO)]
 
+    #SNDFILE*     sf_open_fd     (int fd, int mode, SF_INFO *sfinfo, int close_desc) ;
+    _lib.sf_open_fd.restype = SNDFILE
+    _lib.sf_open_fd.argtypes = [ct.c_int, ct.c_int, ct.POINTER(SF_INFO), ct.c_int]
+
     #int        sf_error        (SNDFILE *sndfile) ;
     _lib.sf_error.restype = ct.c_int
     _lib.sf_error.argtypes = [SNDFILE]
@@ -446,26 +479,33 @@ def __init_lib_methods():
         _lib.sf_current_byterate.restype = ct.c_int
         _lib.sf_current_byterate.argtypes = [SNDFILE]
 
-    # TODO: Chunks, new undocumented feature in 1.0.26
+    # Chunks, since 1.0.26
+    if hasattr(_lib, 'sf_set_chunk'):
+        #int sf_set_chunk (SNDFILE * sndfile, const SF_CHUNK_INFO * chunk_info) ;
+        _lib.sf_set_chunk.restype = ct.c_int
+        _lib.sf_set_chunk.argtypes = [SNDFILE, ct.POINTER(SF_CHUNK_INFO)]
+
+        SF_CHUNK_ITERATOR = ct.c_void_p
 
-    #struct SF_CHUNK_INFO
-    #{    char        id [64] ;    /* The chunk identifier. */
-    #    unsigned    id_size ;    /* The size of the chunk identifier. */
-    #    unsigned    datalen ;    /* The size of that data. */
-    #    void        *data ;        /* Pointer to the data. */
-    #} ;
+        #SF_CHUNK_ITERATOR * sf_get_chunk_iterator (SNDFILE * sndfile, const SF_CHUNK_INFO * chunk_info) ;
+        _lib.sf_get_chunk_iterator.restype = SF_CHUNK_ITERATOR
+        _lib.sf_get_chunk_iterator.argtypes = [SNDFILE, ct.POINTER(SF_CHUNK_INFO)]
 
-    #typedef struct SF_CHUNK_INFO SF_CHUNK_INFO ;
-    #int sf_set_chunk (SNDFILE * sndfile, const SF_CHUNK_INFO * chunk_info) ;
-    #typedef    struct SF_CHUNK_ITERATOR SF_CHUNK_ITERATOR ;
-    #SF_CHUNK_ITERATOR * sf_get_chunk_iterator (SNDFILE * sndfile, const SF_CHUNK_INFO * chunk_info) ;
-    #SF_CHUNK_ITERATOR * sf_next_chunk_iterator (SF_CHUNK_ITERATOR * iterator) ;
-    #int sf_get_chunk_size (const SF_CHUNK_ITERATOR * it, SF_CHUNK_INFO * chunk_info) ;
-    #int sf_get_chunk_data (const SF_CHUNK_ITERATOR * it, SF_CHUNK_INFO * chunk_info) ;
+        #SF_CHUNK_ITERATOR * sf_next_chunk_iterator (SF_CHUNK_ITERATOR * iterator) ;
+        _lib.sf_next_chunk_iterator.restype = SF_CHUNK_ITERATOR
+        _lib.sf_next_chunk_iterator.argtypes = [SF_CHUNK_ITERATOR]
 
-    # TODO: write_sync
+        #int sf_get_chunk_size (const SF_CHUNK_ITERATOR * it, SF_CHUNK_INFO * chunk_info) ;
+        _lib.sf_get_chunk_size.restype = ct.c_int
+        _lib.sf_get_chunk_size.argtypes = [SF_CHUNK_ITERATOR, ct.POINTER(SF_CHUNK_INFO)]
+
+        #int sf_get_chunk_data (const SF_CHUNK_ITERATOR * it, SF_CHUNK_INFO * chunk_info) ;
+        _lib.sf_get_chunk_data.restype = ct.c_int
+        _lib.sf_get_chunk_data.argtypes = [SF_CHUNK_ITERATOR, ct.POINTER(SF_CHUNK_INFO)]
 
     #void    sf_write_sync    (SNDFILE *sndfile) ;
+    _lib.sf_write_sync.restype = None
+    _lib.sf_write_sync.argtypes = [SNDFILE]
 
 __init_lib_methods()
 
@@ -481,3 +521,8 @@ class SEEK_MODES():
     SF_SEEK_CUR = 1
     SF_SEEK_END = 2
 
+class BITRATE_MODES():
+    SF_BITRATE_MODE_CONSTANT = 0
+    SF_BITRATE_MODE_AVERAGE  = 1
+    SF_BITRATE_MODE_VARIABLE = 2
+
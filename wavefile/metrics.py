@@ -0,0 +1,278 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Process wide metrics of the audio I/O done by every reader and writer,
+exported as a dict or in Prometheus text format.
+
+    from wavefile import metrics
+    m = metrics.enable()
+    m.serve(9105) # or m.write_textfile('/var/lib/node_exporter/wavefile.prom')
+    ...
+    print(m.snapshot()['read']['frames_per_second'])
+
+Metrics are collected using the I/O hook (see set_io_hook),
+so there is no cost until they are enabled.
+
+Copyright 2012 David García Garzón
+
+This file is part of python-wavefile
+
+python-wavefile is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+python-wavefile is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import time
+import threading
+import weakref
+
+from . import wavefile
+from .wavefile import (
+    WaveWriter,
+    set_io_hook,
+)
+
+
+class _Operation(object):
+    """Aggregated counters for reads or writes"""
+
+    def __init__(self, buckets):
+        self.calls = 0
+        self.frames = 0
+        self.bytes = 0
+        self.seconds = 0.
+        self.buckets = [0] * (len(buckets)+1) # last one is +Inf
+
+    def add(self, frames, nbytes, seconds, bucket):
+        self.calls += 1
+        self.frames += frames
+        self.bytes += nbytes
+        self.seconds += seconds
+        self.buckets[bucket] += 1
+
+
+class Metrics(object):
+    """Aggregates the I/O events of all readers and writers.
+    Install it with enable().
+    """
+
+    # Upper bounds, in seconds, of the call duration histogram buckets
+    latencyBuckets = [
+        .00001, .00005, .0001, .0005, .001, .005, .01, .05, .1, .5, 1.,
+    ]
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._next = None
+        self._open = dict(reader=0, writer=0)
+        # Bytes are taken from the handle stats, keep the last seen
+        self._lastBytes = weakref.WeakKeyDictionary()
+        self.reset()
+
+    def reset(self):
+        """Clears all the counters but the open handles"""
+        with self._lock:
+            self._start = time.monotonic()
+            self._operations = dict(
+                read = _Operation(self.latencyBuckets),
+                write = _Operation(self.latencyBuckets),
+            )
+            self._seeks = 0
+            self._seekSeconds = 0.
+            self._opened = dict(reader=0, writer=0)
+            self._errors = 0
+
+    def _bucket(self, seconds):
+        for i, limit in enumerate(self.latencyBuckets):
+            if seconds <= limit: return i
+        return len(self.latencyBuckets)
+
+    def __call__(self, handle, event, frames, seconds):
+        """The I/O hook"""
+        with self._lock:
+            if event in ('read', 'write'):
+                total = handle.stats.bytes
+                nbytes = total - self._lastBytes.get(handle, 0)
+                self._lastBytes[handle] = total
+                self._operations[event].add(frames, nbytes, seconds,
+                    self._bucket(seconds))
+            elif event == 'seek':
+                self._seeks += 1
+                self._seekSeconds += seconds
+            elif event == 'open':
+                kind = self._kind(handle)
+                self._open[kind] += 1
+                self._opened[kind] += 1
+                self._lastBytes[handle] = handle.stats.bytes
+            elif event == 'close':
+                kind = self._kind(handle)
+                self._open[kind] = max(0, self._open[kind] - 1)
+                self._lastBytes.pop(handle, None)
+            elif event == 'error':
+                self._errors += 1
+        if self._next is not None:
+            self._next(handle, event, frames, seconds)
+
+    def _kind(self, handle):
+        return 'writer' if isinstance(handle, WaveWriter) else 'reader'
+
+    def snapshot(self):
+        """Returns the current metrics as a dict.
+        Throughput ('frames_per_second', 'mb_per_second') is averaged
+        since the metrics were enabled or reset, and 'busy' is the
+        fraction of that time spent inside libsndfile.
+        """
+        with self._lock:
+            uptime = max(time.monotonic() - self._start, 1e-9)
+            result = dict(
+                uptime = uptime,
+                open_handles = dict(self._open),
+                opened = dict(self._opened),
+                errors = self._errors,
+                seek = dict(
+                    calls = self._seeks,
+                    seconds = self._seekSeconds,
+                ),
+            )
+            for name, operation in self._operations.items():
+                cumulative = []
+                count = 0
+                for limit, n in zip(self.latencyBuckets + [float('inf')], operation.buckets):
+                    count += n
+                    cumulative.append((limit, count))
+                result[name] = dict(
+                    calls = operation.calls,
+                    frames = operation.frames,
+                    bytes = operation.bytes,
+                    seconds = operation.seconds,
+                    frames_per_second = operation.frames / uptime,
+                    mb_per_second = operation.bytes / uptime / 1e6,
+                    busy = operation.seconds / uptime,
+                    latency = cumulative,
+                )
+        return result
+
+    def prometheus(self):
+        """Returns the metrics in Prometheus text exposition format"""
+        snapshot = self.snapshot()
+        lines = []
+        def metric(name, type, help, samples):
+            lines.append("# HELP wavefile_%s %s"%(name, help))
+            lines.append("# TYPE wavefile_%s %s"%(name, type))
+            for labels, value in samples:
+                labels = ','.join('%s="%s"'%item for item in labels)
+                lines.append("wavefile_%s%s %s"%(name,
+                    '{%s}'%labels if labels else '', _number(value)))
+
+        operations = 'read', 'write'
+        metric('calls_total', 'counter',
+            "Read and write calls to libsndfile",
+            [((('op', op),), snapshot[op]['calls']) for op in operations])
+        metric('frames_total', 'counter',
+            "Frames read and written",
+            [((('op', op),), snapshot[op]['frames']) for op in operations])
+        metric('bytes_total', 'counter',
+            "Bytes moved to or from the audio buffers",
+            [((('op', op),), snapshot[op]['bytes']) for op in operations])
+        metric('io_seconds_total', 'counter',
+            "Seconds spent inside libsndfile reading and writing",
+            [((('op', op),), snapshot[op]['seconds']) for op in operations])
+        metric('frames_per_second', 'gauge',
+            "Average frames per second since the metrics started",
+            [((('op', op),), snapshot[op]['frames_per_second']) for op in operations])
+        metric('busy_ratio', 'gauge',
+            "Fraction of the time spent inside libsndfile since the metrics started",
+            [((('op', op),), snapshot[op]['busy']) for op in operations])
+        metric('seeks_total', 'counter',
+            "Seek calls",
+            [((), snapshot['seek']['calls'])])
+        metric('open_handles', 'gauge',
+            "Readers and writers currently open",
+            [((('kind', kind),), n) for kind, n in sorted(snapshot['open_handles'].items())])
+        metric('opened_total', 'counter',
+            "Readers and writers opened",
+            [((('kind', kind),), n) for kind, n in sorted(snapshot['opened'].items())])
+        metric('errors_total', 'counter',
+            "Files failing to open",
+            [((), snapshot['errors'])])
+        lines.append("# HELP wavefile_call_duration_seconds Duration of read and write calls")
+        lines.append("# TYPE wavefile_call_duration_seconds histogram")
+        for op in operations:
+            for limit, count in snapshot[op]['latency']:
+                lines.append('wavefile_call_duration_seconds_bucket{op="%s",le="%s"} %i'%(
+                    op, '+Inf' if limit == float('inf') else _number(limit), count))
+            lines.append('wavefile_call_duration_seconds_sum{op="%s"} %s'%(
+                op, _number(snapshot[op]['seconds'])))
+            lines.append('wavefile_call_duration_seconds_count{op="%s"} %i'%(
+                op, snapshot[op]['calls']))
+        return '\n'.join(lines) + '\n'
+
+    def write_textfile(self, filename):
+        """Writes the Prometheus text into a file, replacing it
+        atomically, as the node exporter textfile collector expects.
+        """
+        temporary = '%s.%i.tmp'%(filename, os.getpid())
+        with open(temporary, 'w') as f:
+            f.write(self.prometheus())
+        os.replace(temporary, filename)
+
+    def serve(self, port, address='127.0.0.1'):
+        """Serves the Prometheus text by HTTP in a background thread.
+        Use port 0 to pick a free one.
+        Returns the server, call its shutdown() method to stop it.
+        """
+        from http.server import HTTPServer, BaseHTTPRequestHandler
+        metrics = self
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                body = metrics.prometheus().encode('utf8')
+                self.send_response(200)
+                self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+            def log_message(self, format, *args):
+                pass
+        server = HTTPServer((address, port), Handler)
+        thread = threading.Thread(target=server.serve_forever, daemon=True)
+        thread.start()
+        return server
+
+
+def _number(value):
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+_enabled = None
+
+def enable():
+    """Starts collecting metrics, if not already, and returns them.
+    Any previously set I/O hook keeps receiving the events.
+    """
+    global _enabled
+    if _enabled is None:
+        _enabled = Metrics()
+        _enabled._next = set_io_hook(_enabled)
+    return _enabled
+
+def disable():
+    """Stops collecting metrics, restoring the previous I/O hook"""
+    global _enabled
+    if _enabled is None: return
+    if wavefile._ioHook is _enabled:
+        set_io_hook(_enabled._next)
+    _enabled = None
+
+
+# vim: et ts=4 sw=4
@@ -0,0 +1,115 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+import urllib.request
+import numpy as np
+
+from . import wavefile
+from . import metrics
+
+
+class Metrics_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filestoremove = []
+        self.metrics = metrics.enable()
+        self.metrics.reset()
+
+    def tearDown(self):
+        metrics.disable()
+        for file in self.filestoremove:
+            if os.access(file, os.F_OK):
+                os.remove(file)
+
+    def toRemove(self, file):
+        self.filestoremove.append(file)
+
+    def writeAndRead(self):
+        self.toRemove("file.wav")
+        data = np.zeros((2, 1000), np.float32)
+        with wavefile.WaveWriter("file.wav", channels=2) as w:
+            w.write(data)
+        with wavefile.WaveReader("file.wav") as r:
+            r.seek(500)
+            r.read(r.buffer(1000, np.int16))
+
+    def test_enable_sameInstance(self):
+        self.assertIs(metrics.enable(), self.metrics)
+
+    def test_snapshot(self):
+        self.writeAndRead()
+        snapshot = self.metrics.snapshot()
+        self.assertEqual(snapshot['read']['calls'], 1)
+        self.assertEqual(snapshot['read']['frames'], 500)
+        self.assertEqual(snapshot['read']['bytes'], 500*2*2)
+        self.assertEqual(snapshot['write']['frames'], 1000)
+        self.assertEqual(snapshot['write']['bytes'], 1000*2*4)
+        self.assertEqual(snapshot['seek']['calls'], 1)
+        self.assertEqual(snapshot['opened'], dict(reader=1, writer=1))
+        self.assertEqual(snapshot['open_handles'], dict(reader=0, writer=0))
+        self.assertEqual(snapshot['errors'], 0)
+        self.assertGreater(snapshot['read']['frames_per_second'], 0)
+        self.assertEqual(snapshot['read']['latency'][-1], (float('inf'), 1))
+
+    def test_snapshot_openHandles(self):
+        self.writeAndRead()
+        with wavefile.WaveReader("file.wav") as r:
+            self.assertEqual(self.metrics.snapshot()['open_handles'],
+                dict(reader=1, writer=0))
+
+    def test_snapshot_errors(self):
+        with self.assertRaises(IOError):
+            wavefile.WaveReader("notexisting.wav")
+        self.assertEqual(self.metrics.snapshot()['errors'], 1)
+
+    def test_prometheus(self):
+        self.writeAndRead()
+        text = self.metrics.prometheus()
+        self.assertIn('# TYPE wavefile_frames_total counter\n', text)
+        self.assertIn('wavefile_frames_total{op="read"} 500\n', text)
+        self.assertIn('wavefile_frames_total{op="write"} 1000\n', text)
+        self.assertIn('wavefile_open_handles{kind="reader"} 0\n', text)
+        self.assertIn('wavefile_call_duration_seconds_bucket{op="read",le="+Inf"} 1\n', text)
+        self.assertIn('wavefile_call_duration_seconds_count{op="write"} 1\n', text)
+
+    def test_writeTextfile(self):
+        self.toRemove("metrics.prom")
+        self.writeAndRead()
+        self.metrics.write_textfile("metrics.prom")
+        with open("metrics.prom") as f:
+            text = f.read()
+        self.assertIn('wavefile_frames_total{op="read"} 500\n', text)
+        self.assertFalse(os.path.exists("metrics.prom.%i.tmp"%os.getpid()))
+
+    def test_serve(self):
+        self.writeAndRead()
+        server = self.metrics.serve(0)
+        try:
+            url = 'http://127.0.0.1:%i/metrics'%server.server_address[1]
+            with urllib.request.urlopen(url) as response:
+                text = response.read().decode('utf8')
+        finally:
+            server.shutdown()
+            server.server_close()
+        self.assertIn('wavefile_frames_total{op="read"} 500\n', text)
+
+    def test_disable_restoresPreviousHook(self):
+        metrics.disable()
+        events = []
+        hook = lambda handle, event, frames, seconds: events.append(event)
+        previous = wavefile.set_io_hook(hook)
+        try:
+            m = metrics.enable()
+            self.writeAndRead()
+            self.assertEqual(m.snapshot()['write']['calls'], 1)
+            metrics.disable()
+            self.assertIs(wavefile.set_io_hook(hook), hook)
+        finally:
+            wavefile.set_io_hook(previous)
+        self.assertEqual(events, [
+            'open', 'write', 'close', 'open', 'seek', 'read', 'close'])
+
+
+# vim: et ts=4 sw=4
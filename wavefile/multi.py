@@ -0,0 +1,243 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Copyright 2012 David García Garzón
+
+This file is part of python-wavefile
+
+python-wavefile is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+python-wavefile is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor
+
+from .wavefile import (
+    WaveReader,
+    WaveWriter,
+    Format,
+    Seek,
+)
+
+
+class MultiReader(object):
+    """Reads several files of the same length and sample rate in lockstep,
+    as if they were a single file having the channels of all of them,
+    in the order the files are given.
+    If 'threads' is given, files are decoded in parallel by that
+    many threads (libsndfile calls release the GIL).
+    """
+    def __init__(self, filenames, threads=None):
+        filenames = list(filenames)
+        self._readers = []
+        self._executor = None
+        try:
+            for filename in filenames:
+                self._readers.append(WaveReader(filename))
+        except:
+            self.close()
+            raise
+        if not self._readers:
+            raise ValueError("No files given")
+
+        first = self._readers[0]
+        for filename, reader in zip(filenames, self._readers):
+            if reader.samplerate != first.samplerate:
+                self.close()
+                raise ValueError("Sample rate of '%s' is %i, expected %i"%(
+                    filename, reader.samplerate, first.samplerate))
+            if reader.frames != first.frames:
+                self.close()
+                raise ValueError("Length of '%s' is %i frames, expected %i"%(
+                    filename, reader.frames, first.frames))
+
+        offsets = np.cumsum([0] + [r.channels for r in self._readers])
+        self._ranges = list(zip(offsets[:-1], offsets[1:]))
+        self._scratch = [None] * len(self._readers)
+        if threads:
+            self._executor = ThreadPoolExecutor(threads)
+
+    def __enter__(self):
+        return self
+    def __exit__(self, type, value, traceback):
+        self.close()
+        if value: raise
+
+    def close(self):
+        for reader in self._readers:
+            reader.close()
+        self._readers = []
+        if self._executor:
+            self._executor.shutdown()
+            self._executor = None
+
+    @property
+    def readers(self):
+        return list(self._readers)
+
+    @property
+    def channels(self): return sum(r.channels for r in self._readers)
+
+    @property
+    def samplerate(self): return self._readers[0].samplerate
+
+    @property
+    def frames(self): return self._readers[0].frames
+
+    def buffer(self, size, dtype=np.float32):
+        """Provides a properly constructed buffer to read data"""
+        return np.zeros((self.channels, size), dtype, order='F')
+
+    def _readOne(self, i, data):
+        reader = self._readers[i]
+        begin, end = self._ranges[i]
+        frames = data.shape[1]
+        scratch = self._scratch[i]
+        if (scratch is None or scratch.dtype != data.dtype
+                or scratch.shape[1] < frames):
+            scratch = self._scratch[i] = reader.buffer(frames, data.dtype)
+        nframes = reader.read(scratch[:,:frames])
+        data[begin:end,:nframes] = scratch[:,:nframes]
+        return nframes
+
+    def read(self, data):
+        """Reads aligned frames of every file into data,
+        a (channels, frames) array with the channels of all files.
+        Returns the number of frames read.
+        """
+        channels, frames = data.shape
+        assert channels == self.channels, \
+            "Buffer has room for %i channels, files have %i channels"%(
+                channels, self.channels)
+        indexes = range(len(self._readers))
+        if self._executor:
+            nframes = list(self._executor.map(
+                lambda i: self._readOne(i, data), indexes))
+        else:
+            nframes = [self._readOne(i, data) for i in indexes]
+        return min(nframes)
+
+    def read_iter(self, size=512, buffer=None):
+        data = buffer
+        if data is None:
+            data = self.buffer(size)
+        else:
+            assert buffer.shape[0] == self.channels
+            size = buffer.shape[1]
+        nframes = self.read(data)
+        while nframes:
+            yield data[:,:nframes]
+            nframes = self.read(data)
+
+    def seek(self, frames, whence=Seek.SET):
+        """Moves all the files to the same frame, see WaveReader.seek.
+        Returns absolute seek position or -1 if out of scope.
+        """
+        positions = [r.seek(frames, whence) for r in self._readers]
+        if len(set(positions)) != 1:
+            return -1
+        return positions[0]
+
+
+class FanOutWriter(object):
+    """Writes each channel of the written blocks to its own mono file.
+    'filenames' has a file name for every channel.
+    If 'threads' is given, files are encoded in parallel by that
+    many threads.
+    """
+    def __init__(self, filenames,
+            samplerate = 44100,
+            format = Format.WAV | Format.FLOAT,
+            threads = None,
+            ):
+        self._writers = []
+        self._executor = None
+        try:
+            for filename in filenames:
+                self._writers.append(WaveWriter(filename,
+                    samplerate=samplerate,
+                    channels=1,
+                    format=format,
+                ))
+        except:
+            self.close()
+            raise
+        self._rows = None
+        if threads:
+            self._executor = ThreadPoolExecutor(threads)
+
+    def __enter__(self):
+        return self
+    def __exit__(self, type, value, traceback):
+        self.close()
+        if value: raise
+
+    def close(self):
+        if self._executor:
+            self._executor.shutdown()
+            self._executor = None
+        for writer in self._writers:
+            writer.close()
+        self._writers = []
+
+    @property
+    def writers(self):
+        return list(self._writers)
+
+    @property
+    def channels(self): return len(self._writers)
+
+    def write(self, data):
+        """Writes every channel of the (channels, frames) block to its file"""
+        channels, nframes = data.shape
+        assert channels == self.channels, \
+            "Block has %i channels, writer has %i files"%(
+                channels, self.channels)
+        rows = data
+        if not data.flags.c_contiguous:
+            # Contiguous rows are written without copying them.
+            # Reuse a single row-major copy of the block otherwise.
+            rows = self._rows
+            if (rows is None or rows.dtype != data.dtype
+                    or rows.shape[1] < nframes):
+                rows = self._rows = np.zeros((channels, nframes), data.dtype)
+            rows = rows[:,:nframes]
+            rows[:] = data
+        write = lambda i: self._writers[i].write(rows[i:i+1])
+        if self._executor:
+            written = list(self._executor.map(write, range(channels)))
+        else:
+            written = [write(i) for i in range(channels)]
+        return min(written) if written else 0
+
+def split_channels(filename, pattern, format=None, size=65536, threads=None):
+    """Splits a multichannel file into mono files.
+    Output names are built from 'pattern' by replacing '{channel}'
+    by the channel index.
+    The format is the one of the source file unless 'format' is given.
+    Returns the list of created files.
+    """
+    with WaveReader(filename) as r:
+        filenames = [pattern.format(channel=i) for i in range(r.channels)]
+        with FanOutWriter(filenames,
+                samplerate=r.samplerate,
+                format=format or r.format,
+                threads=threads,
+                ) as w:
+            for data in r.read_iter(size):
+                w.write(data)
+    return filenames
+
+
+# vim: et ts=4 sw=4
@@ -0,0 +1,155 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+import numpy as np
+from numpy.testing import (
+    assert_almost_equal as np_assert_almost_equal,
+)
+from . import wavefile
+from .multi import (
+    MultiReader,
+    FanOutWriter,
+    split_channels,
+)
+
+
+class MultiReader_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filestoremove = []
+        random = np.random.RandomState(0)
+        self.stems = [
+            random.uniform(-1, 1, (channels, 1000)).astype(np.float32)
+            for channels in (1, 2, 3)
+        ]
+        self.filenames = []
+        for i, stem in enumerate(self.stems):
+            self.writeWav("stem%i.wav"%i, stem)
+            self.filenames.append("stem%i.wav"%i)
+
+    def tearDown(self):
+        for file in self.filestoremove:
+            if os.access(file, os.F_OK):
+                os.remove(file)
+
+    def writeWav(self, filename, data, samplerate=44100):
+        self.filestoremove.append(filename)
+        with wavefile.WaveWriter(filename, channels=data.shape[0],
+                samplerate=samplerate) as w:
+            w.write(data)
+
+    def test_properties(self):
+        with MultiReader(self.filenames) as r:
+            self.assertEqual(r.channels, 6)
+            self.assertEqual(r.frames, 1000)
+            self.assertEqual(r.samplerate, 44100)
+
+    def test_read(self):
+        with MultiReader(self.filenames) as r:
+            data = r.buffer(1500)
+            self.assertEqual(r.read(data), 1000)
+        np_assert_almost_equal(data[:,:1000], np.concatenate(self.stems))
+
+    def test_readIter(self):
+        with MultiReader(self.filenames) as r:
+            result = np.concatenate([
+                block.copy() for block in r.read_iter(300)
+            ], axis=1)
+        np_assert_almost_equal(result, np.concatenate(self.stems))
+
+    def test_readIter_threaded(self):
+        with MultiReader(self.filenames, threads=3) as r:
+            result = np.concatenate([
+                block.copy() for block in r.read_iter(300)
+            ], axis=1)
+        np_assert_almost_equal(result, np.concatenate(self.stems))
+
+    def test_seek(self):
+        with MultiReader(self.filenames) as r:
+            self.assertEqual(r.seek(400), 400)
+            data = r.buffer(100)
+            r.read(data)
+        np_assert_almost_equal(data, np.concatenate(self.stems)[:,400:500])
+
+    def test_differentLength_fails(self):
+        self.writeWav("short.wav", np.zeros((1,999), np.float32))
+        with self.assertRaises(ValueError) as ctx:
+            MultiReader(self.filenames + ["short.wav"])
+        self.assertEqual(format(ctx.exception),
+            "Length of 'short.wav' is 999 frames, expected 1000")
+
+    def test_differentSamplerate_fails(self):
+        self.writeWav("other.wav", np.zeros((1,1000), np.float32), samplerate=48000)
+        with self.assertRaises(ValueError) as ctx:
+            MultiReader(self.filenames + ["other.wav"])
+        self.assertEqual(format(ctx.exception),
+            "Sample rate of 'other.wav' is 48000, expected 44100")
+
+    def test_badChannels(self):
+        with MultiReader(self.filenames) as r:
+            with self.assertRaises(AssertionError) as ctx:
+                r.read(np.zeros((5, 10), np.float32))
+        self.assertEqual(format(ctx.exception),
+            "Buffer has room for 5 channels, files have 6 channels")
+
+
+class FanOutWriter_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filestoremove = []
+        self.data = np.random.RandomState(0).uniform(-1, 1, (3, 1000)).astype(np.float32)
+        self.filenames = ["out%i.wav"%i for i in range(3)]
+        self.filestoremove += self.filenames
+
+    def tearDown(self):
+        for file in self.filestoremove:
+            if os.access(file, os.F_OK):
+                os.remove(file)
+
+    def assertSplit(self):
+        for filename, channel in zip(self.filenames, self.data):
+            samplerate, data = wavefile.load(filename)
+            np_assert_almost_equal(data, channel[np.newaxis,:])
+
+    def test_write_rowMajor(self):
+        with FanOutWriter(self.filenames) as w:
+            self.assertEqual(w.write(self.data), 1000)
+        self.assertSplit()
+
+    def test_write_columnMajor(self):
+        with FanOutWriter(self.filenames) as w:
+            for i in range(0, 1000, 300):
+                w.write(np.asfortranarray(self.data[:,i:i+300]))
+        self.assertSplit()
+
+    def test_write_threaded(self):
+        with FanOutWriter(self.filenames, threads=3) as w:
+            w.write(self.data)
+        self.assertSplit()
+
+    def test_write_badChannels(self):
+        with FanOutWriter(self.filenames) as w:
+            with self.assertRaises(AssertionError) as ctx:
+                w.write(self.data[:2])
+        self.assertEqual(format(ctx.exception),
+            "Block has 2 channels, writer has 3 files")
+
+    def test_splitChannels(self):
+        self.filestoremove.append("input.wav")
+        with wavefile.WaveWriter("input.wav", channels=3, samplerate=22050,
+                format=wavefile.Format.WAV|wavefile.Format.PCM_16) as w:
+            w.write(self.data)
+        filenames = split_channels("input.wav", "out{channel}.wav", size=300)
+        self.assertEqual(filenames, self.filenames)
+        with wavefile.WaveReader("out1.wav") as r:
+            self.assertEqual(r.channels, 1)
+            self.assertEqual(r.samplerate, 22050)
+            self.assertEqual(r.format, wavefile.Format.WAV|wavefile.Format.PCM_16)
+        for filename, channel in zip(self.filenames, self.data):
+            samplerate, data = wavefile.load(filename)
+            np_assert_almost_equal(data, channel[np.newaxis,:], decimal=4)
+
+
+# vim: et ts=4 sw=4
@@ -0,0 +1,238 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Block processing pipelines: a source (a WaveReader),
+a chain of processing stages and one or more sinks (WaveWriters).
+
+Buffers are allocated once, when the pipeline is built.
+Stages write their output into a given array (numpy 'out' semantics),
+and stages not changing the number of channels work in place,
+so no array is allocated while running.
+
+    with WaveReader('in.wav') as r, WaveWriter('out.wav',
+            channels=2, samplerate=r.samplerate) as w:
+        p = Pipeline(r, [Gain(.8), Mix(downmix)], [w])
+        p.run()
+        print(p.report())
+
+Copyright 2012 David García Garzón
+
+This file is part of python-wavefile
+
+python-wavefile is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+python-wavefile is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import time
+import numpy as np
+
+
+class Stage(object):
+    """Base class for pipeline stages.
+    Subclasses redefine process() and, if they change the number
+    of channels, outputChannels().
+    """
+
+    def outputChannels(self, channels):
+        """Number of output channels given the number of input ones"""
+        return channels
+
+    @property
+    def inplace(self):
+        return True
+
+    def setup(self, channels, blockSize, dtype):
+        """Called once before running to preallocate state"""
+        pass
+
+    def process(self, data, out):
+        """Computes 'out' from 'data'. For inplace stages, they are the same array."""
+        raise NotImplementedError()
+
+    @property
+    def name(self):
+        return type(self).__name__
+
+
+class Gain(Stage):
+    """Multiplies every channel by a gain, or a per channel gain sequence"""
+
+    def __init__(self, gain):
+        self.gain = gain
+
+    def setup(self, channels, blockSize, dtype):
+        gain = np.asarray(self.gain, dtype)
+        self._gain = gain.reshape(-1,1) if gain.ndim else gain
+
+    def process(self, data, out):
+        np.multiply(data, self._gain, out=out)
+
+
+class Mix(Stage):
+    """Mixes the input channels with a (outchannels, inchannels) matrix"""
+
+    def __init__(self, matrix):
+        self.matrix = np.asarray(matrix)
+        assert self.matrix.ndim == 2, "Mix matrix should be 2D"
+
+    @property
+    def inplace(self):
+        return False
+
+    def outputChannels(self, channels):
+        outchannels, inchannels = self.matrix.shape
+        assert inchannels == channels, \
+            "Mix matrix expects %i channels but receives %i"%(
+                inchannels, channels)
+        return outchannels
+
+    def setup(self, channels, blockSize, dtype):
+        self._matrix = self.matrix.astype(dtype)
+
+    def process(self, data, out):
+        np.matmul(self._matrix, data, out=out)
+
+
+class Fir(Stage):
+    """Applies a FIR filter with the given taps to every channel.
+    Filter state is kept between blocks.
+    """
+
+    def __init__(self, taps):
+        self.taps = np.asarray(taps).ravel()
+
+    def setup(self, channels, blockSize, dtype):
+        self._taps = self.taps.astype(dtype)
+        history = len(self._taps) - 1
+        # Previous input frames followed by the current block
+        self._input = np.zeros((channels, history + blockSize), dtype)
+        self._term = np.zeros((channels, blockSize), dtype)
+
+    def process(self, data, out):
+        history = len(self._taps) - 1
+        nframes = data.shape[1]
+        x = self._input[:, :history + nframes]
+        x[:, history:] = data
+        term = self._term[:, :nframes]
+        np.multiply(x[:, history:], self._taps[0], out=out)
+        for k in range(1, history + 1):
+            np.multiply(x[:, history-k:history-k+nframes], self._taps[k], out=term)
+            out += term
+        x[:, :history] = x[:, nframes:nframes+history]
+
+
+class Callback(Stage):
+    """Calls function(data, out) on every block.
+    If 'channels' is given, the output has that number of channels
+    and 'out' is a different array, else the function should
+    modify 'data' in place (data and out are the same array).
+    """
+
+    def __init__(self, function, channels=None):
+        self.function = function
+        self.channels = channels
+
+    @property
+    def inplace(self):
+        return self.channels is None
+
+    def outputChannels(self, channels):
+        return channels if self.channels is None else self.channels
+
+    def process(self, data, out):
+        self.function(data, out)
+
+    @property
+    def name(self):
+        return getattr(self.function, '__name__', 'Callback')
+
+
+class Pipeline(object):
+    """Reads blocks from 'source', passes them through 'stages'
+    and writes the result to every writer in 'sinks'.
+    """
+
+    def __init__(self, source, stages=(), sinks=(), blockSize=512, dtype=np.float32):
+        self.source = source
+        self.stages = list(stages)
+        self.sinks = list(sinks)
+        self.blockSize = blockSize
+
+        self._input = source.buffer(blockSize, dtype)
+        channels = self._input.shape[0]
+        self._buffers = []
+        current = self._input
+        for stage in self.stages:
+            outchannels = stage.outputChannels(channels)
+            stage.setup(channels, blockSize, dtype)
+            if not stage.inplace:
+                current = np.zeros((outchannels, blockSize), dtype, order='F')
+            self._buffers.append(current)
+            channels = outchannels
+        self.channels = channels
+
+        self._names = ['read'] + [
+            '%i:%s'%(i, stage.name)
+            for i, stage in enumerate(self.stages)
+        ] + ['write']
+        self.reset()
+
+    def reset(self):
+        """Clears the timing counters"""
+        self._times = [0.] * len(self._names)
+        self.frames = 0
+
+    @property
+    def timings(self):
+        """Seconds spent in each stage, including 'read' and 'write'"""
+        return dict(zip(self._names, self._times))
+
+    def report(self):
+        """Returns a text table with the time spent in each stage"""
+        total = sum(self._times) or 1.
+        return ''.join(
+            "{:>20} {:10.6f}s {:6.2f}%\n".format(name, seconds, 100.*seconds/total)
+            for name, seconds in zip(self._names, self._times)
+        )
+
+    def step(self):
+        """Processes a single block, returns the number of frames, 0 at the end"""
+        times = self._times
+        now = time.perf_counter
+        t0 = now()
+        nframes = self.source.read(self._input)
+        t1 = now()
+        times[0] += t1 - t0
+        if not nframes:
+            return 0
+        data = self._input[:,:nframes]
+        for i, (stage, buffer) in enumerate(zip(self.stages, self._buffers)):
+            out = buffer[:,:nframes]
+            stage.process(data, out)
+            data = out
+            t0, t1 = t1, now()
+            times[i+1] += t1 - t0
+        for sink in self.sinks:
+            sink.write(data)
+        times[-1] += now() - t1
+        self.frames += nframes
+        return nframes
+
+    def run(self):
+        """Processes the whole source, returns the number of frames processed"""
+        while self.step(): pass
+        return self.frames
+
+
+# vim: et ts=4 sw=4
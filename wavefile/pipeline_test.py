@@ -0,0 +1,103 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import unittest
+import numpy as np
+from numpy.testing import (
+    assert_almost_equal as np_assert_almost_equal,
+)
+from . import wavefile
+from .pipeline import (
+    Pipeline,
+    Gain,
+    Mix,
+    Fir,
+    Callback,
+)
+
+
+class Pipeline_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filestoremove = []
+        self.data = np.random.RandomState(0).uniform(-.5, .5, (2, 1000)).astype(np.float32)
+        wavefile.save("input.wav", self.data, 44100)
+        self.toRemove("input.wav")
+
+    def tearDown(self):
+        for file in self.filestoremove:
+            if os.access(file, os.F_OK):
+                os.remove(file)
+
+    def toRemove(self, file):
+        self.filestoremove.append(file)
+
+    def process(self, stages, channels=2, blockSize=300):
+        self.toRemove("output.wav")
+        with wavefile.WaveReader("input.wav") as r:
+            with wavefile.WaveWriter("output.wav", channels=channels) as w:
+                p = Pipeline(r, stages, [w], blockSize=blockSize)
+                self.assertEqual(p.run(), 1000)
+        return wavefile.load("output.wav")[1], p
+
+    def test_noStages_copies(self):
+        result, p = self.process([])
+        np_assert_almost_equal(result, self.data)
+
+    def test_gain(self):
+        result, p = self.process([Gain(.8)])
+        np_assert_almost_equal(result, .8*self.data)
+
+    def test_gain_perChannel(self):
+        result, p = self.process([Gain([.5, 2.])])
+        np_assert_almost_equal(result, self.data * [[.5], [2.]], decimal=6)
+
+    def test_mix(self):
+        matrix = [[.5, .5]]
+        result, p = self.process([Mix(matrix)], channels=1)
+        np_assert_almost_equal(result, np.dot(matrix, self.data), decimal=6)
+
+    def test_mix_badChannels(self):
+        with wavefile.WaveReader("input.wav") as r:
+            with self.assertRaises(AssertionError) as ctx:
+                Pipeline(r, [Mix([[1,1,1]])])
+        self.assertEqual(format(ctx.exception),
+            "Mix matrix expects 3 channels but receives 2")
+
+    def test_fir_keepsStateAcrossBlocks(self):
+        taps = [.5, .3, .2]
+        result, p = self.process([Fir(taps)], blockSize=7)
+        expected = np.array([
+            np.convolve(channel, taps)[:1000]
+            for channel in self.data
+        ])
+        np_assert_almost_equal(result, expected, decimal=6)
+
+    def test_callback_inplace(self):
+        def invert(data, out):
+            np.negative(data, out=out)
+        result, p = self.process([Callback(invert)])
+        np_assert_almost_equal(result, -self.data)
+        self.assertIn('0:invert', p.timings)
+
+    def test_callback_changingChannels(self):
+        def left(data, out):
+            out[:] = data[:1]
+        result, p = self.process([Callback(left, channels=1)], channels=1)
+        np_assert_almost_equal(result, self.data[:1])
+
+    def test_timings(self):
+        result, p = self.process([Gain(.8), Mix([[1, 0]])], channels=1)
+        self.assertEqual(sorted(p.timings), ['0:Gain', '1:Mix', 'read', 'write'])
+        self.assertEqual(len(p.report().splitlines()), 4)
+
+    def test_buffers_reusedAcrossBlocks(self):
+        blocks = []
+        def spy(data, out):
+            blocks.append(data.__array_interface__['data'][0])
+        result, p = self.process([Callback(spy)], blockSize=100)
+        self.assertEqual(len(set(blocks)), 1)
+
+
+# vim: et ts=4 sw=4
@@ -0,0 +1,136 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Copyright 2012 David García Garzón
+
+This file is part of python-wavefile
+
+python-wavefile is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+python-wavefile is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+import mmap
+import threading
+import numpy as np
+
+
+class BufferPool(object):
+    """Recycles audio arrays, so that processing many files one
+    after another does not allocate (and page fault) fresh memory
+    for each of them.
+
+    Arrays are taken with get() and given back with put(),
+    and read_iter(), load() and save() take a 'pool' to do so.
+    Memory is handled in size classes, powers of two from 'min_size'
+    bytes, so an array serves any later request of its class.
+    'alignment' aligns arrays to that many bytes (ie. 64, a cache line)
+    or to the memory page, with 'page'.
+    'max_bytes' limits the memory kept idle in the pool,
+    blocks given back beyond it are released.
+    Arrays are not cleared when reused.
+
+    'high_water' is the maximum memory held at once, idle or in use,
+    and so the memory the pool needs for the job.
+    """
+
+    def __init__(self, max_bytes=None, alignment=None, min_size=4096):
+        if alignment == 'page':
+            alignment = mmap.PAGESIZE
+        alignment = alignment or 0
+        if alignment & (alignment - 1):
+            raise ValueError("Alignment should be a power of two, got %s"%alignment)
+        self.alignment = alignment
+        self.max_bytes = max_bytes
+        self.min_size = min_size
+        self._lock = threading.Lock()
+        self._free = {} # size class -> blocks
+        self._lent = {} # id of the memory -> (memory, size class)
+        self.clear()
+        self.high_water = 0
+        self.hits = 0
+        self.misses = 0
+
+    def _sizeClass(self, nbytes):
+        size = self.min_size
+        while size < nbytes:
+            size <<= 1
+        return size
+
+    def _allocate(self, size):
+        memory = np.empty(size + self.alignment, np.uint8)
+        offset = -memory.ctypes.data % self.alignment if self.alignment else 0
+        return memory, offset
+
+    def get(self, channels, frames, dtype=np.float32):
+        """Returns a column-major (channels, frames) array,
+        like WaveReader.buffer does, with undefined content"""
+        dtype = np.dtype(dtype)
+        nbytes = channels * frames * dtype.itemsize
+        size = self._sizeClass(nbytes)
+        with self._lock:
+            free = self._free.get(size)
+            block = free.pop() if free else None
+            if block is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.idle_bytes -= size
+            self.in_use_bytes += size
+            self.high_water = max(self.high_water, self.in_use_bytes + self.idle_bytes)
+        if block is None:
+            block = self._allocate(size)
+        memory, offset = block
+        with self._lock:
+            self._lent[id(memory)] = memory, offset, size
+        raw = memory[offset:offset+nbytes]
+        return raw.view(dtype).reshape((frames, channels)).T
+
+    def put(self, array):
+        """Gives back an array obtained from get()"""
+        memory = array
+        while memory.base is not None:
+            memory = memory.base
+        with self._lock:
+            lent = self._lent.get(id(memory))
+            if lent is None or lent[0] is not memory:
+                raise ValueError("Array not lent by this pool")
+            del self._lent[id(memory)]
+            memory, offset, size = lent
+            self.in_use_bytes -= size
+            if self.max_bytes is not None and self.idle_bytes + size > self.max_bytes:
+                return # released
+            self._free.setdefault(size, []).append((memory, offset))
+            self.idle_bytes += size
+
+    def clear(self):
+        """Releases the idle memory"""
+        with self._lock:
+            self._free = {}
+            self.idle_bytes = 0
+            self.in_use_bytes = sum(size for memory, offset, size in self._lent.values())
+
+    def stats(self):
+        """Returns the memory use of the pool as a dict"""
+        with self._lock:
+            return dict(
+                in_use_bytes = self.in_use_bytes,
+                idle_bytes = self.idle_bytes,
+                high_water = self.high_water,
+                hits = self.hits,
+                misses = self.misses,
+            )
+
+
+# vim: et ts=4 sw=4
@@ -0,0 +1,137 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import mmap
+import unittest
+import numpy as np
+from numpy.testing import (
+    assert_array_equal as np_assert_equal,
+)
+from . import wavefile
+from .pool import BufferPool
+
+
+class BufferPool_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filestoremove = []
+
+    def tearDown(self):
+        for file in self.filestoremove:
+            if os.access(file, os.F_OK):
+                os.remove(file)
+
+    def toRemove(self, file):
+        self.filestoremove.append(file)
+
+    def test_get_layout(self):
+        pool = BufferPool()
+        data = pool.get(2, 100, np.int16)
+        self.assertEqual(data.shape, (2, 100))
+        self.assertEqual(data.dtype, np.int16)
+        self.assertTrue(data.flags.f_contiguous)
+        self.assertTrue(data.flags.writeable)
+
+    def test_put_reusesMemory(self):
+        pool = BufferPool()
+        first = pool.get(2, 1000)
+        address = first.ctypes.data
+        pool.put(first)
+        second = pool.get(1, 1500) # same size class
+        self.assertEqual(second.ctypes.data, address)
+        self.assertEqual(pool.stats(), dict(
+            in_use_bytes = 8192,
+            idle_bytes = 0,
+            high_water = 8192,
+            hits = 1,
+            misses = 1,
+        ))
+
+    def test_get_differentClass_allocates(self):
+        pool = BufferPool()
+        pool.put(pool.get(1, 100))
+        pool.get(1, 10000)
+        self.assertEqual(pool.misses, 2)
+        self.assertEqual(pool.high_water, 4096 + 65536)
+
+    def test_alignment(self):
+        for alignment, expected in [(64, 64), ('page', mmap.PAGESIZE)]:
+            pool = BufferPool(alignment=alignment)
+            for frames in 1, 3, 1000:
+                data = pool.get(3, frames)
+                self.assertEqual(data.ctypes.data % expected, 0)
+
+    def test_badAlignment(self):
+        with self.assertRaises(ValueError) as ctx:
+            BufferPool(alignment=48)
+        self.assertEqual(format(ctx.exception),
+            "Alignment should be a power of two, got 48")
+
+    def test_maxBytes_releasesBeyondBudget(self):
+        pool = BufferPool(max_bytes=5000)
+        arrays = [pool.get(1, 1000) for i in range(3)]
+        for array in arrays:
+            pool.put(array)
+        self.assertEqual(pool.idle_bytes, 4096)
+        self.assertEqual(pool.high_water, 3*4096)
+
+    def test_put_twice(self):
+        pool = BufferPool()
+        data = pool.get(1, 100)
+        pool.put(data)
+        with self.assertRaises(ValueError) as ctx:
+            pool.put(data)
+        self.assertEqual(format(ctx.exception), "Array not lent by this pool")
+
+    def test_put_foreignArray(self):
+        with self.assertRaises(ValueError):
+            BufferPool().put(np.zeros((1, 100)))
+
+    def test_clear(self):
+        pool = BufferPool()
+        kept = pool.get(1, 100)
+        pool.put(pool.get(1, 10000))
+        pool.clear()
+        self.assertEqual(pool.idle_bytes, 0)
+        self.assertEqual(pool.in_use_bytes, 4096)
+
+    def test_loadAndSave(self):
+        self.toRemove("file.wav")
+        pool = BufferPool()
+        data = np.ascontiguousarray(
+            np.random.RandomState(0).uniform(-1, 1, (2, 1000)).astype(np.float32))
+        wavefile.save("file.wav", data, 44100, pool=pool)
+        self.assertEqual(pool.in_use_bytes, 0)
+        self.assertEqual(pool.misses, 1) # staging block for C order data
+        samplerate, loaded = wavefile.load("file.wav", pool=pool)
+        np_assert_equal(loaded, data)
+        self.assertEqual(pool.in_use_bytes, 8192)
+        pool.put(loaded)
+        samplerate, loaded = wavefile.load("file.wav", pool=pool)
+        self.assertEqual(pool.hits, 1)
+
+    def test_readIter(self):
+        self.toRemove("file.wav")
+        data = np.arange(1000, dtype=np.float32)[np.newaxis]/1000
+        wavefile.save("file.wav", data, 44100)
+        pool = BufferPool()
+        with wavefile.WaveReader("file.wav") as r:
+            blocks = [block.copy() for block in r.read_iter(300, pool=pool)]
+        np_assert_equal(np.concatenate(blocks, axis=1), data)
+        self.assertEqual(pool.in_use_bytes, 0)
+        self.assertEqual(pool.idle_bytes, 4096)
+
+    def test_readIter_givenBackWhenAbandoned(self):
+        self.toRemove("file.wav")
+        wavefile.save("file.wav", np.zeros((1, 1000), np.float32), 44100)
+        pool = BufferPool()
+        with wavefile.WaveReader("file.wav") as r:
+            blocks = r.read_iter(300, pool=pool)
+            next(blocks)
+            self.assertEqual(pool.in_use_bytes, 4096)
+            blocks.close()
+        self.assertEqual(pool.in_use_bytes, 0)
+
+
+# vim: et ts=4 sw=4
@@ -0,0 +1,183 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Repairs the headers of WAV, RF64 and W64 files left behind by
+a recording that did not close the file properly,
+so that their size fields account for all the audio in the file.
+
+Usage: python -m wavefile.repair file1.wav [file2.w64...]
+
+Copyright 2012 David García Garzón
+
+This file is part of python-wavefile
+
+python-wavefile is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+python-wavefile is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import os
+import struct
+
+_w64suffix = bytes.fromhex('f3acd3118cd100c04f8edb8a')
+_w64riff = b'riff' + bytes.fromhex('2e91cf11a5d628db04c10000')
+_w64wave = b'wave' + _w64suffix
+
+
+def _chunksFitUntil(f, position, end, endian):
+    """True if a chain of RIFF chunks fills exactly [position, end)"""
+    while position + 8 <= end:
+        f.seek(position)
+        chunkid, size = struct.unpack(endian+'4sI', f.read(8))
+        if not all(32 <= c < 127 for c in chunkid):
+            return False
+        position += 8 + size + (size & 1)
+    return position == end
+
+def _w64ChunksFitUntil(f, position, end):
+    """True if a chain of W64 chunks fills exactly [position, end)"""
+    while position + 24 <= end:
+        f.seek(position + 16)
+        size = struct.unpack('<Q', f.read(8))[0]
+        if size < 24:
+            return False
+        position += size + (-size % 8)
+    return position == end
+
+def _riffChunks(f, position, end, endian):
+    """Returns the offsets of the relevant chunk payloads and their sizes"""
+    chunks = {}
+    while position + 8 <= end:
+        f.seek(position)
+        chunkid, size = struct.unpack(endian+'4sI', f.read(8))
+        chunks[chunkid] = position + 8, size
+        if chunkid == b'data':
+            break # may be wrong, do not trust the size
+        position += 8 + size + (size & 1)
+    return chunks
+
+def _blockAlign(f, offset, endian):
+    f.seek(offset + 12)
+    return struct.unpack(endian+'H', f.read(2))[0] or 1
+
+def _repairRiff(f, filesize, endian):
+    chunks = _riffChunks(f, 12, filesize, endian)
+    if b'data' not in chunks or b'fmt ' not in chunks:
+        raise ValueError("No data or format chunk found")
+    dataOffset, dataSize = chunks[b'data']
+    blockAlign = _blockAlign(f, chunks[b'fmt '][0], endian)
+    dataEnd = dataOffset + dataSize + (dataSize & 1)
+    if dataSize and dataEnd <= filesize and _chunksFitUntil(f, dataEnd, filesize, endian):
+        return dataSize // blockAlign # consistent header, keep trailing chunks
+    available = filesize - dataOffset
+    available -= available % blockAlign
+    if available > 0xFFFFFFFF - dataOffset:
+        raise ValueError("Audio does not fit a RIFF file, it should be RF64")
+    f.seek(4)
+    f.write(struct.pack(endian+'I', dataOffset + available - 8))
+    f.seek(dataOffset - 4)
+    f.write(struct.pack(endian+'I', available))
+    _updateFact(f, chunks, available // blockAlign, endian)
+    return available // blockAlign
+
+def _updateFact(f, chunks, frames, endian):
+    if b'fact' not in chunks: return
+    factOffset, factSize = chunks[b'fact']
+    if factSize < 4: return
+    f.seek(factOffset)
+    f.write(struct.pack(endian+'I', min(frames, 0xFFFFFFFF)))
+
+def _repairRf64(f, filesize):
+    f.seek(12)
+    chunkid, size = struct.unpack('<4sI', f.read(8))
+    if chunkid != b'ds64':
+        raise ValueError("RF64 file without ds64 chunk")
+    chunks = _riffChunks(f, 12, filesize, '<')
+    if b'data' not in chunks or b'fmt ' not in chunks:
+        raise ValueError("No data or format chunk found")
+    dataOffset = chunks[b'data'][0]
+    f.seek(28)
+    dataSize = struct.unpack('<Q', f.read(8))[0]
+    blockAlign = _blockAlign(f, chunks[b'fmt '][0], '<')
+    dataEnd = dataOffset + dataSize + (dataSize & 1)
+    if dataSize and dataEnd <= filesize and _chunksFitUntil(f, dataEnd, filesize, '<'):
+        return dataSize // blockAlign # consistent header, keep trailing chunks
+    available = filesize - dataOffset
+    available -= available % blockAlign
+    frames = available // blockAlign
+    f.seek(20)
+    f.write(struct.pack('<QQQ', dataOffset + available - 8, available, frames))
+    _updateFact(f, chunks, frames, '<')
+    return frames
+
+def _repairW64(f, filesize):
+    f.seek(24)
+    if f.read(16) != _w64wave:
+        raise ValueError("W64 file without wave identifier")
+    position = 40
+    fmtOffset = None
+    while position + 24 <= filesize:
+        f.seek(position)
+        guid, size = struct.unpack('<16sQ', f.read(24))
+        if guid == b'fmt ' + _w64suffix:
+            fmtOffset = position + 24
+        if guid == b'data' + _w64suffix:
+            break
+        position += size + (-size % 8)
+    else:
+        raise ValueError("No data chunk found")
+    if fmtOffset is None:
+        raise ValueError("No format chunk found")
+    dataOffset = position + 24
+    dataSize = max(0, size - 24)
+    blockAlign = _blockAlign(f, fmtOffset, '<')
+    dataEnd = position + size + (-size % 8)
+    if dataSize and dataEnd <= filesize and _w64ChunksFitUntil(f, dataEnd, filesize):
+        return dataSize // blockAlign # consistent header, keep trailing chunks
+    available = filesize - dataOffset
+    available -= available % blockAlign
+    f.seek(16)
+    f.write(struct.pack('<Q', dataOffset + available))
+    f.seek(position + 16)
+    f.write(struct.pack('<Q', available + 24))
+    return available // blockAlign
+
+def repair(filename):
+    """Fixes in place the header of a WAV, RF64 or W64 file
+    whose recording was interrupted, so that it accounts for all
+    the complete frames present in the file.
+    Returns the number of frames in the repaired file.
+    """
+    filesize = os.path.getsize(filename)
+    with open(filename, 'r+b') as f:
+        magic = f.read(16)
+        if magic[:4] == b'RIFF' and magic[8:12] == b'WAVE':
+            frames = _repairRiff(f, filesize, '<')
+        elif magic[:4] == b'RIFX' and magic[8:12] == b'WAVE':
+            frames = _repairRiff(f, filesize, '>')
+        elif magic[:4] == b'RF64' and magic[8:12] == b'WAVE':
+            frames = _repairRf64(f, filesize)
+        elif magic == _w64riff:
+            frames = _repairW64(f, filesize)
+        else:
+            raise ValueError("'%s' is not a WAV, RF64 or W64 file"%filename)
+    return frames
+
+
+if __name__ == '__main__':
+    import sys
+    for filename in sys.argv[1:]:
+        print("%s: %i frames"%(filename, repair(filename)))
+
+
+# vim: et ts=4 sw=4
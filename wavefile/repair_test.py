@@ -0,0 +1,143 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import shutil
+import unittest
+import numpy as np
+from numpy.testing import (
+    assert_almost_equal as np_assert_almost_equal,
+)
+from . import wavefile
+from .wavefile import Format
+from .repair import repair
+
+
+class Repair_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.filestoremove = []
+        self.data = np.random.RandomState(0).uniform(-.5, .5, (2, 1001)).astype(np.float32)
+
+    def tearDown(self):
+        for file in self.filestoremove:
+            if os.access(file, os.F_OK):
+                os.remove(file)
+
+    def toRemove(self, file):
+        self.filestoremove.append(file)
+
+    def crashedRecording(self, filename, format, **kwds):
+        """Copies the file while it is being written, like a crash would leave it"""
+        self.toRemove(filename)
+        self.toRemove("crashed_"+filename)
+        with wavefile.WaveWriter(filename, channels=2, format=format, **kwds) as w:
+            w.write(self.data)
+            shutil.copy(filename, "crashed_"+filename)
+        return "crashed_"+filename
+
+    def assertRepairs(self, filename, format, **kwds):
+        crashed = self.crashedRecording(filename, format, **kwds)
+        self.assertEqual(repair(crashed), 1001)
+        with open(filename, 'rb') as f: expected = f.read()
+        with open(crashed, 'rb') as f: result = f.read()
+        self.assertEqual(result, expected)
+
+    def test_repair_wavFloat(self):
+        # PEAK chunk is only filled on close, so compare the audio
+        crashed = self.crashedRecording("file.wav", Format.WAV|Format.FLOAT)
+        self.assertEqual(repair(crashed), 1001)
+        samplerate, data = wavefile.load(crashed)
+        np_assert_almost_equal(data, self.data)
+
+    def test_repair_wavPcm16(self):
+        self.assertRepairs("file.wav", Format.WAV|Format.PCM_16)
+
+    def test_repair_wavBigEndian(self):
+        self.assertRepairs("file.wav", Format.WAV|Format.PCM_16|Format.ENDIAN_BIG)
+
+    def test_repair_rf64(self):
+        self.assertRepairs("file.rf64", Format.RF64|Format.PCM_16,
+            rf64_downgrade=False)
+
+    def test_repair_rf64Downgradable(self):
+        self.assertRepairs("file.rf64", Format.RF64|Format.PCM_16)
+
+    def test_repair_w64(self):
+        self.assertRepairs("file.w64", Format.W64|Format.PCM_16)
+
+    def test_repair_incompleteFrame_isDropped(self):
+        crashed = self.crashedRecording("file.wav", Format.WAV|Format.PCM_16)
+        with open(crashed, 'ab') as f:
+            f.write(b'\0')
+        self.assertEqual(repair(crashed), 1001)
+
+    def test_repair_consistentFile_untouched(self):
+        self.toRemove("file.wav")
+        with wavefile.WaveWriter("file.wav", channels=2) as w:
+            w.metadata.title = "A title" # adds a LIST chunk after data
+            w.write(self.data)
+        with open("file.wav", 'rb') as f: expected = f.read()
+        self.assertEqual(repair("file.wav"), 1001)
+        with open("file.wav", 'rb') as f: result = f.read()
+        self.assertEqual(result, expected)
+
+    def test_repair_consistentRf64_untouched(self):
+        self.toRemove("file.rf64")
+        with wavefile.WaveWriter("file.rf64", channels=2,
+                format=Format.RF64|Format.PCM_16, rf64_downgrade=False) as w:
+            w.write(self.data)
+            w.metadata.title = "A title" # adds a LIST chunk after data
+        with open("file.rf64", 'rb') as f: expected = f.read()
+        self.assertEqual(repair("file.rf64"), 1001)
+        with open("file.rf64", 'rb') as f: result = f.read()
+        self.assertEqual(result, expected)
+        with wavefile.WaveReader("file.rf64") as r:
+            self.assertEqual(r.metadata.title, "A title")
+
+    def test_repair_consistentW64_untouched(self):
+        import struct
+        self.toRemove("file.w64")
+        with wavefile.WaveWriter("file.w64", channels=2,
+                format=Format.W64|Format.PCM_16) as w:
+            w.write(self.data)
+        # libsndfile writes no chunks after the audio, append one
+        guid = bytes.fromhex('bc945f92 5a52 d211 86dc 00c04f8edb8a'.replace(' ', ''))
+        chunk = guid + struct.pack('<Q', 24 + 12) + b'summary list'
+        with open("file.w64", 'r+b') as f:
+            content = f.read()
+            content += b'\0' * (-len(content) % 8) + chunk + b'\0' * (-len(chunk) % 8)
+            content = content[:16] + struct.pack('<Q', len(content)) + content[24:]
+            f.seek(0)
+            f.write(content)
+        self.assertEqual(repair("file.w64"), 1001)
+        with open("file.w64", 'rb') as f: result = f.read()
+        self.assertEqual(result, content)
+
+    def test_repair_notAWav(self):
+        self.toRemove("file.txt")
+        with open("file.txt", 'w') as f:
+            f.write("Not a wave file, at all")
+        with self.assertRaises(ValueError) as ctx:
+            repair("file.txt")
+        self.assertEqual(format(ctx.exception),
+            "'file.txt' is not a WAV, RF64 or W64 file")
+
+    def test_repair_checkpointedRecording(self):
+        # the header accounts for the frames before the last checkpoint
+        self.toRemove("file.wav")
+        self.toRemove("crashed_file.wav")
+        with wavefile.WaveWriter("file.wav", channels=2,
+                format=Format.WAV|Format.PCM_16, checkpoint_frames=600) as w:
+            w.write(self.data[:,:600])
+            w.write(self.data[:,600:])
+            shutil.copy("file.wav", "crashed_file.wav")
+        with wavefile.WaveReader("crashed_file.wav") as r:
+            self.assertEqual(r.frames, 600)
+        self.assertEqual(repair("crashed_file.wav"), 1001)
+        with open("file.wav", 'rb') as f: expected = f.read()
+        with open("crashed_file.wav", 'rb') as f: result = f.read()
+        self.assertEqual(result, expected)
+
+
+# vim: et ts=4 sw=4
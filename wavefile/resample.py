@@ -0,0 +1,150 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Copyright 2012 David García Garzón
+
+This file is part of python-wavefile
+
+python-wavefile is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+python-wavefile is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+import math
+import numpy as np
+
+
+class Resampler(object):
+    """Block by block polyphase sample rate converter.
+
+    Converts (channels, frames) blocks from 'inrate' to 'outrate'
+    keeping the filter history between calls to process(),
+    so that feeding a signal in blocks of any size gives the same
+    output than feeding it at once.
+    Call flush() after the last block to obtain the filter tail.
+
+    The filter is a Kaiser windowed sinc with 'zeros' zero crossings
+    at each side and its cutoff at 'rolloff' times the lower Nyquist.
+    Output is compensated for the filter delay, so that output
+    frame n is aligned with input time n*inrate/outrate.
+    With the defaults, content below 0.7 times the lower Nyquist
+    frequency is reproduced within 1e-4 of full scale (-80dB)
+    of an ideal band limited conversion, and below 0.8 times
+    within 2e-3, except for the first and last 'latency' frames,
+    affected by the zero padding at the file edges.
+    """
+
+    # Outputs computed at once, bounds temporary memory
+    chunkSize = 1024
+
+    def __init__(self, inrate, outrate, channels=1,
+            zeros=16, rolloff=0.945, beta=8.6, dtype=np.float32):
+        inrate, outrate = int(inrate), int(outrate)
+        if inrate <= 0 or outrate <= 0:
+            raise ValueError("Bad sample rates: %i -> %i"%(inrate, outrate))
+        g = math.gcd(inrate, outrate)
+        self.inrate = inrate
+        self.outrate = outrate
+        self.channels = channels
+        self.dtype = np.dtype(dtype)
+        if self.dtype.kind != 'f':
+            raise TypeError("Resampling requires a floating point dtype")
+        self._up = L = outrate // g
+        self._down = M = inrate // g
+
+        # Prototype filter in the upsampled domain centered at an
+        # integer delay so that output frames fall on input frames.
+        cutoff = rolloff * 0.5 / max(L, M) # cycles per upsampled sample
+        self._delay = D = int(math.ceil(zeros * max(L, M) / rolloff))
+        self._taps = T = (2*D) // L + 1
+        t = np.arange(L*T) - D
+        window = np.i0(beta * np.sqrt(np.clip(1 - (t/D)**2, 0, None))) / np.i0(beta)
+        h = 2 * cutoff * np.sinc(2 * cutoff * t) * window * L
+        h[np.abs(t) > D] = 0
+        # phases[p,j] weights input frame k-j for upsampled position k*L+p
+        self._phases = h.reshape(T, L).T.astype(self.dtype)
+
+        self.reset()
+
+    def reset(self):
+        """Forgets any previous input"""
+        T = self._taps
+        self._history = np.zeros((self.channels, T-1), self.dtype)
+        self._work = np.zeros((self.channels, T-1), self.dtype)
+        self._out = np.zeros((self.channels, 0), self.dtype)
+        self._received = 0 # input frames fed
+        self._produced = 0 # output frames generated
+
+    @property
+    def latency(self):
+        """Input frames needed ahead of an output frame"""
+        return -(-self._delay // self._up)
+
+    def outputSize(self, frames):
+        """Output frames corresponding to 'frames' input frames"""
+        return -(-frames * self._up // self._down)
+
+    def process(self, data):
+        """Feeds a (channels, frames) block and returns the available output.
+        The returned array is reused by the next call.
+        """
+        channels, frames = data.shape
+        assert channels == self.channels, \
+            "Block has %i channels, resampler has %i channels"%(
+                channels, self.channels)
+        return self._feed(data, frames)
+
+    def flush(self):
+        """Returns the remaining output after the last block"""
+        expected = self.outputSize(self._received)
+        pending = np.zeros((self.channels, self._taps), self.dtype)
+        received = self._received
+        out = self._feed(pending, self._taps)
+        self._received = received
+        out = out[:, :max(0, expected - (self._produced - out.shape[1]))]
+        self._produced = expected
+        return out
+
+    def _feed(self, data, frames):
+        L, M, T = self._up, self._down, self._taps
+        H = T - 1
+        if self._work.shape[1] < H + frames:
+            self._work = np.zeros((self.channels, H + frames), self.dtype)
+        work = self._work[:, :H + frames]
+        work[:, :H] = self._history
+        work[:, H:] = data
+        first = self._received - H # absolute index of work[:,0]
+        self._received += frames
+        last = self._received - 1
+
+        # Outputs whose newest needed input frame is already here
+        start = self._produced
+        stop = max(start, ((last + 1) * L - self._delay + M - 1) // M)
+        n = stop - start
+        if self._out.shape[1] < n:
+            self._out = np.zeros((self.channels, n), self.dtype)
+        out = self._out[:, :n]
+        taps = np.arange(T)
+        for offset in range(0, n, self.chunkSize):
+            u = np.arange(start + offset, min(stop, start + offset + self.chunkSize)) * M + self._delay
+            k = u // L - first
+            index = k[:, np.newaxis] - taps
+            np.einsum('cnt,nt->cn',
+                work[:, index], self._phases[u % L],
+                out=out[:, offset:offset + len(u)])
+        self._produced = stop
+        self._history[:] = work[:, work.shape[1]-H:]
+        return out
+
+
+# vim: et ts=4 sw=4
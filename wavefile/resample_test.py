@@ -0,0 +1,66 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import unittest
+import numpy as np
+from numpy.testing import (
+    assert_allclose as np_assert_allclose,
+)
+from .resample import Resampler
+
+
+class Resampler_Test(unittest.TestCase):
+
+    def sinusoid(self, samples, f, samplerate):
+        return np.sin(2*np.pi*f*np.arange(samples)/samplerate)[np.newaxis,:]
+
+    def resampleAll(self, resampler, data, blockSize):
+        result = [
+            resampler.process(data[:,i:i+blockSize]).copy()
+            for i in range(0, data.shape[1], blockSize)
+        ]
+        result.append(resampler.flush())
+        return np.concatenate(result, axis=1)
+
+    def assertResamples(self, inrate, outrate, f=1000.):
+        data = self.sinusoid(20000, f, inrate)
+        resampler = Resampler(inrate, outrate)
+        result = self.resampleAll(resampler, data, 333)
+        self.assertEqual(result.shape, (1, resampler.outputSize(20000)))
+        expected = self.sinusoid(result.shape[1], f, outrate)
+        edge = resampler.latency * outrate // inrate + 2
+        np_assert_allclose(result[:,edge:-edge], expected[:,edge:-edge], atol=1e-4)
+
+    def test_downsample(self):
+        self.assertResamples(48000, 16000)
+
+    def test_upsample(self):
+        self.assertResamples(16000, 48000)
+
+    def test_fractionalRatio(self):
+        self.assertResamples(44100, 16000, f=5000)
+
+    def test_blockSize_doesNotChangeOutput(self):
+        data = np.random.RandomState(0).randn(2, 5000).astype(np.float32)
+        whole = self.resampleAll(Resampler(44100, 48000, 2), data, 5000)
+        blocks = self.resampleAll(Resampler(44100, 48000, 2), data, 37)
+        np_assert_allclose(blocks, whole, atol=1e-6)
+
+    def test_outputSize(self):
+        resampler = Resampler(48000, 16000)
+        self.assertEqual(resampler.outputSize(3), 1)
+        self.assertEqual(resampler.outputSize(4), 2)
+
+    def test_badChannels(self):
+        resampler = Resampler(48000, 16000, channels=2)
+        with self.assertRaises(AssertionError) as ctx:
+            resampler.process(np.zeros((1, 10), np.float32))
+        self.assertEqual(format(ctx.exception),
+            "Block has 1 channels, resampler has 2 channels")
+
+    def test_integerDtype_fails(self):
+        with self.assertRaises(TypeError):
+            Resampler(48000, 16000, dtype=np.int16)
+
+
+# vim: et ts=4 sw=4
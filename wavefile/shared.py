@@ -0,0 +1,172 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+"""
+Copyright 2012 David García Garzón
+
+This file is part of python-wavefile
+
+python-wavefile is free software: you can redistribute it and/or modify
+it under the terms of the GNU General Public License as published by
+the Free Software Foundation, either version 3 of the License, or
+(at your option) any later version.
+
+python-wavefile is distributed in the hope that it will be useful,
+but WITHOUT ANY WARRANTY; without even the implied warranty of
+MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+GNU General Public License for more details.
+
+You should have received a copy of the GNU General Public License
+along with this program.  If not, see <http://www.gnu.org/licenses/>.
+"""
+
+
+import mmap
+import os
+import warnings
+import numpy as np
+from multiprocessing import shared_memory
+
+from .wavefile import (
+    WaveReader,
+    _readAll,
+)
+
+
+class _UntrackedMemory(shared_memory.SharedMemory):
+    """Attaches an existing POSIX segment like SharedMemory does
+    in Python < 3.13, but without registering it in the resource
+    tracker, which would unlink it when this process ends.
+    Unregistering afterwards is not an option,
+    worker processes share the tracker of their parent."""
+
+    def __init__(self, name):
+        self._name = '/' + name
+        self._fd = shared_memory._posixshmem.shm_open(self._name, os.O_RDWR, mode=self._mode)
+        try:
+            self._size = os.fstat(self._fd).st_size
+            self._mmap = mmap.mmap(self._fd, self._size)
+        except OSError:
+            self.close()
+            raise
+        self._buf = memoryview(self._mmap)
+
+def _attach(name):
+    """Attaches an existing segment without making this process
+    responsible of unlinking it"""
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:
+        pass # Python < 3.13
+    if not shared_memory._USE_POSIX:
+        return shared_memory.SharedMemory(name=name) # not tracked
+    return _UntrackedMemory(name)
+
+
+class SharedAudio(object):
+    """Audio held in a shared memory segment, created by load_shared().
+
+    'data' is a (channels, frames) column-major array on the segment.
+    Pickling the handle just sends the segment name, so passing it
+    to worker processes lets them attach to the same memory,
+    with no copy.
+
+    The process creating it owns the segment: use it as a context
+    manager, or call unlink(), to destroy the segment once the workers
+    are done. Any process calls close() (or exits the context) to
+    release its own mapping, after dropping the arrays taken from 'data'.
+    An owner handle garbage collected without unlink() unlinks
+    the segment with a ResourceWarning.
+    """
+
+    def __init__(self, name, channels, frames, dtype=np.float32, samplerate=0):
+        self._segment = _attach(name)
+        self._owner = False
+        self._setup(channels, frames, dtype, samplerate)
+
+    @classmethod
+    def _create(cls, channels, frames, dtype, samplerate):
+        self = cls.__new__(cls)
+        nbytes = channels * frames * np.dtype(dtype).itemsize
+        self._segment = shared_memory.SharedMemory(create=True, size=max(1, nbytes))
+        self._owner = True
+        self._setup(channels, frames, dtype, samplerate)
+        return self
+
+    def _setup(self, channels, frames, dtype, samplerate):
+        self.name = self._segment.name
+        self.channels = channels
+        self.frames = frames
+        self.dtype = np.dtype(dtype)
+        self.samplerate = samplerate
+        self._unlinked = False
+        self._data = np.ndarray((channels, frames), self.dtype,
+            buffer=self._segment.buf, order='F')
+
+    def __reduce__(self):
+        return SharedAudio, (self.name, self.channels, self.frames,
+            self.dtype.str, self.samplerate)
+
+    def __enter__(self):
+        return self
+    def __exit__(self, type, value, traceback):
+        if self._owner:
+            self.unlink()
+        self.close()
+
+    @property
+    def data(self):
+        if self._data is None:
+            raise ValueError("Shared audio '%s' is closed"%self.name)
+        return self._data
+
+    @property
+    def owner(self):
+        """Whether this process created the segment"""
+        return self._owner
+
+    def close(self):
+        """Releases the mapping of this process.
+        Raises BufferError if arrays taken from 'data' are still alive.
+        """
+        if self._segment is None: return
+        self._data = None
+        self._segment.close()
+        self._segment = None
+
+    def unlink(self):
+        """Destroys the segment, once every process closes it.
+        Just the owner should call it."""
+        if self._unlinked: return
+        self._unlinked = True
+        if self._segment is not None:
+            self._segment.unlink()
+            return
+        segment = shared_memory.SharedMemory(name=self.name)
+        segment.unlink()
+        segment.close()
+
+    def __del__(self):
+        if getattr(self, '_owner', False) and not self._unlinked:
+            warnings.warn("Shared audio '%s' was not unlinked"%self.name,
+                ResourceWarning)
+            self.unlink()
+
+
+def load_shared(filename, dtype=np.float32):
+    """Decodes a file straight into a shared memory segment.
+    Returns a SharedAudio, whose 'data' is the (channels, frames)
+    array, which can be passed to worker processes without copying it.
+    """
+    with WaveReader(filename) as r:
+        audio = SharedAudio._create(r.channels, r.frames, dtype, r.samplerate)
+        try:
+            _readAll(r, audio.data)
+        except:
+            audio.unlink()
+            audio.close()
+            raise
+    return audio
+
+
+# vim: et ts=4 sw=4
@@ -0,0 +1,121 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+
+import os
+import pickle
+import unittest
+import warnings
+import multiprocessing
+import numpy as np
+from numpy.testing import (
+    assert_array_equal as np_assert_equal,
+)
+from . import wavefile
+from .shared import (
+    SharedAudio,
+    load_shared,
+)
+
+
+def _workerSum(audio):
+    with audio:
+        return float(audio.data.sum()), audio.data.shape
+
+def _workerWrite(audio):
+    with audio:
+        audio.data[0,0] = 42
+
+
+class SharedAudio_Test(unittest.TestCase):
+
+    def setUp(self):
+        self.data = np.random.RandomState(0).uniform(-1, 1, (2, 1000)).astype(np.float32)
+        wavefile.save("input.wav", self.data, 8000)
+
+    def tearDown(self):
+        if os.access("input.wav", os.F_OK):
+            os.remove("input.wav")
+
+    def segmentExists(self, name):
+        return os.path.exists(os.path.join('/dev/shm', name))
+
+    def test_loadShared(self):
+        with load_shared("input.wav") as audio:
+            self.assertEqual(audio.samplerate, 8000)
+            self.assertEqual(audio.data.shape, (2, 1000))
+            self.assertTrue(audio.data.flags.f_contiguous)
+            self.assertTrue(audio.owner)
+            np_assert_equal(audio.data, self.data)
+
+    def test_loadShared_dtype(self):
+        data = (self.data*32767).astype(np.int16)
+        with wavefile.WaveWriter("input.wav", samplerate=8000, channels=2,
+                format=wavefile.Format.WAV|wavefile.Format.PCM_16) as w:
+            w.write(data)
+        with load_shared("input.wav", dtype=np.int16) as audio:
+            self.assertEqual(audio.data.dtype, np.int16)
+            np_assert_equal(audio.data, data)
+
+    @unittest.skipUnless(os.path.isdir('/dev/shm'), "No /dev/shm to check")
+    def test_exit_unlinks(self):
+        with load_shared("input.wav") as audio:
+            name = audio.name
+            self.assertTrue(self.segmentExists(name))
+        self.assertFalse(self.segmentExists(name))
+
+    def test_close_invalidatesData(self):
+        with load_shared("input.wav") as audio:
+            pass
+        with self.assertRaises(ValueError) as ctx:
+            audio.data
+        self.assertEqual(format(ctx.exception),
+            "Shared audio '%s' is closed"%audio.name)
+
+    def test_pickle_attachesSameMemory(self):
+        with load_shared("input.wav") as audio:
+            copy = pickle.loads(pickle.dumps(audio))
+            self.assertFalse(copy.owner)
+            copy.data[1,2] = 7
+            self.assertEqual(audio.data[1,2], 7)
+            copy.close()
+            self.assertLess(len(pickle.dumps(audio)), 200)
+
+    def test_attachByName(self):
+        with load_shared("input.wav") as audio:
+            other = SharedAudio(audio.name, 2, 1000, np.float32, 8000)
+            np_assert_equal(other.data, self.data)
+            other.close()
+
+    def test_attach_notTracked(self):
+        from unittest import mock
+        from multiprocessing import resource_tracker
+        with load_shared("input.wav") as audio:
+            with mock.patch.object(resource_tracker, 'register') as register:
+                other = SharedAudio(audio.name, 2, 1000, np.float32, 8000)
+                other.close()
+            # just the owner is responsible of unlinking it
+            self.assertEqual(register.call_count, 0)
+
+    @unittest.skipUnless(os.path.isdir('/dev/shm'), "No /dev/shm to check")
+    def test_notUnlinked_warns(self):
+        audio = load_shared("input.wav")
+        name = audio.name
+        with warnings.catch_warnings(record=True) as caught:
+            warnings.simplefilter('always')
+            del audio
+        self.assertEqual([type(w.message) for w in caught], [ResourceWarning])
+        self.assertFalse(self.segmentExists(name))
+
+    def test_workers(self):
+        context = multiprocessing.get_context('spawn')
+        with load_shared("input.wav") as audio:
+            with context.Pool(2) as workers:
+                results = workers.map(_workerSum, [audio, audio])
+                workers.map(_workerWrite, [audio])
+            for total, shape in results:
+                self.assertAlmostEqual(total, float(self.data.sum()), places=3)
+                self.assertEqual(shape, (2, 1000))
+            self.assertEqual(audio.data[0,0], 42)
+
+
+# vim: et ts=4 sw=4
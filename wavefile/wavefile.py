@@ -23,8 +23,13 @@ along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 import numpy as np
 import ctypes
+import os
+import select
+import struct
 import sys
+import time
 import warnings
+from collections import namedtuple
 from enum import Enum, IntEnum, IntFlag
 
 
@@ -32,12 +37,27 @@ from .libsndfile import (
     _lib,
     OPEN_MODES,
     SEEK_MODES,
+    BITRATE_MODES,
     FILE_STRINGS,
     FILE_FORMATS,
     COMMANDS,
     SF_INFO,
     SF_FORMAT_INFO,
+    SF_CHUNK_INFO,
+    SF_CUES_VAR,
 )
+from .resample import Resampler
+from .dither import Quantizer
+
+_clock = time.perf_counter
+
+# libsndfile 1.0.25 lacks the chunk API
+_chunkApi = hasattr(_lib, 'sf_set_chunk')
+
+def _requireChunkApi():
+    if not _chunkApi:
+        raise NotImplementedError("Chunks require libsndfile 1.0.26 or later, found %s"%(
+            _lib.sf_version_string().decode()))
 
 # Vorbis and Flac use utf8.
 # WAV/AIFF use ascii, but if chars beyond 127 are found,
@@ -63,6 +83,113 @@ def _sferrormessage(code):
     """Returns the sndfile error message for the code in proper unicode"""
     return _lib.sf_error_number(code).decode(_errorencoding)
 
+def _chunkId(id):
+    """Chunk identifier as libsndfile takes it"""
+    return id.encode('latin1') if type(id) == type('') else bytes(id)
+
+def _chunkHeaders(filename):
+    """Generates the id, size and payload offset of the chunks
+    of RIFF (WAV, RF64) and AIFF files, just reading their headers.
+    """
+    with open(filename, 'rb') as f:
+        head = f.read(12)
+        kind = head[:4], head[8:12]
+        if kind in ((b'RIFF', b'WAVE'), (b'RF64', b'WAVE')):
+            endian = '<'
+        elif kind in ((b'RIFX', b'WAVE'), (b'FORM', b'AIFF'), (b'FORM', b'AIFC')):
+            endian = '>'
+        else:
+            return
+        filesize = os.fstat(f.fileno()).st_size
+        dataSize = None # 64 bit size from ds64 chunk in RF64
+        position = 12
+        while position + 8 <= filesize:
+            f.seek(position)
+            id, size = struct.unpack(endian+'4sI', f.read(8))
+            if id == b'ds64':
+                dataSize = struct.unpack('<8xQ', f.read(16))[0]
+            if id == b'data' and size == 0xFFFFFFFF and dataSize is not None:
+                size = dataSize
+            yield id.decode('latin1'), size, position + 8
+            position += 8 + size + (size & 1)
+
+def _checkReadBuffer(data, expectedChannels):
+    channels, frames = data.shape
+    assert channels == expectedChannels, \
+        "Buffer has room for %i channels, wave file has %i channels"%(
+            channels, expectedChannels)
+    assert data.strides[0]*channels == data.strides[1], \
+        "Buffer storage be column-major order. Consider using buffer(size)"
+
+def _readf(sndfile, data, frames):
+    """Reads frames into a column-major buffer of a supported dtype"""
+    if data.dtype==np.float64:
+        return _lib.sf_readf_double(sndfile, data.ctypes.data_as(ctypes.POINTER(ctypes.c_double)), frames)
+    if data.dtype==np.float32:
+        return _lib.sf_readf_float(sndfile, data.ctypes.data_as(ctypes.POINTER(ctypes.c_float)), frames)
+    if data.dtype==np.int16:
+        return _lib.sf_readf_short(sndfile, data.ctypes.data_as(ctypes.POINTER(ctypes.c_short)), frames)
+    if data.dtype==np.int32:
+        return _lib.sf_readf_int(sndfile, data.ctypes.data_as(ctypes.POINTER(ctypes.c_int)), frames)
+    raise TypeError("Please choose a correct dtype")
+
+def _writef(sndfile, data, frames):
+    """Writes frames from interleaved data of a supported dtype"""
+    if data.dtype==np.float64:
+        return _lib.sf_writef_double(sndfile, data.ctypes.data_as(ctypes.POINTER(ctypes.c_double)), frames)
+    if data.dtype==np.float32:
+        return _lib.sf_writef_float(sndfile, data.ctypes.data_as(ctypes.POINTER(ctypes.c_float)), frames)
+    if data.dtype==np.int16:
+        return _lib.sf_writef_short(sndfile, data.ctypes.data_as(ctypes.POINTER(ctypes.c_short)), frames)
+    if data.dtype==np.int32:
+        return _lib.sf_writef_int(sndfile, data.ctypes.data_as(ctypes.POINTER(ctypes.c_int)), frames)
+    raise TypeError("Please choose a correct dtype")
+
+class _FileWatch(object):
+    """Waits for a file to be modified.
+    Uses inotify when available (Linux), so it wakes up as soon
+    as the file is written, else it just sleeps 'poll' seconds.
+    """
+    IN_MODIFY = 0x2
+
+    def __init__(self, filename, poll, inotify=True):
+        self._poll = poll
+        self._fd = self._inotify(filename) if inotify else -1
+
+    def _inotify(self, filename):
+        try:
+            libc = ctypes.CDLL(None)
+            fd = libc.inotify_init1(os.O_NONBLOCK)
+        except (OSError, AttributeError, TypeError):
+            return -1
+        if fd < 0:
+            return -1
+        if libc.inotify_add_watch(fd, _fsencode(filename), self.IN_MODIFY) < 0:
+            os.close(fd)
+            return -1
+        return fd
+
+    @property
+    def inotify(self):
+        return self._fd >= 0
+
+    def wait(self):
+        if self._fd < 0:
+            time.sleep(self._poll)
+            return
+        ready, _, _ = select.select([self._fd], [], [], self._poll)
+        if not ready: return
+        try:
+            while os.read(self._fd, 4096): pass # drain events
+        except BlockingIOError:
+            pass
+
+    def close(self):
+        if self._fd >= 0:
+            os.close(self._fd)
+        self._fd = -1
+
+
 class Format(IntFlag):
     """Represents an audio file format.
     A full format specification can be constructed by bitwise 'or' of three components:
@@ -210,6 +337,11 @@ class Seek(int, Enum):
     CUR = SEEK_MODES.SF_SEEK_CUR # Relative to the last read frame
     END = SEEK_MODES.SF_SEEK_END # Relative to the end of the file
 
+class BitrateMode(int, Enum):
+    CONSTANT = BITRATE_MODES.SF_BITRATE_MODE_CONSTANT
+    AVERAGE = BITRATE_MODES.SF_BITRATE_MODE_AVERAGE
+    VARIABLE = BITRATE_MODES.SF_BITRATE_MODE_VARIABLE
+
 
 class WaveMetadata(object):
     strings = dict((
@@ -255,25 +387,294 @@ class WaveMetadata(object):
             if value is None: continue
             yield k, value.decode(_tagencoding)
 
+class IOStats(object):
+    """Counters of the libsndfile calls done by a reader or a writer.
+    calls: read (or write) calls
+    frames: frames read (or written)
+    bytes: bytes moved from (or to) the numpy buffers
+    seconds: time spent inside sf_readf_* (or sf_writef_*)
+    seeks: seek calls
+    seek_seconds: time spent inside sf_seek
+    short_calls: calls moving less frames than requested, ie. at the end of file
+    """
+    fields = [
+        'calls',
+        'frames',
+        'bytes',
+        'seconds',
+        'seeks',
+        'seek_seconds',
+        'short_calls',
+    ]
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.calls = 0
+        self.frames = 0
+        self.bytes = 0
+        self.seconds = 0.
+        self.seeks = 0
+        self.seek_seconds = 0.
+        self.short_calls = 0
+
+    def as_dict(self):
+        return dict((name, getattr(self, name)) for name in self.fields)
+
+    def __repr__(self):
+        return "IOStats(%s)"%(', '.join(
+            '%s=%r'%(name, getattr(self, name)) for name in self.fields))
+
+
+Cue = namedtuple('Cue', 'id position name')
+Cue.__doc__ = """A cue marker: an identifier, a frame position and a (maybe empty) name"""
+
+def _adtlChunk(cues):
+    """Builds a LIST adtl chunk holding a labl for each named cue,
+    which is where RIFF keeps the cue names"""
+    labels = []
+    for cue in cues:
+        if not cue.name: continue
+        # libsndfile pads chunks to 4 bytes, extra NULs keep labels aligned
+        text = cue.name.encode(_tagencoding) + b'\0'
+        text += b'\0' * (-len(text) % 4)
+        labels.append(b'labl' + struct.pack('<II', 4 + len(text), cue.id) + text)
+    if not labels: return None
+    return b'adtl' + b''.join(labels)
+
+# Receives every I/O event when set, see set_io_hook
+_ioHook = None
+
+def set_io_hook(hook):
+    """Sets a function to be called on every I/O event of any
+    reader or writer, as hook(handle, event, frames, seconds).
+    'event' is 'open', 'close', 'error' (failed open, handle is None),
+    'read', 'write' (frames moved and seconds spent in libsndfile)
+    or 'seek' (resulting position, or -1, and seconds).
+    Use None, the default, to disable it with no overhead.
+    Returns the previous hook, so that hooks can be chained.
+    """
+    global _ioHook
+    previous = _ioHook
+    _ioHook = hook
+    return previous
+
+
+# Resolution of the PCM subtypes that can be dithered
+_pcmBits = {
+    Format.PCM_S8: 8,
+    Format.PCM_U8: 8,
+    Format.PCM_16: 16,
+    Format.PCM_24: 24,
+    Format.PCM_32: 32,
+}
+
+# WAV format tag and bits of the subtypes a streamed WAV can hold
+_wavStreamSubtypes = {
+    Format.PCM_U8: (1, 8),
+    Format.PCM_16: (1, 16),
+    Format.PCM_24: (1, 24),
+    Format.PCM_32: (1, 32),
+    Format.FLOAT: (3, 32),
+    Format.DOUBLE: (3, 64),
+}
+
+# Channel masks libsndfile writes in WAVEX files by default
+_wavexChannelMasks = {1: 0x4, 2: 0x3, 4: 0x33, 6: 0x3F, 8: 0xFF}
+_wavexSubformat = bytes.fromhex('000000001000800000aa00389b71')
+
+def _wavStreamHeader(info):
+    """WAV header with maximal sizes, as written to pipes.
+    The fmt chunk is extensible (WAVEX) when requested,
+    or required by having more than 2 channels or 16 bit samples."""
+    subtype = info.format & Format.SUBMASK
+    if subtype not in _wavStreamSubtypes:
+        raise ValueError("Streamed WAV does not support subtype %s"%(
+            Format(subtype).name))
+    tag, bits = _wavStreamSubtypes[subtype]
+    blockAlign = info.channels * bits // 8
+    extensible = (
+        info.format & Format.TYPEMASK == Format.WAVEX
+        or info.channels > 2
+        or (tag == 1 and bits > 16)
+    )
+    fmt = struct.pack('<HHIIHH',
+        0xFFFE if extensible else tag, info.channels, info.samplerate,
+        info.samplerate * blockAlign, blockAlign, bits,
+    )
+    if extensible:
+        fmt += struct.pack('<HHI', 22, bits,
+            _wavexChannelMasks.get(info.channels, 0),
+        ) + struct.pack('<H', tag) + _wavexSubformat
+    return struct.pack('<4sI4s4sI', b'RIFF', 0xFFFFFFFF, b'WAVE', b'fmt ', len(fmt)
+        ) + fmt + struct.pack('<4sI', b'data', 0xFFFFFFFF)
+
+def _openWrite(filename, info):
+    """Opens a file name, '-' meaning the standard output,
+    or a file descriptor or an object having one (fileno()),
+    which is left open.
+    Returns the sndfile and whether it is a non seekable stream."""
+    if filename == '-':
+        filename = 1
+    if not isinstance(filename, int) and not hasattr(filename, 'fileno'):
+        return _lib.sf_open(_fsencode(filename), OPEN_MODES.SFM_WRITE, info), False
+    if hasattr(filename, 'flush'):
+        filename.flush() # keep anything written before
+    fd = filename if isinstance(filename, int) else filename.fileno()
+    try:
+        os.lseek(fd, 0, os.SEEK_CUR)
+        return _lib.sf_open_fd(fd, OPEN_MODES.SFM_WRITE, info, 0), False
+    except OSError:
+        pass # a pipe
+    if info.format & Format.TYPEMASK not in (Format.WAV, Format.WAVEX):
+        return _lib.sf_open_fd(fd, OPEN_MODES.SFM_WRITE, info, 0), True
+    # libsndfile cannot stream WAV, so write a header
+    # with unknown length and let it write the samples as raw
+    header = _wavStreamHeader(info)
+    raw = SF_INFO(
+        samplerate = info.samplerate,
+        channels = info.channels,
+        format = Format.RAW | Format.ENDIAN_LITTLE | (info.format & Format.SUBMASK),
+    )
+    sndfile = _lib.sf_open_fd(fd, OPEN_MODES.SFM_WRITE, raw, 0)
+    if sndfile:
+        while header:
+            header = header[os.write(fd, header):]
+    return sndfile, True
+
+def _checkEncoder(format, compression_level, vbr_quality,
+        bitrate_mode, ogg_page_latency_ms):
+    """Rejects encoder settings which are wrong whatever the file"""
+    for name, value in [
+            ('compression_level', compression_level),
+            ('vbr_quality', vbr_quality),
+            ]:
+        if value is None: continue
+        if not 0. <= value <= 1.:
+            raise ValueError("%s should be between 0 and 1, got %s"%(name, value))
+    if bitrate_mode is not None:
+        BitrateMode(bitrate_mode)
+    # libsndfile returns no success status for the ogg page latency
+    if ogg_page_latency_ms is not None and format & Format.TYPEMASK != Format.OGG:
+        raise ValueError("Format does not support ogg_page_latency_ms=%s"%(
+            ogg_page_latency_ms))
+
 class WaveWriter(object):
+    """Writes a sound file.
+    Plain WAV files, the default format, are limited to 4GB and are
+    never switched to RF64 on their own: request Format.RF64 for open
+    ended recordings. With 'rf64_downgrade' (the default) the file is
+    written as a (WAVEX) RIFF file if it ends below that limit.
+    With 'checkpoint_seconds' or 'checkpoint_frames', the header is
+    updated every time that much audio is written (see checkpoint),
+    so a crash does not lose the recording; 'fsync' also forces
+    every checkpoint to reach the disk.
+    Encoder settings, when given, must be supported by the format:
+    'compression_level' and 'vbr_quality', from 0 to 1, for FLAC, OGG and MPEG
+    (a higher level trades encoding speed for a smaller file);
+    'bitrate_mode', a BitrateMode, for MPEG;
+    'ogg_page_latency_ms' for OGG, lower values reduce streaming latency.
+    With 'dither' ('tpdf' or 'none'), floating point blocks written
+    to PCM formats are quantized by a Quantizer, optionally with
+    'noise_shaping', instead of being rounded by libsndfile.
+    Besides a file name, 'filename' may be '-' for the standard output,
+    or a file descriptor or a binary file object, which is not closed.
+    Pipes are written as a stream, whose header cannot be updated:
+    AU, RAW, FLAC and OGG formats support it, and WAV is written
+    with a header of unknown length. Stream writes are gathered
+    into blocks of 'stream_buffer' frames.
+    """
     def __init__(self,
                 filename,
                 samplerate = 44100,
                 channels = 1,
                 format = Format.WAV | Format.FLOAT,
+                input_samplerate = None,
+                checkpoint_seconds = None,
+                checkpoint_frames = None,
+                fsync = False,
+                compression_level = None,
+                vbr_quality = None,
+                bitrate_mode = None,
+                ogg_page_latency_ms = None,
+                rf64_downgrade = True,
+                dither = None,
+                noise_shaping = False,
+                stream_buffer = 1<<16,
                 ):
 
+        if checkpoint_seconds is not None and checkpoint_frames is not None:
+            raise ValueError("Use either checkpoint_seconds or checkpoint_frames")
+        self._checkpointFrames = None
+        if checkpoint_seconds:
+            self._checkpointFrames = max(1, int(checkpoint_seconds * samplerate))
+        if checkpoint_frames:
+            self._checkpointFrames = max(1, int(checkpoint_frames))
+        self._fsync = fsync
+        self._uncheckedFrames = 0
+        self._resampler = None
+        if input_samplerate and input_samplerate != samplerate:
+            # Written blocks are converted from input_samplerate
+            self._resampler = Resampler(input_samplerate, samplerate, channels)
+        self._quantizer = None
+        if dither is not None:
+            bits = _pcmBits.get(format & Format.SUBMASK)
+            if bits is None:
+                raise ValueError("Dither requires a PCM format")
+            self._quantizer = Quantizer(bits, channels, dither, noise_shaping)
+        elif noise_shaping:
+            raise ValueError("Noise shaping requires dither")
+        _checkEncoder(format, compression_level, vbr_quality,
+            bitrate_mode, ogg_page_latency_ms)
         self._info = SF_INFO(
                 samplerate = samplerate,
                 channels = channels,
                 format = format
             )
-        self._sndfile = _lib.sf_open(_fsencode(filename), OPEN_MODES.SFM_WRITE, self._info)
+        self._stats = IOStats()
+        self._sndfile, streaming = _openWrite(filename, self._info)
         if _lib.sf_error(self._sndfile):
+            if _ioHook is not None: _ioHook(None, 'error', 0, 0.)
             raise IOError("Error opening '%s': %s"%(
                 filename, _sferrormessage(_lib.sf_error(self._sndfile))))
+        # Pipes take many small writes badly, stage them
+        self._streamFrames = stream_buffer if streaming else 0
+        self._staging = None
+        self._staged = 0
+        self._audioWritten = False # even if still staged or resampling
         assert self._sndfile, "Null sndfile handle but no error status"
         self._metadata = WaveMetadata(self._sndfile)
+        if rf64_downgrade and format & Format.TYPEMASK == Format.RF64:
+            _command(COMMANDS.SFC_RF64_AUTO_DOWNGRADE, ctypes.c_int(1), self._sndfile)
+        try:
+            self._setEncoder(compression_level, vbr_quality,
+                bitrate_mode, ogg_page_latency_ms)
+        except:
+            _lib.sf_close(self._sndfile)
+            if isinstance(filename, (str, bytes)) and filename != '-':
+                os.remove(filename) # empty, just created
+            raise
+        if _ioHook is not None: _ioHook(self, 'open', 0, 0.)
+
+    def _setEncoder(self, compression_level, vbr_quality,
+            bitrate_mode, ogg_page_latency_ms):
+        # libsndfile mpeg encoder rejects the bitrate mode before the level
+        settings = [
+            (COMMANDS.SFC_SET_COMPRESSION_LEVEL, 'compression_level', compression_level,
+                None if compression_level is None else ctypes.c_double(compression_level)),
+            (COMMANDS.SFC_SET_VBR_ENCODING_QUALITY, 'vbr_quality', vbr_quality,
+                None if vbr_quality is None else ctypes.c_double(vbr_quality)),
+            (COMMANDS.SFC_SET_BITRATE_MODE, 'bitrate_mode', bitrate_mode,
+                None if bitrate_mode is None else ctypes.c_int(BitrateMode(bitrate_mode))),
+        ]
+        for command, name, value, parameter in settings:
+            if parameter is None: continue
+            if not _command(command, parameter, self._sndfile):
+                raise ValueError("Format does not support %s=%s"%(name, value))
+        if ogg_page_latency_ms is not None:
+            _command(COMMANDS.SFC_SET_OGG_PAGE_LATENCY_MS,
+                ctypes.c_double(ogg_page_latency_ms), self._sndfile)
 
     def __enter__(self):
         return self
@@ -282,25 +683,169 @@ class WaveWriter(object):
         if value: raise
 
     def close(self):
+        if self._resampler is not None:
+            resampler, self._resampler = self._resampler, None
+            self._write(resampler.flush())
+        self._flushStaged()
         _lib.sf_close( self._sndfile)
+        if _ioHook is not None: _ioHook(self, 'close', 0, 0.)
 
     @property
     def metadata(self):
         return self._metadata
 
+    @property
+    def streaming(self):
+        """Whether the writer streams to a pipe"""
+        return bool(self._streamFrames)
+
+    @property
+    def stats(self):
+        """IOStats of the writes done so far"""
+        return self._stats
+
     def write(self, data):
+        """Writes a (channels, frames) block.
+        When 'input_samplerate' was given, the block must be floating
+        point, it is resampled and the written frames may differ.
+        Returns the number of frames written to the file.
+        """
+        if data.shape[1]:
+            self._audioWritten = True
+        if self._resampler is None:
+            return self._write(data)
+        if data.dtype.kind != 'f':
+            raise TypeError("Resampled writes require floating point data")
         channels, nframes = data.shape
-        data = data.ravel('F')
         assert channels == self._info.channels
-        if data.dtype==np.float64:
-            return _lib.sf_writef_double(self._sndfile, data.ctypes.data_as(ctypes.POINTER(ctypes.c_double)), nframes)
-        if data.dtype==np.float32:
-            return _lib.sf_writef_float(self._sndfile, data.ctypes.data_as(ctypes.POINTER(ctypes.c_float)), nframes)
-        if data.dtype==np.int16:
-            return _lib.sf_writef_short(self._sndfile, data.ctypes.data_as(ctypes.POINTER(ctypes.c_short)), nframes)
-        if data.dtype==np.int32:
-            return _lib.sf_writef_int(self._sndfile, data.ctypes.data_as(ctypes.POINTER(ctypes.c_int)), nframes)
-        raise TypeError("Please choose a correct dtype")
+        return self._write(self._resampler.process(data))
+
+    def _write(self, data):
+        channels, nframes = data.shape
+        assert channels == self._info.channels
+        if self._quantizer is not None and data.dtype.kind == 'f':
+            data = self._quantizer.process(data)
+        if self._streamFrames:
+            return self._stage(data)
+        return self._writeNow(data)
+
+    def _stage(self, data):
+        """Gathers the block into the staging buffer,
+        writing it when full. Blocks larger than it are written as is."""
+        channels, nframes = data.shape
+        size = self._streamFrames
+        if self._staging is not None and self._staging.dtype != data.dtype:
+            self._flushStaged()
+            self._staging = None
+        if not self._staged and nframes >= size:
+            return self._writeNow(data)
+        if self._staging is None:
+            self._staging = np.zeros((channels, size), data.dtype, order='F')
+        position = 0
+        while position < nframes:
+            n = min(nframes - position, size - self._staged)
+            self._staging[:,self._staged:self._staged+n] = data[:,position:position+n]
+            self._staged += n
+            position += n
+            if self._staged == size:
+                self._flushStaged()
+        return nframes
+
+    def _flushStaged(self):
+        if not self._staged: return
+        staged, self._staged = self._staged, 0
+        self._writeNow(self._staging[:,:staged])
+
+    def _writeNow(self, data):
+        channels, nframes = data.shape
+        start = _clock()
+        written = _writef(self._sndfile, data.ravel('F'), nframes)
+        seconds = _clock() - start
+        stats = self._stats
+        stats.calls += 1
+        stats.frames += written
+        stats.bytes += written * channels * data.itemsize
+        stats.seconds += seconds
+        if written < nframes: stats.short_calls += 1
+        if _ioHook is not None: _ioHook(self, 'write', written, seconds)
+        if self._checkpointFrames:
+            self._uncheckedFrames += written
+            if self._uncheckedFrames >= self._checkpointFrames:
+                self.checkpoint()
+        return written
+
+    def set_chunk(self, id, data):
+        """Adds a chunk with the given id (ie. 'iXML') and bytes to the file.
+        Just WAV, RF64 and AIFF files support chunks,
+        and they should be set before writing any audio.
+        """
+        _requireChunkApi()
+        if self._audioWritten:
+            raise ValueError("Chunks should be set before writing audio")
+        data = bytes(data)
+        payload = ctypes.create_string_buffer(data, len(data))
+        id = _chunkId(id)
+        info = SF_CHUNK_INFO(
+            id = id,
+            id_size = len(id),
+            datalen = len(data),
+            data = ctypes.cast(payload, ctypes.c_void_p),
+        )
+        error = _lib.sf_set_chunk(self._sndfile, info)
+        if error:
+            raise ValueError("Unable to set chunk %r: %s"%(
+                id.decode('latin1'), _sferrormessage(error)))
+
+    def set_cues(self, cues):
+        """Sets the cue markers of the file, given as Cues,
+        (position, name) pairs or just frame positions.
+        Cues without an id are numbered from 1.
+        Just WAV and AIFF files keep cues,
+        and they should be set before writing any audio.
+        """
+        if self._audioWritten:
+            raise ValueError("Cues should be set before writing audio")
+        normalized = []
+        for i, cue in enumerate(cues):
+            if not isinstance(cue, Cue):
+                position, name = cue if isinstance(cue, (tuple, list)) else (cue, '')
+                cue = Cue(i+1, position, name or '')
+            normalized.append(cue)
+        points = SF_CUES_VAR(len(normalized))()
+        points.cue_count = len(normalized)
+        for point, cue in zip(points.cue_points, normalized):
+            name = cue.name.encode(_tagencoding)
+            if len(name) > 255:
+                raise ValueError("Cue name too long: %r"%cue.name)
+            point.indx = cue.id
+            point.position = cue.position
+            point.fcc_chunk = struct.unpack('<i', b'data')[0]
+            point.sample_offset = cue.position
+            point.name = name
+        if not _command(COMMANDS.SFC_SET_CUE, points, self._sndfile):
+            raise ValueError("Format does not support cues")
+        # libsndfile writes the WAV cue chunk but not the names
+        adtl = None
+        if self._info.format & Format.TYPEMASK in (Format.WAV, Format.WAVEX):
+            adtl = _adtlChunk(normalized)
+        if adtl:
+            self.set_chunk('LIST', adtl)
+
+    def checkpoint(self):
+        """Updates the file header to account the frames written so far,
+        and, if the writer was created with 'fsync', forces the
+        data to reach the disk.
+        A file left behind by a crash is readable up to the last checkpoint.
+        When streaming, it just writes the staged frames.
+        """
+        self._flushStaged()
+        if self._streamFrames:
+            self._uncheckedFrames = 0
+            return
+        _lib.sf_command(self._sndfile, COMMANDS.SFC_UPDATE_HEADER_NOW, None, 0)
+        if self._fsync:
+            _lib.sf_write_sync(self._sndfile)
+        self._uncheckedFrames = 0
 
     def seek(self, frames, whence=Seek.SET):
         """Moves the current multisample frame to be read/written.
@@ -309,28 +854,83 @@ class WaveWriter(object):
         or relative to the end (whence=Seek.END).
         Returns absolute seek position or -1 if out of scope.
         """
-        return _lib.sf_seek(self._sndfile, frames, whence)
+        start = _clock()
+        position = _lib.sf_seek(self._sndfile, frames, whence)
+        seconds = _clock() - start
+        self._stats.seeks += 1
+        self._stats.seek_seconds += seconds
+        if _ioHook is not None: _ioHook(self, 'seek', position, seconds)
+        return position
+
+def _inputFd(filename):
+    """The file descriptor of an input which is not a file name, or None"""
+    if filename == '-':
+        return 0
+    if isinstance(filename, int):
+        return filename
+    if hasattr(filename, 'fileno'):
+        return filename.fileno()
+    return None
+
+def _openRead(filename, info):
+    """Opens a file name, '-' meaning the standard input,
+    or a file descriptor or an object having one (fileno()),
+    which is left open"""
+    fd = _inputFd(filename)
+    if fd is not None:
+        return _lib.sf_open_fd(fd, OPEN_MODES.SFM_READ, info, 0)
+    return _lib.sf_open(_fsencode(filename), OPEN_MODES.SFM_READ, info)
 
 class WaveReader(object):
+    """Reads a sound file.
+    Besides a file name, 'filename' may be '-' for the standard input,
+    or a file descriptor or a binary file object, like the stdout of
+    a subprocess, which is not closed, nor read from the Python side.
+    Non seekable inputs, like pipes, can be read sequentially,
+    but their 'frames' may be wrong if they are unknown in the header.
+    """
     def __init__(
         self,
         filename,
         samplerate = 0,
         channels = 0,
         format = 0,
+        channels_select = None,
     ):
 
+        self._filename = filename
+        self._openInfo = samplerate, channels, format
+        # libsndfile takes the audio file to start where the descriptor is
+        self._fd = _inputFd(filename)
+        self._fdStart = None
+        if self._fd is not None:
+            try:
+                self._fdStart = os.lseek(self._fd, 0, os.SEEK_CUR)
+            except OSError:
+                pass # a pipe
         self._info = SF_INFO(
             samplerate = samplerate,
             channels = channels,
             format = format
         )
-        self._sndfile = _lib.sf_open(_fsencode(filename), OPEN_MODES.SFM_READ, self._info)
+        self._stats = IOStats()
+        self._sndfile = _openRead(filename, self._info)
         if _lib.sf_error(self._sndfile):
+            if _ioHook is not None: _ioHook(None, 'error', 0, 0.)
             raise IOError("Error opening '%s': %s"%(
                 filename, _sferrormessage(_lib.sf_error(self._sndfile))))
         assert self._sndfile, "Null sndfile handle but no error status"
         self._metadata = WaveMetadata(self._sndfile)
+        self._scratch = None
+        self._index = None # selection as an index array
+        self._selection = None
+        if channels_select is not None:
+            try:
+                self._selection = self._checkSelection(channels_select)
+            except:
+                _lib.sf_close(self._sndfile)
+                raise
+        if _ioHook is not None: _ioHook(self, 'open', 0, 0.)
 
     def __enter__(self):
         return self
@@ -340,11 +940,17 @@ class WaveReader(object):
 
     def close(self):
         _lib.sf_close( self._sndfile)
+        if _ioHook is not None: _ioHook(self, 'close', 0, 0.)
 
     @property
     def metadata(self):
         return self._metadata
 
+    @property
+    def stats(self):
+        """IOStats of the reads done so far"""
+        return self._stats
+
     @property
     def channels(self): return self._info.channels
 
@@ -357,43 +963,494 @@ class WaveReader(object):
     @property
     def frames(self): return self._info.frames
 
+    @property
+    def seekable(self):
+        """Whether the input can be seeked, false for pipes"""
+        return bool(self._info.seekable)
+
     # TODO: Untested
     @property
     def byterate(self):
         return _lib.sf_current_byterate(self._sndfile)
 
-    def read_iter(self, size=512, buffer=None):
+    def chunks(self):
+        """Returns the (id, size) of every chunk in the file,
+        in file order, without reading their content.
+        Just WAV, RF64 and AIFF files have chunks.
+        """
+        # libsndfile chunk iterators do not expose the id
+        # unless you ask for it, so headers are scanned
+        if not self.seekable or not isinstance(self._filename, (str, bytes, os.PathLike)):
+            return []
+        return [(id, size) for id, size, offset in _chunkHeaders(self._filename)]
+
+    def chunk(self, id, buffer=None):
+        """Returns the content of the first chunk with the id.
+        If a writable 'buffer' (ie. a bytearray) is given,
+        the content is read into it, and a memoryview of the
+        filled part is returned, so that it can be reused.
+        Raises KeyError if there is no such chunk.
+        """
+        _requireChunkApi()
+        info = SF_CHUNK_INFO(id=_chunkId(id), id_size=len(_chunkId(id)))
+        iterator = _lib.sf_get_chunk_iterator(self._sndfile, info)
+        if not iterator:
+            raise KeyError(id)
+        error = _lib.sf_get_chunk_size(iterator, info)
+        if error:
+            raise IOError("Error reading chunk %r: %s"%(id, _sferrormessage(error)))
+        size = info.datalen
+        allocated = buffer is None
+        if allocated:
+            buffer = bytearray(size)
+        assert len(buffer) >= size, \
+            "Buffer has room for %i bytes, chunk %r has %i bytes"%(len(buffer), id, size)
+        if size:
+            info.data = ctypes.addressof((ctypes.c_char * len(buffer)).from_buffer(buffer))
+            error = _lib.sf_get_chunk_data(iterator, info)
+            if error:
+                raise IOError("Error reading chunk %r: %s"%(id, _sferrormessage(error)))
+        if allocated:
+            return bytes(buffer)
+        return memoryview(buffer)[:size]
+
+    @property
+    def cues(self):
+        """The cue markers of the file, a list of Cue"""
+        count = ctypes.c_uint32()
+        if not _command(COMMANDS.SFC_GET_CUE_COUNT, count, self._sndfile):
+            return []
+        if not count.value:
+            return []
+        points = SF_CUES_VAR(count.value)()
+        if not _command(COMMANDS.SFC_GET_CUE, points, self._sndfile):
+            return []
+        return [
+            Cue(point.indx, point.sample_offset,
+                point.name.decode(_tagencoding, 'replace'))
+            for point in points.cue_points[:points.cue_count]
+        ]
+
+    def read_regions(self, regions, out=None, dtype=np.float32):
+        """Reads just the given regions of the file.
+        'regions' is a list of (start, stop) frame ranges, or of Cues,
+        each cue spanning until the next one or the end of the file.
+        Regions are decoded in file order, seeking just to skip
+        the gaps in between, into preallocated arrays,
+        or into the ones in 'out', if given.
+        Returns the (channels, frames) arrays in the given order.
+        """
+        regions = list(regions)
+        if regions and all(isinstance(region, Cue) for region in regions):
+            positions = sorted(set(cue.position for cue in regions)) + [self.frames]
+            ends = dict(zip(positions[:-1], positions[1:]))
+            regions = [(cue.position, ends[cue.position]) for cue in regions]
+        ranges = []
+        for start, stop in regions:
+            start, stop = getattr(start, 'position', start), getattr(stop, 'position', stop)
+            if not 0 <= start <= stop <= self.frames:
+                raise ValueError("Region %i:%i out of file bounds, file has %i frames"%(
+                    start, stop, self.frames))
+            ranges.append((int(start), int(stop)))
+        if out is None:
+            out = [self.buffer(stop - start, dtype) for start, stop in ranges]
+        else:
+            out = list(out)
+            assert len(out) == len(ranges), \
+                "%i output arrays for %i regions"%(len(out), len(ranges))
+            for data, (start, stop) in zip(out, ranges):
+                assert data.shape[1] == stop - start, \
+                    "Buffer has room for %i frames, region %i:%i has %i frames"%(
+                        data.shape[1], start, stop, stop - start)
+        position = None
+        for i in sorted(range(len(ranges)), key=lambda i: ranges[i]):
+            start, stop = ranges[i]
+            if start == stop: continue
+            if start != position:
+                position = self.seek(start)
+                if position != start:
+                    raise IOError("Unable to seek to frame %i"%start)
+            position += self.read(out[i])
+        return out
+
+    @property
+    def channels_select(self):
+        """Indexes of the channels returned by read, or None for all of them"""
+        return self._selection
+
+    def read_iter(self, size=512, buffer=None, channels=None, samplerate=None, pool=None):
+        """Generates consecutive blocks of at most 'size' frames,
+        reusing the same array for every block.
+        If 'channels' is a list of channel indexes, just those
+        channels are returned, overriding 'channels_select'.
+        If 'samplerate' differs from the file one, blocks are
+        resampled on the fly (see Resampler), and their size varies.
+        If a BufferPool is given as 'pool', the array is taken from it
+        and given back when the iteration ends.
+        """
+        if samplerate and samplerate != self.samplerate:
+            blocks = self.read_iter(size, buffer, channels, pool=pool)
+            resampler = None
+            for data in blocks:
+                if resampler is None:
+                    resampler = Resampler(self.samplerate, samplerate,
+                        data.shape[0], dtype=data.dtype)
+                out = resampler.process(data)
+                if out.shape[1]: yield out
+            if resampler is None: return
+            out = resampler.flush()
+            if out.shape[1]: yield out
+            return
+
+        selection = self._selection
+        if channels is not None:
+            selection = self._checkSelection(channels)
+        width = self.channels if selection is None else len(selection)
         data = buffer
-        if data is None:
-            data = self.buffer(size)
+        if data is None and pool is not None:
+            data = pool.get(width, size)
+        elif data is None:
+            data = np.zeros((width, size), np.float32, order='F')
         else:
-            assert buffer.shape[0] == self.channels
+            assert buffer.shape[0] == width
             size = buffer.shape[1]
-        nframes = self.read(data)
-        while nframes:
-            yield data[:,:nframes]
-            nframes = self.read(data)
+        try:
+            nframes = self._readSelection(data, selection)
+            while nframes:
+                yield data[:,:nframes]
+                nframes = self._readSelection(data, selection)
+        finally:
+            if buffer is None and pool is not None:
+                pool.put(data)
+
+    def follow(self, size=512, poll=0.02, timeout=None, inotify=True, buffer=None):
+        """Generates blocks of at most 'size' frames as they are
+        appended to the file by another process, like 'tail -f'.
+        At the end of the file, it waits for the file to grow,
+        checking every 'poll' seconds or, if 'inotify' is set and
+        the system supports it, as soon as the file is modified.
+        Stops after 'timeout' seconds without new frames,
+        or never if 'timeout' is None.
+        libsndfile fixes the length of the file on opening,
+        so the header is reloaded, keeping the position,
+        whenever the file grows.
+        Works best with uncompressed formats whose writer does not
+        checkpoint the header, like a WaveWriter without checkpoints,
+        so the length is taken from the file size.
+        Inputs which are not seekable, like pipes, cannot be followed.
+        """
+        if not self.seekable or (self._fd is not None and self._fdStart is None):
+            raise ValueError("Cannot follow a non seekable input")
+        selection = self._selection
+        width = self.channels if selection is None else len(selection)
+        data = buffer
+        if data is None:
+            data = np.zeros((width, size), np.float32, order='F')
+        else:
+            assert buffer.shape[0] == width
+        watched = self._filename if self._fd is None else '/proc/self/fd/%i'%self._fd
+        watch = _FileWatch(watched, poll, inotify)
+        try:
+            filesize = self._fileSize()
+            lastFrames = time.monotonic()
+            while True:
+                nframes = self._readSelection(data, selection)
+                if nframes:
+                    yield data[:,:nframes]
+                    lastFrames = time.monotonic()
+                    continue
+                newsize = self._fileSize()
+                if newsize != filesize:
+                    filesize = newsize
+                    if self._reload(): continue
+                if timeout is not None and time.monotonic() - lastFrames >= timeout:
+                    return
+                watch.wait()
+        finally:
+            watch.close()
+
+    def _fileSize(self):
+        if self._fd is None:
+            return os.path.getsize(self._filename)
+        return os.fstat(self._fd).st_size
+
+    def _reload(self):
+        """Reopens the file to update its length, keeping the read position.
+        Returns False if the file could not be reopened."""
+        position = _lib.sf_seek(self._sndfile, 0, SEEK_MODES.SF_SEEK_CUR)
+        samplerate, channels, format = self._openInfo
+        info = SF_INFO(
+            samplerate = samplerate,
+            channels = channels,
+            format = format
+        )
+        if self._fd is None:
+            sndfile = _lib.sf_open(_fsencode(self._filename), OPEN_MODES.SFM_READ, info)
+        else:
+            os.lseek(self._fd, self._fdStart, os.SEEK_SET)
+            sndfile = _lib.sf_open_fd(self._fd, OPEN_MODES.SFM_READ, info, 0)
+        if not sndfile or _lib.sf_error(sndfile) or info.channels != self._info.channels:
+            if sndfile: _lib.sf_close(sndfile)
+            if self._fd is not None:
+                # the descriptor is shared, restore its position
+                _lib.sf_seek(self._sndfile, position, SEEK_MODES.SF_SEEK_SET)
+            return False
+        _lib.sf_close(self._sndfile)
+        self._sndfile = sndfile
+        self._info = info
+        self._metadata = WaveMetadata(sndfile)
+        _lib.sf_seek(sndfile, position, SEEK_MODES.SF_SEEK_SET)
+        return True
+
+    def windows(self, window, hop=None, pad=None, batch=256, dtype=np.float32):
+        """Generates overlapping windows of 'window' frames every 'hop' frames,
+        as arrays of shape (nwindows, channels, window) with up to
+        'batch' windows each.
+        Windows are strided views of a single reused buffer, so they
+        are not copied but they are overwritten on the next iteration.
+        'pad' controls the windows at the edges:
+        None, just windows fully inside the file;
+        'end', windows starting at every hop, zero padded at the end;
+        'center', windows centered at every hop, zero padded at both ends.
+        """
+        hop = hop or window
+        if pad not in (None, 'end', 'center'):
+            raise ValueError("Bad pad option: %r"%(pad,))
+        channels = self.buffer(0).shape[0]
+        data = self.buffer(window + (batch-1)*hop, dtype)
+        capacity = data.shape[1]
+        itemsize = data.itemsize
+        prefix = window//2 if pad == 'center' else 0
+
+        start = 0 # position of data[:,0] in the padded stream
+        filled = prefix # frames of data holding audio (or prefix zeros)
+        emitted = 0 # windows yielded so far
+        total = None # number of windows, once the end is reached
+        while True:
+            if total is None:
+                nframes = self.read(data[:,filled:])
+                filled += nframes
+                if filled < capacity:
+                    data[:,filled:] = 0
+                    total = windowCount(start + filled - prefix, window, hop, pad)
+            available = capacity if total is not None else filled
+            n = (start + available - window) // hop + 1
+            if total is not None:
+                n = min(n, total)
+            n -= emitted
+            if n > 0:
+                offset = emitted*hop - start
+                yield np.lib.stride_tricks.as_strided(
+                    data[:,offset:],
+                    shape=(n, channels, window),
+                    strides=(hop*channels*itemsize, itemsize, channels*itemsize),
+                    writeable=False,
+                )
+                emitted += n
+            if total is not None and emitted >= total:
+                return
+            # Keep the frames needed by the next windows at the begining
+            offset = emitted*hop - start
+            kept = max(0, filled - offset)
+            data[:,:kept] = data[:,filled-kept:filled]
+            start += offset
+            skip = offset - filled
+            filled = kept
+            # Drop frames in between windows when hop > window
+            while skip > 0 and total is None:
+                nframes = self.read(data[:,:min(skip, capacity)])
+                if not nframes:
+                    start -= skip
+                    break
+                skip -= nframes
+            if total is not None:
+                data[:,kept:] = 0
 
     def buffer(self, size, dtype=np.float32):
         """Provides a properly constructed buffer to read data"""
-        return np.zeros((self.channels, size), dtype, order='F')
+        channels = self.channels if self._selection is None else len(self._selection)
+        return np.zeros((channels, size), dtype, order='F')
+
+    # Frames decoded at once when reading a channel subset,
+    # by default as many as fit in selectionBlockBytes
+    selectionBlockSize = None
+    selectionBlockBytes = 1<<20
+
+    def _checkSelection(self, channels):
+        selection = [int(c) for c in channels]
+        if not selection:
+            raise ValueError("Empty channel selection")
+        for c in selection:
+            if not 0 <= c < self.channels:
+                raise ValueError("Channel %i out of range, wave file has %i channels"%(
+                    c, self.channels))
+        return selection
+
+    def _readSelection(self, data, selection):
+        if selection is None:
+            return self._readFull(data)
+        channels, frames = data.shape
+        assert channels == len(selection), \
+            "Buffer has room for %i channels, %i channels selected"%(
+                channels, len(selection))
+        # Decode full width frames into a reused scratch block
+        # and gather the selected rows, so memory does not scale
+        # with the number of channels in the file.
+        blockSize = self.selectionBlockSize or max(1,
+            self.selectionBlockBytes // (self.channels * data.itemsize))
+        blockSize = min(frames, blockSize)
+        scratch = self._scratch
+        if (scratch is None or scratch.dtype != data.dtype
+                or scratch.shape[1] < blockSize):
+            scratch = self._scratch = np.zeros(
+                (self.channels, blockSize), data.dtype, order='F')
+        if self._index is None or self._index[0] is not selection:
+            # Many rows are gathered in a single pass, frame by frame
+            # as they lie in memory, few are faster copied one by one
+            self._index = selection, (
+                np.array(selection, np.intp) if len(selection) > 8 else None)
+        index = self._index[1]
+        total = 0
+        while total < frames:
+            block = scratch[:,:min(frames-total, scratch.shape[1])]
+            nframes = self._readFull(block)
+            if index is not None:
+                # Selection is checked, clip mode avoids buffering the output
+                np.take(block[:,:nframes].T, index, axis=1,
+                    out=data[:,total:total+nframes].T, mode='clip')
+            else:
+                for i, c in enumerate(selection):
+                    data[i,total:total+nframes] = block[c,:nframes]
+            total += nframes
+            if nframes < block.shape[1]: break
+        return total
 
     def read(self, data):
+        """Reads frames into data, a column-major array with shape
+        (channels, frames), and returns the number of frames read.
+        If the reader has a 'channels_select', data just
+        holds the selected channels.
+        """
+        return self._readSelection(data, self._selection)
+
+    def _readFull(self, data):
+        _checkReadBuffer(data, self.channels)
         channels, frames = data.shape
-        assert channels == self.channels, \
-            "Buffer has room for %i channels, wave file has %i channels"%(
-                channels, self.channels)
-        assert data.strides[0]*channels == data.strides[1], \
-            "Buffer storage be column-major order. Consider using buffer(size)"
-        if data.dtype==np.float64:
-            return _lib.sf_readf_double(self._sndfile, data.ctypes.data_as(ctypes.POINTER(ctypes.c_double)), frames)
-        if data.dtype==np.float32:
-            return _lib.sf_readf_float(self._sndfile, data.ctypes.data_as(ctypes.POINTER(ctypes.c_float)), frames)
-        if data.dtype==np.int16:
-            return _lib.sf_readf_short(self._sndfile, data.ctypes.data_as(ctypes.POINTER(ctypes.c_short)), frames)
-        if data.dtype==np.int32:
-            return _lib.sf_readf_int(self._sndfile, data.ctypes.data_as(ctypes.POINTER(ctypes.c_int)), frames)
-        raise TypeError("Please choose a correct dtype")
+        start = _clock()
+        nframes = _readf(self._sndfile, data, frames)
+        seconds = _clock() - start
+        stats = self._stats
+        stats.calls += 1
+        stats.frames += nframes
+        stats.bytes += nframes * channels * data.itemsize
+        stats.seconds += seconds
+        if nframes < frames: stats.short_calls += 1
+        if _ioHook is not None: _ioHook(self, 'read', nframes, seconds)
+        return nframes
+
+    def seek(self, frames, whence=Seek.SET):
+        """Moves the current multisample frame to be read/written.
+        This movement can be absolute position (whence=Seek.SET)
+        relative to the current position (whence=Seek.CUR)
+        or relative to the end (whence=Seek.END).
+        Returns absolute seek position or -1 if out of scope.
+        """
+        start = _clock()
+        position = _lib.sf_seek(self._sndfile, frames, whence)
+        seconds = _clock() - start
+        self._stats.seeks += 1
+        self._stats.seek_seconds += seconds
+        if _ioHook is not None: _ioHook(self, 'seek', position, seconds)
+        return position
+
+class WaveEditor(object):
+    """Opens an existing file for reading and writing in place.
+    Just the frames read or written are accessed, so fixing a region
+    of a long file does not require to rewrite the whole file.
+    """
+    def __init__(self, filename):
+        self._info = SF_INFO()
+        self._sndfile = _lib.sf_open(_fsencode(filename), OPEN_MODES.SFM_RDWR, self._info)
+        if _lib.sf_error(self._sndfile):
+            raise IOError("Error opening '%s': %s"%(
+                filename, _sferrormessage(_lib.sf_error(self._sndfile))))
+        assert self._sndfile, "Null sndfile handle but no error status"
+        self._metadata = WaveMetadata(self._sndfile)
+
+    def __enter__(self):
+        return self
+    def __exit__(self, type, value, traceback):
+        self.close()
+        if value: raise
+
+    def close(self):
+        _lib.sf_close( self._sndfile)
+
+    @property
+    def metadata(self):
+        return self._metadata
+
+    @property
+    def channels(self): return self._info.channels
+
+    @property
+    def format(self): return self._info.format
+
+    @property
+    def samplerate(self): return self._info.samplerate
+
+    @property
+    def frames(self): return self._info.frames
+
+    def buffer(self, size, dtype=np.float32):
+        """Provides a properly constructed buffer to read data"""
+        return np.zeros((self.channels, size), dtype, order='F')
+
+    def _moveTo(self, start):
+        if start is None: return
+        if start < 0 or _lib.sf_seek(self._sndfile, start, Seek.SET) != start:
+            raise IndexError("Frame %i out of file bounds"%start)
+
+    def read(self, data, start=None):
+        """Reads frames into data, a column-major (channels, frames) array,
+        starting at the current position or at frame 'start'.
+        Returns the number of frames read.
+        """
+        _checkReadBuffer(data, self.channels)
+        self._moveTo(start)
+        return _readf(self._sndfile, data, data.shape[1])
+
+    def write(self, data, start=None):
+        """Writes a (channels, frames) block overwriting the frames
+        at the current position or at frame 'start'.
+        Writing beyond the end, enlarges the file.
+        Returns the number of frames written.
+        """
+        channels, nframes = data.shape
+        assert channels == self.channels
+        self._moveTo(start)
+        written = _writef(self._sndfile, data.ravel('F'), nframes)
+        position = _lib.sf_seek(self._sndfile, 0, Seek.CUR)
+        self._info.frames = max(self._info.frames, position)
+        return written
+
+    def edit(self, start, stop, function, size=4096, dtype=np.float32):
+        """Applies function(block) to the frames from 'start' to 'stop',
+        block by block. The function should modify the block in place.
+        Returns the number of frames edited.
+        """
+        stop = min(stop, self.frames)
+        data = self.buffer(min(size, max(stop - start, 0)), dtype)
+        position = start
+        while position < stop:
+            block = data[:,:min(data.shape[1], stop - position)]
+            nframes = self.read(block, position)
+            if not nframes: break
+            block = block[:,:nframes]
+            function(block)
+            self.write(block, position)
+            position += nframes
+        return position - start
 
     def seek(self, frames, whence=Seek.SET):
         """Moves the current multisample frame to be read/written.
@@ -404,25 +1461,84 @@ class WaveReader(object):
         """
         return _lib.sf_seek(self._sndfile, frames, whence)
 
-def load(filename):
+    def truncate(self, frames):
+        """Discards any frame after 'frames'"""
+        error = _command(COMMANDS.SFC_FILE_TRUNCATE,
+            ctypes.c_int64(frames), self._sndfile)
+        if error:
+            raise IOError("Error truncating to %i frames"%frames)
+        self._info.frames = frames
+
+def windowCount(frames, window, hop=None, pad=None):
+    """Number of windows WaveReader.windows generates for 'frames' frames"""
+    hop = hop or window
+    if pad == 'center': return frames // hop + 1
+    if pad == 'end': return -(-frames // hop)
+    return max(0, (frames - window) // hop + 1)
+
+def load(filename, pool=None):
+    """Returns the sample rate and a (channels, frames) array
+    with the audio of the file.
+    If a BufferPool is given as 'pool', the array is taken from it,
+    give it back with pool.put() when done.
+    """
     with WaveReader(filename) as r:
-        blockSize = 512
-        data = r.buffer(r.frames)
-        fullblocks = r.frames // blockSize
-        lastBlockSize = r.frames % blockSize
-        for i in range(fullblocks):
-            readframes = r.read(data[:,i*blockSize:(i+1)*blockSize])
-            assert readframes == blockSize
-        if lastBlockSize:
-            readframes = r.read(data[:,fullblocks*blockSize:])
-            assert readframes == lastBlockSize
+        if not r.seekable:
+            return r.samplerate, _readGrowing(r, pool)
+        if pool is None:
+            data = r.buffer(r.frames)
+        else:
+            data = pool.get(r.channels, r.frames)
+        _readAll(r, data)
         return r.samplerate, data
 
-def save(filename, data, samplerate, verbose=False):
+def _readGrowing(r, pool=None):
+    """Reads until the end of a stream whose length is unknown
+    into chunks of growing size, joined once at the end"""
+    chunks = []
+    size = 1<<16
+    while True:
+        chunk = r.buffer(size)
+        filled = 0
+        while filled < size:
+            nframes = r.read(chunk[:,filled:])
+            if not nframes: break
+            filled += nframes
+        if filled: chunks.append(chunk[:,:filled])
+        if filled < size: break
+        size = min(size*2, 1<<24)
+    total = sum(chunk.shape[1] for chunk in chunks)
+    data = r.buffer(total) if pool is None else pool.get(r.channels, total)
+    position = 0
+    for chunk in chunks:
+        data[:,position:position+chunk.shape[1]] = chunk
+        position += chunk.shape[1]
+    return data
+
+def _readAll(r, data):
+    """Reads the whole file into data, which has room for all its frames"""
+    blockSize = 512
+    fullblocks = r.frames // blockSize
+    lastBlockSize = r.frames % blockSize
+    for i in range(fullblocks):
+        readframes = r.read(data[:,i*blockSize:(i+1)*blockSize])
+        assert readframes == blockSize
+    if lastBlockSize:
+        readframes = r.read(data[:,fullblocks*blockSize:])
+        assert readframes == lastBlockSize
+
+# Room for audio in a RIFF file, whose sizes are 32 bits,
+# once the header (fmt, fact, PEAK and LIST chunks) is discounted
+_riffMaxDataBytes = 0xFFFFFFFF - 0x10000
+
+def save(filename, data, samplerate, verbose=False, pool=None):
     """
     Given save the audio data, having shape (channels, frames),
     and stores as a sound file.
     For convenience you can also provide a mono in (channels,) shape.
+    Audio not fitting a WAV file (4GB) is saved as RF64.
+    Blocks not in column-major order are interleaved into
+    a temporary array, taken from 'pool' if a BufferPool is given.
     """
     if verbose: print("Saving wave file:",filename)
 
@@ -442,14 +1558,27 @@ def save(filename, data, samplerate, verbose=False):
         data = data.T
         channels, frames = data.shape
 
+    format = Format.WAV | Format.FLOAT
+    if channels * frames * 4 > _riffMaxDataBytes:
+        format = Format.RF64 | Format.FLOAT
+
     blockSize = 512
-    fullblocks = frames // blockSize
-    lastBlockSize = frames % blockSize
-    with WaveWriter(filename, channels=channels, samplerate=samplerate) as w:
-        for i in range(fullblocks):
-            w.write(data[:,blockSize*i:blockSize*(i+1)])
-        if lastBlockSize:
-            w.write(data[:,fullblocks*blockSize:])
+    stage = None
+    if pool is not None and not data.flags.f_contiguous:
+        stage = pool.get(channels, blockSize, data.dtype)
+    try:
+        with WaveWriter(filename, channels=channels, samplerate=samplerate,
+                format=format, rf64_downgrade=False) as w:
+            for i in range(0, frames, blockSize):
+                block = data[:,i:i+blockSize]
+                if stage is not None:
+                    staged = stage[:,:block.shape[1]]
+                    staged[...] = block
+                    block = staged
+                w.write(block)
+    finally:
+        if stage is not None:
+            pool.put(stage)
 
 # For the mathlab nostalgic
 loadWave=load
@@ -357,6 +357,952 @@ class WavefileTest(unittest.TestCase):
         self.assertEqual(4, i)
 
 
+    def test_read_channelsSelect(self):
+        data = self.fourSinusoids(samples=400)
+        self.writeWav("file.wav", data)
+        with wavefile.WaveReader("file.wav", channels_select=[3,1]) as r:
+            self.assertEqual(r.channels, 4)
+            readdata = r.buffer(1000)
+            self.assertEqual(readdata.shape, (2, 1000))
+            size = r.read(readdata)
+            self.assertEqual(size, 400)
+            np_assert_almost_equal(readdata[:,:size], data[[3,1]], decimal=7)
+
+    def test_read_channelsSelect_longerThanScratch(self):
+        data = self.fourSinusoids(samples=400)
+        self.writeWav("file.wav", data)
+        with wavefile.WaveReader("file.wav", channels_select=[2]) as r:
+            r.selectionBlockSize = 64
+            readdata = r.buffer(1000)
+            size = r.read(readdata)
+            self.assertEqual(size, 400)
+            self.assertEqual(r._scratch.shape, (4, 64))
+            np_assert_almost_equal(readdata[:,:size], data[[2]], decimal=7)
+
+    def test_read_channelsSelect_many(self):
+        data = np.random.RandomState(0).uniform(-.5, .5, (12, 400)).astype(np.float32)
+        self.writeWav("file.wav", data)
+        selection = [11, 0, 3, 4, 5, 6, 7, 9, 10, 2]
+        with wavefile.WaveReader("file.wav", channels_select=selection) as r:
+            r.selectionBlockSize = 64
+            readdata = r.buffer(1000)
+            size = r.read(readdata)
+        self.assertEqual(size, 400)
+        np_assert_almost_equal(readdata[:,:size], data[selection], decimal=7)
+
+    def test_read_channelsSelect_outOfRange(self):
+        data = self.fourSinusoids(samples=400)
+        self.writeWav("file.wav", data)
+        with self.assertRaises(ValueError) as ctx:
+            wavefile.WaveReader("file.wav", channels_select=[1,4])
+        self.assertEqual(format(ctx.exception),
+            "Channel 4 out of range, wave file has 4 channels")
+
+    @unittest.skipIf(not os.path.isdir('/proc/self/fd'), "Needs /proc")
+    def test_read_channelsSelect_outOfRange_closesFile(self):
+        self.writeWav("file.wav", self.fourSinusoids(samples=400))
+        before = len(os.listdir('/proc/self/fd'))
+        for i in range(10):
+            with self.assertRaises(ValueError):
+                wavefile.WaveReader("file.wav", channels_select=[99])
+        self.assertEqual(len(os.listdir('/proc/self/fd')), before)
+
+    def test_readIter_channels(self):
+        blockSize = 100
+        data = self.fourSinusoids(samples=410)
+        self.writeWav("file.wav", data)
+        with wavefile.WaveReader("file.wav") as r:
+            for i, readdata in enumerate(r.read_iter(blockSize, channels=[0,2])):
+                self.assertEqual(readdata.shape[0], 2)
+                np_assert_almost_equal(
+                    data[[0,2],i*blockSize:i*blockSize+readdata.shape[1]],
+                    readdata)
+        self.assertEqual(4, i)
+
+
+    def exactSinusoid(self, samples, f, samplerate):
+        return np.sin(2*np.pi*f*np.arange(samples)/samplerate)[np.newaxis,:]
+
+    def test_readIter_samplerate(self):
+        data = self.exactSinusoid(samples=4800, f=440, samplerate=48000)
+        with wavefile.WaveWriter("file.wav", samplerate=48000) as w:
+            w.write(data)
+        self.toRemove("file.wav")
+        with wavefile.WaveReader("file.wav") as r:
+            readdata = np.concatenate([
+                block.copy() for block in r.read_iter(512, samplerate=16000)
+            ], axis=1)
+        expected = self.exactSinusoid(samples=1600, f=440, samplerate=16000)
+        self.assertEqual(readdata.shape, (1, 1600))
+        np_assert_almost_equal(readdata[:,20:-20], expected[:,20:-20], decimal=4)
+
+    def test_readIter_sameSamplerate_noResampling(self):
+        data = self.fourSinusoids(samples=400)
+        self.writeWav("file.wav", data)
+        with wavefile.WaveReader("file.wav") as r:
+            blocks = [block.copy() for block in r.read_iter(400, samplerate=44100)]
+        self.assertEqual(len(blocks), 1)
+        np_assert_almost_equal(blocks[0], data)
+
+    def test_write_inputSamplerate(self):
+        data = self.exactSinusoid(samples=1600, f=440, samplerate=16000)
+        with wavefile.WaveWriter("file.wav", samplerate=48000,
+                input_samplerate=16000) as w:
+            w.write(data[:,:1000])
+            w.write(data[:,1000:])
+        self.toRemove("file.wav")
+        samplerate, readdata = wavefile.load("file.wav")
+        expected = self.exactSinusoid(samples=4800, f=440, samplerate=48000)
+        self.assertEqual(samplerate, 48000)
+        self.assertEqual(readdata.shape, (1, 4800))
+        np_assert_almost_equal(readdata[:,60:-60], expected[:,60:-60], decimal=4)
+
+
+    def test_editor_properties(self):
+        data = self.fourSinusoids(samples=400)
+        self.writeWav("file.wav", data)
+        with wavefile.WaveEditor("file.wav") as e:
+            self.assertEqual(e.channels, 4)
+            self.assertEqual(e.frames, 400)
+            self.assertEqual(e.samplerate, 44100)
+            self.assertEqual(e.format, wavefile.Format.WAV|wavefile.Format.FLOAT)
+
+    def test_editor_read(self):
+        data = self.fourSinusoids(samples=400)
+        self.writeWav("file.wav", data)
+        with wavefile.WaveEditor("file.wav") as e:
+            readdata = e.buffer(100)
+            self.assertEqual(e.read(readdata, 150), 100)
+        np_assert_almost_equal(readdata, data[:,150:250], decimal=7)
+
+    def test_editor_write_region(self):
+        data = self.fourSinusoids(samples=400)
+        self.writeWav("file.wav", data)
+        patch = np.zeros((4,50), np.float32)
+        with wavefile.WaveEditor("file.wav") as e:
+            self.assertEqual(e.write(patch, 100), 50)
+        data[:,100:150] = 0
+        self.assertLoadWav("file.wav", data)
+
+    def test_editor_write_beyondEnd_enlarges(self):
+        data = self.fourSinusoids(samples=400)
+        self.writeWav("file.wav", data)
+        with wavefile.WaveEditor("file.wav") as e:
+            e.write(data[:,:100], 400)
+            self.assertEqual(e.frames, 500)
+        self.assertLoadWav("file.wav", np.concatenate([data, data[:,:100]], axis=1))
+
+    def test_editor_write_badStart(self):
+        data = self.fourSinusoids(samples=400)
+        self.writeWav("file.wav", data)
+        with wavefile.WaveEditor("file.wav") as e:
+            with self.assertRaises(IndexError) as ctx:
+                e.write(data[:,:100], -1)
+        self.assertEqual(format(ctx.exception), "Frame -1 out of file bounds")
+
+    def test_editor_edit(self):
+        data = self.fourSinusoids(samples=400)
+        self.writeWav("file.wav", data)
+        with wavefile.WaveEditor("file.wav") as e:
+            def halve(block): block *= .5
+            edited = e.edit(100, 300, halve, size=64)
+        self.assertEqual(edited, 200)
+        data[:,100:300] *= .5
+        self.assertLoadWav("file.wav", data)
+
+    def test_editor_truncate(self):
+        data = self.fourSinusoids(samples=400)
+        self.writeWav("file.wav", data)
+        with wavefile.WaveEditor("file.wav") as e:
+            e.truncate(300)
+            self.assertEqual(e.frames, 300)
+        self.assertLoadWav("file.wav", data[:,:300])
+
+    def test_editor_metadata(self):
+        data = self.fourSinusoids(samples=400)
+        self.writeWav("file.wav", data)
+        with wavefile.WaveEditor("file.wav") as e:
+            e.metadata.title = 'mytitle'
+        with wavefile.WaveReader("file.wav") as r:
+            self.assertEqual(r.metadata.title, 'mytitle')
+        self.assertLoadWav("file.wav", data)
+
+
+    def windowsHelper(self, data, window, hop, pad=None, batch=4):
+        self.writeWav("file.wav", data)
+        with wavefile.WaveReader("file.wav") as r:
+            batches = [b.copy() for b in r.windows(window, hop, pad=pad, batch=batch)]
+        for b in batches:
+            self.assertLessEqual(b.shape[0], batch)
+        return np.concatenate(batches)
+
+    def test_windows(self):
+        data = self.counter(samples=100)
+        windows = self.windowsHelper(data, 10, 5)
+        self.assertEqual(windows.shape, (19, 1, 10))
+        self.assertEqual(list(windows[:,0,0]), list(range(0,95,5)))
+        np_assert_almost_equal(windows[3,0], data[0,15:25])
+
+    def test_windows_multichannel(self):
+        data = self.fourSinusoids(samples=400)
+        windows = self.windowsHelper(data, 64, 16)
+        self.assertEqual(windows.shape, (22, 4, 64))
+        np_assert_almost_equal(windows[5], data[:,80:144], decimal=7)
+
+    def test_windows_padEnd(self):
+        data = self.counter(samples=100)
+        windows = self.windowsHelper(data, 10, 15, pad='end')
+        self.assertEqual(windows.shape, (7, 1, 10))
+        self.assertEqual(list(windows[-1,0]), [90,91,92,93,94,95,96,97,98,99])
+        self.assertEqual(list(windows[3,0,:3]), [45,46,47])
+
+    def test_windows_padCenter(self):
+        data = self.counter(samples=100)+1
+        windows = self.windowsHelper(data, 10, 25, pad='center')
+        self.assertEqual(windows.shape, (5, 1, 10))
+        self.assertEqual(list(windows[0,0]), [0,0,0,0,0,1,2,3,4,5])
+        self.assertEqual(list(windows[-1,0]), [96,97,98,99,100,0,0,0,0,0])
+
+    def test_windows_hopLargerThanWindow(self):
+        data = self.counter(samples=100)
+        windows = self.windowsHelper(data, 4, 30, batch=1)
+        self.assertEqual(list(windows[:,0,0]), [0,30,60,90])
+
+    def test_windows_areViewsOfAReusedBuffer(self):
+        data = self.counter(samples=1000)
+        self.writeWav("file.wav", data)
+        with wavefile.WaveReader("file.wav") as r:
+            batches = list(r.windows(16, 8, batch=8))
+        self.assertTrue(np.shares_memory(batches[0], batches[1]))
+        self.assertFalse(batches[0].flags.writeable)
+
+    def followHelper(self, inotify):
+        data = self.fourSinusoids(samples=1000)
+        self.toRemove("file.wav")
+        with wavefile.WaveWriter("file.wav", channels=4) as w:
+            w.write(data[:,:300])
+            with wavefile.WaveReader("file.wav") as r:
+                blocks = r.follow(256, poll=.01, timeout=.05, inotify=inotify)
+                result = [next(blocks).copy(), next(blocks).copy()]
+                w.write(data[:,300:])
+                result += [block.copy() for block in blocks]
+                self.assertEqual(r.frames, 1000)
+        self.assertEqual([b.shape[1] for b in result], [256, 44, 256, 256, 188])
+        np_assert_almost_equal(np.concatenate(result, axis=1), data, decimal=7)
+
+    def test_follow(self):
+        self.followHelper(inotify=False)
+
+    def test_follow_inotify(self):
+        self.followHelper(inotify=True)
+
+    def test_follow_noNewFrames_stopsOnTimeout(self):
+        data = self.counter(samples=100)
+        self.writeWav("file.wav", data)
+        with wavefile.WaveReader("file.wav") as r:
+            blocks = [b.copy() for b in r.follow(64, timeout=.01)]
+        self.assertEqual([b.shape[1] for b in blocks], [64, 36])
+
+    def test_follow_keepsChannelSelection(self):
+        data = self.fourSinusoids(samples=100)
+        self.toRemove("file.wav")
+        with wavefile.WaveWriter("file.wav", channels=4) as w:
+            w.write(data[:,:50])
+            with wavefile.WaveReader("file.wav", channels_select=[3,1]) as r:
+                blocks = r.follow(64, poll=.01, timeout=.05)
+                result = [next(blocks).copy()]
+                w.write(data[:,50:])
+                result += [block.copy() for block in blocks]
+        np_assert_almost_equal(np.concatenate(result, axis=1), data[[3,1]], decimal=7)
+
+    def test_follow_fileDescriptor(self):
+        data = self.fourSinusoids(samples=1000)
+        self.toRemove("file.wav")
+        with wavefile.WaveWriter("file.wav", channels=4) as w:
+            w.write(data[:,:300])
+            fd = os.open("file.wav", os.O_RDONLY)
+            try:
+                with wavefile.WaveReader(fd) as r:
+                    blocks = r.follow(256, poll=.01, timeout=.05)
+                    result = [next(blocks).copy(), next(blocks).copy()]
+                    w.write(data[:,300:])
+                    result += [block.copy() for block in blocks]
+                    self.assertEqual(r.frames, 1000)
+            finally:
+                os.close(fd)
+        np_assert_almost_equal(np.concatenate(result, axis=1), data, decimal=7)
+
+    def test_follow_stdin(self):
+        data = self.fourSinusoids(samples=1000)
+        self.toRemove("file.wav")
+        stdin = os.dup(0)
+        try:
+            with wavefile.WaveWriter("file.wav", channels=4) as w:
+                w.write(data[:,:300])
+                fd = os.open("file.wav", os.O_RDONLY)
+                os.dup2(fd, 0)
+                os.close(fd)
+                with wavefile.WaveReader('-') as r:
+                    blocks = r.follow(256, poll=.01, timeout=.05)
+                    result = [next(blocks).copy(), next(blocks).copy()]
+                    w.write(data[:,300:])
+                    result += [block.copy() for block in blocks]
+        finally:
+            os.dup2(stdin, 0)
+            os.close(stdin)
+        np_assert_almost_equal(np.concatenate(result, axis=1), data, decimal=7)
+
+    def test_follow_pipe(self):
+        fd = self.pipeFrom(self.pipedWav(self.counter(samples=100)))
+        try:
+            with wavefile.WaveReader(fd) as r:
+                with self.assertRaises(ValueError) as ctx:
+                    next(r.follow())
+        finally:
+            os.close(fd)
+        self.assertEqual(format(ctx.exception),
+            "Cannot follow a non seekable input")
+
+    def encodedSize(self, filename, format, **kwds):
+        self.toRemove(filename)
+        data = self.fourSinusoids(samples=44100)[:1]
+        noise = np.random.RandomState(0).uniform(-.1, .1, data.shape)
+        with wavefile.WaveWriter(filename, format=format, **kwds) as w:
+            w.write((.8*data + noise).astype(np.float32))
+        return os.path.getsize(filename)
+
+    def test_writer_compressionLevel(self):
+        flac = wavefile.Format.FLAC|wavefile.Format.PCM_16
+        fast = self.encodedSize("fast.flac", flac, compression_level=0.)
+        small = self.encodedSize("small.flac", flac, compression_level=1.)
+        self.assertLess(small, fast)
+
+    def test_writer_vbrQuality(self):
+        ogg = wavefile.Format.OGG|wavefile.Format.VORBIS
+        low = self.encodedSize("low.ogg", ogg, vbr_quality=0., ogg_page_latency_ms=20.)
+        high = self.encodedSize("high.ogg", ogg, vbr_quality=1.)
+        self.assertLess(low, high)
+
+    def test_writer_compressionLevel_outOfRange(self):
+        with self.assertRaises(ValueError) as ctx:
+            self.encodedSize("file.flac", wavefile.Format.FLAC|wavefile.Format.PCM_16,
+                compression_level=2)
+        self.assertEqual(format(ctx.exception),
+            "compression_level should be between 0 and 1, got 2")
+        self.assertFalse(os.path.exists("file.flac"))
+
+    def test_writer_compressionLevel_unsupported(self):
+        with self.assertRaises(ValueError) as ctx:
+            self.encodedSize("file.wav", wavefile.Format.WAV|wavefile.Format.PCM_16,
+                compression_level=.5)
+        self.assertEqual(format(ctx.exception),
+            "Format does not support compression_level=0.5")
+        self.assertFalse(os.path.exists("file.wav"))
+
+    def test_writer_bitrateMode_unsupported(self):
+        with self.assertRaises(ValueError) as ctx:
+            self.encodedSize("file.flac", wavefile.Format.FLAC|wavefile.Format.PCM_16,
+                bitrate_mode=wavefile.BitrateMode.CONSTANT)
+        self.assertEqual(format(ctx.exception),
+            "Format does not support bitrate_mode=BitrateMode.CONSTANT")
+
+    def test_writer_oggPageLatency_notOgg(self):
+        with self.assertRaises(ValueError) as ctx:
+            self.encodedSize("file.flac", wavefile.Format.FLAC|wavefile.Format.PCM_16,
+                ogg_page_latency_ms=20.)
+        self.assertEqual(format(ctx.exception),
+            "Format does not support ogg_page_latency_ms=20.0")
+        self.assertFalse(os.path.exists("file.flac"))
+
+    def rf64Helper(self, filename, **kwds):
+        data = self.fourSinusoids(samples=400)
+        self.toRemove(filename)
+        with wavefile.WaveWriter(filename, channels=4,
+                format=wavefile.Format.RF64|wavefile.Format.PCM_16, **kwds) as w:
+            w.write(data)
+        with open(filename, 'rb') as f:
+            return f.read(4)
+
+    def test_writer_rf64_downgradedWhenSmall(self):
+        self.assertEqual(self.rf64Helper("file.wav"), b'RIFF')
+
+    def test_writer_rf64_withoutDowngrade(self):
+        self.assertEqual(self.rf64Helper("file.wav", rf64_downgrade=False), b'RF64')
+
+    def checkpointedCopy(self, **kwds):
+        """Frames in a copy of the file taken while it is being written,
+        like a crash would leave it"""
+        import shutil
+        data = self.stereoSinusoids(samples=1001)
+        self.toRemove("file.rf64")
+        self.toRemove("crashed.rf64")
+        with wavefile.WaveWriter("file.rf64", channels=2,
+                format=wavefile.Format.RF64|wavefile.Format.PCM_16,
+                rf64_downgrade=False, **kwds) as w:
+            w.write(data)
+            shutil.copy("file.rf64", "crashed.rf64")
+        with wavefile.WaveReader("crashed.rf64") as r:
+            return r.frames
+
+    def test_writer_checkpointFrames(self):
+        self.assertEqual(self.checkpointedCopy(checkpoint_frames=1000), 1001)
+
+    def test_writer_checkpointFrames_notReached(self):
+        self.assertEqual(self.checkpointedCopy(checkpoint_frames=1002), 0)
+
+    def test_writer_checkpointSeconds(self):
+        self.assertEqual(self.checkpointedCopy(
+            checkpoint_seconds=1000/44100., fsync=True), 1001)
+
+    def test_writer_checkpoint_explicit(self):
+        self.toRemove("file.wav")
+        with wavefile.WaveWriter("file.wav", channels=2) as w:
+            w.write(self.stereoSinusoids(samples=100))
+            w.checkpoint()
+            with wavefile.WaveReader("file.wav") as r:
+                self.assertEqual(r.frames, 100)
+
+    def test_writer_checkpoint_bothUnits(self):
+        self.toRemove("file.wav")
+        with self.assertRaises(ValueError) as ctx:
+            wavefile.WaveWriter("file.wav", checkpoint_seconds=1., checkpoint_frames=1000)
+        self.assertEqual(format(ctx.exception),
+            "Use either checkpoint_seconds or checkpoint_frames")
+        self.assertFalse(os.path.exists("file.wav"))
+
+    @unittest.skipIf(sys.platform == 'win32', "Needs sparse files")
+    def test_writer_rf64_beyond4GB(self):
+        import struct
+        self.toRemove("big.wav")
+        position = 0x90000000 # frames, 4.5GB of 16 bit stereo
+        data = self.stereoSinusoids(samples=400)
+        # rf64_downgrade is on by default, the file ends beyond 4GB
+        with wavefile.WaveWriter("big.wav", channels=2,
+                format=wavefile.Format.RF64|wavefile.Format.PCM_16) as w:
+            w.write(data)
+            # Seeking leaves a hole so the file takes no disk space
+            self.assertEqual(w.seek(position), position)
+            self.assertEqual(w.write(data), 400) # real frames beyond 4GB
+        filesize = os.path.getsize("big.wav")
+        with open("big.wav", 'rb') as f:
+            header = f.read(48)
+        self.assertEqual(header[:4], b'RF64')
+        self.assertEqual(header[12:16], b'ds64')
+        riffSize, dataSize, sampleCount = struct.unpack('<QQQ', header[20:44])
+        self.assertEqual(dataSize, (position + 400) * 4)
+        self.assertGreater(dataSize, 0xFFFFFFFF)
+        self.assertEqual(sampleCount, position + 400)
+        self.assertEqual(riffSize, filesize - 8)
+        with wavefile.WaveReader("big.wav") as r:
+            self.assertEqual(r.frames, position + 400)
+            self.assertEqual(r.seek(position + 100), position + 100)
+            result = r.buffer(400)
+            self.assertEqual(r.read(result), 300)
+        np_assert_almost_equal(result[:,:300], data[:,100:], decimal=4)
+
+    def test_stats_reader(self):
+        data = self.fourSinusoids(samples=1000)
+        self.writeWav("file.wav", data)
+        with wavefile.WaveReader("file.wav") as r:
+            r.seek(100)
+            for block in r.read_iter(512): pass
+            stats = r.stats
+        self.assertEqual(stats.calls, 3) # 512, 388 and 0 frames
+        self.assertEqual(stats.frames, 900)
+        self.assertEqual(stats.bytes, 900*4*4)
+        self.assertEqual(stats.seeks, 1)
+        self.assertEqual(stats.short_calls, 2)
+        self.assertGreater(stats.seconds, 0)
+        self.assertGreater(stats.seek_seconds, 0)
+
+    def test_stats_writer(self):
+        data = self.fourSinusoids(samples=1000).astype(np.int16)
+        self.toRemove("file.wav")
+        with wavefile.WaveWriter("file.wav", channels=4) as w:
+            w.write(data[:,:600])
+            w.write(data[:,600:])
+            stats = w.stats
+        self.assertEqual(stats.as_dict(), dict(stats.as_dict(),
+            calls = 2,
+            frames = 1000,
+            bytes = 1000*4*2,
+            seeks = 0,
+            seek_seconds = 0.,
+            short_calls = 0,
+        ))
+
+    def test_stats_reset(self):
+        stats = wavefile.IOStats()
+        stats.calls = 4
+        stats.seconds = 2.
+        stats.reset()
+        self.assertEqual(repr(stats), "IOStats(calls=0, frames=0, bytes=0, "
+            "seconds=0.0, seeks=0, seek_seconds=0.0, short_calls=0)")
+
+    def test_ioHook(self):
+        events = []
+        def hook(handle, event, frames, seconds):
+            events.append((type(handle).__name__, event, frames))
+        data = self.fourSinusoids(samples=1000)
+        previous = wavefile.set_io_hook(hook)
+        try:
+            self.writeWav("file.wav", data)
+            with wavefile.WaveReader("file.wav") as r:
+                r.seek(200)
+                r.read(r.buffer(1000))
+            with self.assertRaises(IOError):
+                wavefile.WaveReader("notexisting.wav")
+        finally:
+            self.assertIs(wavefile.set_io_hook(previous), hook)
+        self.assertEqual(events, [
+            ('WaveWriter', 'open', 0),
+            ('WaveWriter', 'write', 1000),
+            ('WaveWriter', 'close', 0),
+            ('WaveReader', 'open', 0),
+            ('WaveReader', 'seek', 200),
+            ('WaveReader', 'read', 800),
+            ('WaveReader', 'close', 0),
+            ('NoneType', 'error', 0),
+        ])
+
+    def writeChunks(self, filename, format=wavefile.Format.WAV|wavefile.Format.PCM_16, **kwds):
+        self.toRemove(filename)
+        with wavefile.WaveWriter(filename, format=format, **kwds) as w:
+            w.set_chunk('iXML', b'<BWFXML></BWFXML>')
+            w.set_chunk(b'abcd', b'12345678')
+            w.write(self.counter(samples=10))
+
+    def test_chunks(self):
+        self.writeChunks("file.wav")
+        with wavefile.WaveReader("file.wav") as r:
+            self.assertEqual(r.chunks(), [
+                ('fmt ', 16),
+                ('iXML', 20), # libsndfile pads 17 bytes to 4 byte multiple
+                ('abcd', 8),
+                ('data', 20),
+            ])
+
+    def test_chunks_aiff(self):
+        self.writeChunks("file.aiff", wavefile.Format.AIFF|wavefile.Format.PCM_16)
+        with wavefile.WaveReader("file.aiff") as r:
+            self.assertEqual([id for id, size in r.chunks()],
+                ['COMM', 'iXML', 'abcd', 'SSND'])
+
+    def test_chunks_rf64(self):
+        self.writeChunks("file.rf64", wavefile.Format.RF64|wavefile.Format.PCM_16,
+            rf64_downgrade=False)
+        with open("file.rf64", 'rb') as f:
+            self.assertEqual(f.read(4), b'RF64')
+        with wavefile.WaveReader("file.rf64") as r:
+            chunks = r.chunks()
+        self.assertEqual(chunks[0][0], 'ds64')
+        # data header size is 0xFFFFFFFF, the real one is in ds64
+        self.assertEqual(chunks[-1], ('data', 20))
+
+    def test_chunks_unsupportedFormat(self):
+        self.toRemove("file.ogg")
+        with wavefile.WaveWriter("file.ogg",
+                format=wavefile.Format.OGG|wavefile.Format.VORBIS) as w:
+            w.write(self.sinusoid(samples=400))
+        with wavefile.WaveReader("file.ogg") as r:
+            self.assertEqual(r.chunks(), [])
+
+    def test_chunk_withoutChunkApi(self):
+        from unittest import mock
+        self.writeChunks("file.wav")
+        with mock.patch.object(wavefile, '_chunkApi', False):
+            with wavefile.WaveReader("file.wav") as r:
+                self.assertEqual(len(r.chunks()), 4) # headers are scanned
+                with self.assertRaises(NotImplementedError) as ctx:
+                    r.chunk('abcd')
+            with wavefile.WaveWriter("file.wav") as w:
+                with self.assertRaises(NotImplementedError):
+                    w.set_chunk('abcd', b'1234')
+        self.assertTrue(format(ctx.exception).startswith(
+            "Chunks require libsndfile 1.0.26 or later, found libsndfile-"))
+
+    def test_chunk(self):
+        self.writeChunks("file.wav")
+        with wavefile.WaveReader("file.wav") as r:
+            self.assertEqual(r.chunk('abcd'), b'12345678')
+            self.assertEqual(r.chunk(b'iXML'), b'<BWFXML></BWFXML>\0\0\0')
+
+    def test_chunk_reusingBuffer(self):
+        self.writeChunks("file.wav")
+        buffer = bytearray(100)
+        with wavefile.WaveReader("file.wav") as r:
+            content = r.chunk('abcd', buffer)
+        self.assertEqual(bytes(content), b'12345678')
+        self.assertEqual(buffer[:10], b'12345678\0\0')
+
+    def test_chunk_bufferTooSmall(self):
+        self.writeChunks("file.wav")
+        with wavefile.WaveReader("file.wav") as r:
+            with self.assertRaises(AssertionError) as ctx:
+                r.chunk('abcd', bytearray(4))
+        self.assertEqual(format(ctx.exception),
+            "Buffer has room for 4 bytes, chunk 'abcd' has 8 bytes")
+
+    def test_chunk_missing(self):
+        self.writeChunks("file.wav")
+        with wavefile.WaveReader("file.wav") as r:
+            with self.assertRaises(KeyError):
+                r.chunk('bext')
+
+    def test_setChunk_afterWriting(self):
+        self.toRemove("file.wav")
+        with wavefile.WaveWriter("file.wav") as w:
+            w.write(self.counter(samples=10))
+            with self.assertRaises(ValueError) as ctx:
+                w.set_chunk('iXML', b'<BWFXML></BWFXML>')
+        self.assertEqual(format(ctx.exception),
+            "Chunks should be set before writing audio")
+
+    def test_setChunk_unsupportedFormat(self):
+        self.toRemove("file.flac")
+        with wavefile.WaveWriter("file.flac",
+                format=wavefile.Format.FLAC|wavefile.Format.PCM_16) as w:
+            with self.assertRaises(ValueError) as ctx:
+                w.set_chunk('iXML', b'<BWFXML></BWFXML>')
+        self.assertEqual(format(ctx.exception),
+            "Unable to set chunk 'iXML': Error : Reading/writing chunks "
+            "from this file format is not supported.")
+
+    def writeCues(self, filename, cues, format=wavefile.Format.WAV|wavefile.Format.FLOAT):
+        self.toRemove(filename)
+        with wavefile.WaveWriter(filename, format=format) as w:
+            w.set_cues(cues)
+            w.write(self.counter(samples=100))
+
+    def test_cues_noCues(self):
+        self.writeWav("file.wav", self.counter(samples=100))
+        with wavefile.WaveReader("file.wav") as r:
+            self.assertEqual(r.cues, [])
+
+    def test_cues(self):
+        self.writeCues("file.wav", [(10, 'intro'), (40, 'verse'), 70])
+        with wavefile.WaveReader("file.wav") as r:
+            self.assertEqual(r.cues, [
+                wavefile.Cue(1, 10, 'intro'),
+                wavefile.Cue(2, 40, 'verse'),
+                wavefile.Cue(3, 70, ''),
+            ])
+
+    def test_cues_keepId(self):
+        self.writeCues("file.wav", [wavefile.Cue(7, 30, 'seven')])
+        with wavefile.WaveReader("file.wav") as r:
+            self.assertEqual(r.cues, [wavefile.Cue(7, 30, 'seven')])
+
+    def test_cues_withMetadata(self):
+        self.toRemove("file.wav")
+        with wavefile.WaveWriter("file.wav") as w:
+            w.metadata.title = 'Title'
+            w.set_cues([(10, 'intro')])
+            w.write(self.counter(samples=100))
+        with wavefile.WaveReader("file.wav") as r:
+            self.assertEqual(r.metadata.title, 'Title')
+            self.assertEqual(r.cues, [wavefile.Cue(1, 10, 'intro')])
+
+    def test_cues_aiff(self):
+        self.writeCues("file.aiff", [(10, 'intro'), (40, 'verse')],
+            wavefile.Format.AIFF|wavefile.Format.PCM_16)
+        with wavefile.WaveReader("file.aiff") as r:
+            self.assertEqual([(cue.position, cue.name) for cue in r.cues],
+                [(10, 'intro'), (40, 'verse')])
+
+    def test_setCues_afterWriting(self):
+        self.toRemove("file.wav")
+        with wavefile.WaveWriter("file.wav") as w:
+            w.write(self.counter(samples=10))
+            with self.assertRaises(ValueError) as ctx:
+                w.set_cues([5])
+        self.assertEqual(format(ctx.exception),
+            "Cues should be set before writing audio")
+
+    def test_readRegions(self):
+        self.writeWav("file.wav", self.counter(samples=100))
+        with wavefile.WaveReader("file.wav") as r:
+            regions = r.read_regions([(50, 60), (10, 15), (55, 58)])
+        np_assert_almost_equal(regions[0], self.counter(samples=100)[:,50:60])
+        np_assert_almost_equal(regions[1], self.counter(samples=100)[:,10:15])
+        np_assert_almost_equal(regions[2], self.counter(samples=100)[:,55:58])
+
+    def test_readRegions_seeksJustToSkipGaps(self):
+        self.writeWav("file.wav", self.counter(samples=100))
+        with wavefile.WaveReader("file.wav") as r:
+            r.read_regions([(20, 30), (0, 10), (10, 20), (50, 60)])
+            self.assertEqual(r.stats.seeks, 2)
+            self.assertEqual(r.stats.frames, 40)
+
+    def test_readRegions_cues(self):
+        self.writeCues("file.wav", [40, 10])
+        with wavefile.WaveReader("file.wav") as r:
+            regions = r.read_regions(r.cues)
+        self.assertEqual([region.shape for region in regions], [(1, 60), (1, 30)])
+        np_assert_almost_equal(regions[1], self.counter(samples=100)[:,10:40])
+
+    def test_readRegions_givenOutput(self):
+        self.writeWav("file.wav", self.counter(samples=100))
+        out = [np.zeros((1, 10), np.float64, order='F')]
+        with wavefile.WaveReader("file.wav") as r:
+            result = r.read_regions([(20, 30)], out)
+        self.assertIs(result[0], out[0])
+        np_assert_almost_equal(out[0], self.counter(samples=100)[:,20:30])
+
+    def test_readRegions_badOutputSize(self):
+        self.writeWav("file.wav", self.counter(samples=100))
+        with wavefile.WaveReader("file.wav") as r:
+            with self.assertRaises(AssertionError) as ctx:
+                r.read_regions([(20, 30)], [np.zeros((1, 5), np.float32, order='F')])
+        self.assertEqual(format(ctx.exception),
+            "Buffer has room for 5 frames, region 20:30 has 10 frames")
+
+    def test_readRegions_outOfBounds(self):
+        self.writeWav("file.wav", self.counter(samples=100))
+        with wavefile.WaveReader("file.wav") as r:
+            with self.assertRaises(ValueError) as ctx:
+                r.read_regions([(90, 110)])
+        self.assertEqual(format(ctx.exception),
+            "Region 90:110 out of file bounds, file has 100 frames")
+
+    def test_write_dither(self):
+        self.toRemove("file.wav")
+        data = self.stereoSinusoids(samples=1000)*.5
+        with wavefile.WaveWriter("file.wav", channels=2,
+                format=wavefile.Format.WAV|wavefile.Format.PCM_16,
+                dither='tpdf') as w:
+            w.write(data)
+            self.assertEqual(w.stats.bytes, 2*1000*2) # written as int16
+        with wavefile.WaveReader("file.wav") as r:
+            result = r.buffer(1000, np.int16)
+            r.read(result)
+        error = result - data*32767
+        self.assertLessEqual(np.abs(error).max(), 1.5)
+
+    def test_write_ditherNone_clips(self):
+        self.toRemove("file.wav")
+        with wavefile.WaveWriter("file.wav",
+                format=wavefile.Format.WAV|wavefile.Format.PCM_16,
+                dither='none') as w:
+            w.write(np.array([[1.5, -1.5, .5]], np.float32))
+        with wavefile.WaveReader("file.wav") as r:
+            result = r.buffer(3, np.int16)
+            r.read(result)
+        np_assert_almost_equal(result, [[32767, -32768, 16384]])
+
+    def test_write_dither_intDataUntouched(self):
+        self.toRemove("file.wav")
+        data = np.array([[1, -1, 3]], np.int16)
+        with wavefile.WaveWriter("file.wav",
+                format=wavefile.Format.WAV|wavefile.Format.PCM_16,
+                dither='tpdf') as w:
+            w.write(data)
+        with wavefile.WaveReader("file.wav") as r:
+            result = r.buffer(3, np.int16)
+            r.read(result)
+        np_assert_almost_equal(result, data)
+
+    def test_write_dither_nonPcmFormat(self):
+        with self.assertRaises(ValueError) as ctx:
+            wavefile.WaveWriter("file.wav", dither='tpdf')
+        self.assertEqual(format(ctx.exception),
+            "Dither requires a PCM format")
+
+    def test_write_noiseShaping_withoutDither(self):
+        with self.assertRaises(ValueError) as ctx:
+            wavefile.WaveWriter("file.wav",
+                format=wavefile.Format.WAV|wavefile.Format.PCM_16,
+                noise_shaping=True)
+        self.assertEqual(format(ctx.exception),
+            "Noise shaping requires dither")
+
+    def pipeFrom(self, content):
+        """Returns the reading end of a pipe being fed with content"""
+        import threading
+        readfd, writefd = os.pipe()
+        def feed():
+            with os.fdopen(writefd, 'wb') as f:
+                f.write(content)
+        thread = threading.Thread(target=feed, daemon=True)
+        thread.start()
+        return readfd
+
+    def pipedWav(self, data, dataSize=None):
+        """A WAV file content as written to a pipe,
+        with an unknown data size"""
+        import struct
+        self.writeWav("file.wav", data)
+        with open("file.wav", 'rb') as f:
+            content = bytearray(f.read())
+        if dataSize is not None:
+            position = content.find(b'data')
+            content[position+4:position+8] = struct.pack('<I', dataSize)
+            content[4:8] = struct.pack('<I', dataSize)
+        return bytes(content)
+
+    def test_read_pipe(self):
+        data = self.stereoSinusoids(samples=3000)
+        fd = self.pipeFrom(self.pipedWav(data))
+        try:
+            with wavefile.WaveReader(fd) as r:
+                self.assertFalse(r.seekable)
+                self.assertEqual(r.chunks(), [])
+                result = np.concatenate([
+                    block.copy() for block in r.read_iter(1000)], axis=1)
+        finally:
+            os.close(fd)
+        np_assert_almost_equal(result, data, decimal=6)
+
+    def test_read_seekable(self):
+        self.writeWav("file.wav", self.counter(samples=10))
+        with wavefile.WaveReader("file.wav") as r:
+            self.assertTrue(r.seekable)
+
+    def test_load_pipeWithBogusLength(self):
+        data = self.stereoSinusoids(samples=100000)
+        fd = self.pipeFrom(self.pipedWav(data, dataSize=0xFFFFFFFF))
+        try:
+            samplerate, result = wavefile.load(fd)
+        finally:
+            os.close(fd)
+        self.assertEqual(result.shape, (2, 100000))
+        self.assertTrue(result.flags.f_contiguous)
+        np_assert_almost_equal(result, data, decimal=6)
+
+    def test_load_fileObject(self):
+        data = self.stereoSinusoids(samples=1000)
+        self.writeWav("file.wav", data)
+        with open("file.wav", 'rb') as f:
+            samplerate, result = wavefile.load(f)
+        np_assert_almost_equal(result, data, decimal=6)
+
+    def pipeTo(self):
+        """Returns the writing end of a pipe and a function
+        returning all the bytes written, once it is closed"""
+        import threading
+        readfd, writefd = os.pipe()
+        received = []
+        def drain():
+            with os.fdopen(readfd, 'rb') as f:
+                received.append(f.read())
+        thread = threading.Thread(target=drain, daemon=True)
+        thread.start()
+        def content():
+            thread.join()
+            return received[0]
+        return writefd, content
+
+    def loadBytes(self, content, filename):
+        self.toRemove(filename)
+        with open(filename, 'wb') as f:
+            f.write(content)
+        return wavefile.load(filename)
+
+    def test_write_pipe_wav(self):
+        import struct
+        data = self.stereoSinusoids(samples=1000)
+        fd, content = self.pipeTo()
+        with wavefile.WaveWriter(fd, channels=2,
+                format=wavefile.Format.WAV|wavefile.Format.PCM_16) as w:
+            self.assertTrue(w.streaming)
+            w.write(data)
+        os.close(fd)
+        content = content()
+        self.assertEqual(content[:4], b'RIFF')
+        self.assertEqual(struct.unpack('<I', content[40:44])[0], 0xFFFFFFFF)
+        self.assertEqual(len(content), 44 + 1000*2*2)
+        samplerate, result = self.loadBytes(content, "file.wav")
+        np_assert_almost_equal(result[:,:1000], data, decimal=4)
+
+    def test_write_pipe_wavex(self):
+        data = np.concatenate([self.stereoSinusoids(samples=1000)]*3) * .5
+        fd, content = self.pipeTo()
+        with wavefile.WaveWriter(fd, channels=6,
+                format=wavefile.Format.WAV|wavefile.Format.PCM_24) as w:
+            w.write(data)
+        os.close(fd)
+        content = content()
+        self.assertEqual(content[20:22], b'\xfe\xff') # WAVE_FORMAT_EXTENSIBLE
+        self.toRemove("file.wav")
+        with open("file.wav", 'wb') as f:
+            f.write(content)
+        with wavefile.WaveReader("file.wav") as r:
+            self.assertEqual(r.format & wavefile.Format.TYPEMASK, wavefile.Format.WAVEX)
+            self.assertEqual(r.format & wavefile.Format.SUBMASK, wavefile.Format.PCM_24)
+            self.assertEqual(r.channels, 6)
+            result = r.buffer(1000)
+            self.assertEqual(r.read(result), 1000)
+        np_assert_almost_equal(result, data, decimal=6)
+
+    def test_write_pipe_au(self):
+        data = self.stereoSinusoids(samples=1000)
+        fd, content = self.pipeTo()
+        with wavefile.WaveWriter(fd, channels=2,
+                format=wavefile.Format.AU|wavefile.Format.FLOAT) as w:
+            w.write(data)
+        os.close(fd)
+        samplerate, result = self.loadBytes(content(), "file.au")
+        np_assert_almost_equal(result, data, decimal=6)
+
+    def test_write_pipe_stagesSmallBlocks(self):
+        data = self.stereoSinusoids(samples=1000)
+        fd, content = self.pipeTo()
+        with wavefile.WaveWriter(fd, channels=2, stream_buffer=300) as w:
+            for i in range(0, 1000, 10):
+                self.assertEqual(w.write(data[:,i:i+10]), 10)
+        os.close(fd)
+        self.assertEqual(w.stats.calls, 4)
+        self.assertEqual(w.stats.frames, 1000)
+        samplerate, result = self.loadBytes(content(), "file.wav")
+        np_assert_almost_equal(result, data)
+
+    def test_write_pipe_checkpointWritesStaged(self):
+        fd, content = self.pipeTo()
+        with wavefile.WaveWriter(fd, channels=2) as w:
+            w.write(self.stereoSinusoids(samples=100))
+            self.assertEqual(w.stats.frames, 0)
+            w.checkpoint()
+            self.assertEqual(w.stats.frames, 100)
+        os.close(fd)
+        content()
+
+    def test_write_pipe_unsupportedFormat(self):
+        fd, content = self.pipeTo()
+        try:
+            with self.assertRaises(IOError) as ctx:
+                wavefile.WaveWriter(fd, format=wavefile.Format.CAF|wavefile.Format.PCM_16)
+        finally:
+            os.close(fd)
+        content()
+        self.assertIn("does not support pipe write", format(ctx.exception))
+
+    def test_write_pipe_chunksAfterStagedAudio(self):
+        fd, content = self.pipeTo()
+        with wavefile.WaveWriter(fd, channels=2,
+                format=wavefile.Format.AU|wavefile.Format.FLOAT) as w:
+            w.write(self.stereoSinusoids(samples=100))
+            self.assertEqual(w.stats.calls, 0) # still staged
+            with self.assertRaises(ValueError) as ctx:
+                w.set_chunk('abcd', b'1234')
+            self.assertEqual(format(ctx.exception),
+                "Chunks should be set before writing audio")
+            with self.assertRaises(ValueError) as ctx:
+                w.set_cues([10])
+            self.assertEqual(format(ctx.exception),
+                "Cues should be set before writing audio")
+        os.close(fd)
+        content()
+
+    def test_write_seekableDescriptor(self):
+        data = self.stereoSinusoids(samples=1000)
+        self.toRemove("file.wav")
+        with open("file.wav", 'wb') as f:
+            with wavefile.WaveWriter(f, channels=2) as w:
+                self.assertFalse(w.streaming)
+                w.write(data)
+        with wavefile.WaveReader("file.wav") as r:
+            self.assertEqual(r.frames, 1000)
+
     def test_write_unicodeFilename(self):
         data = self.fourSinusoids(samples=400)
         self.writeWav("file€.wav", data)
@@ -579,6 +1525,23 @@ class WavefileTest(unittest.TestCase):
         # Read still provides the channel dimension
         self.assertLoadWav('file.wav', data.reshape((1,400)))
 
+    def test_save_beyondRiffLimit_usesRf64(self):
+        from unittest import mock
+        data = self.stereoSinusoids(samples=400)
+        with mock.patch.object(wavefile, '_riffMaxDataBytes', 2*400*4-1):
+            wavefile.save("file.wav", data, samplerate=44100)
+        with open("file.wav", 'rb') as f:
+            self.assertEqual(f.read(4), b'RF64')
+        self.assertLoadWav('file.wav', data)
+
+    def test_save_withinRiffLimit_usesWav(self):
+        from unittest import mock
+        data = self.stereoSinusoids(samples=400)
+        with mock.patch.object(wavefile, '_riffMaxDataBytes', 2*400*4):
+            wavefile.save("file.wav", data, samplerate=44100)
+        with open("file.wav", 'rb') as f:
+            self.assertEqual(f.read(4), b'RIFF')
+
 
 class Format_Test(unittest.TestCase):
 